@@ -1,6 +1,12 @@
 #!/usr/bin/env python3
 import sys, subprocess, os
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from phase_2.static_rules import StaticRuleEngine
+
+ENGINE = StaticRuleEngine()
+
 
 def get_staged_files():
     try:
@@ -26,10 +32,26 @@ def get_staged_files():
 def check_file(file_path):
     try:
         with open(file_path, 'r') as f:
-            lines = f.readlines()
+            source = f.read()
     except:
         return []
     
+    lines = source.splitlines()
+    report = ENGINE.scan_source(source, filename=file_path)
+    if not report['parsed']:
+        return check_lines(lines)
+    
+    issues = []
+    for finding in report['findings']:
+        line = lines[finding['line'] - 1] if 0 < finding['line'] <= len(lines) else ''
+        if '# nosec' in line or '# skipcq' in line:
+            continue
+        issues.append((finding['line'], finding['severity'], finding['title']))
+    return issues
+
+
+def check_lines(lines):
+    """Line-based fallback for files that don't parse"""
     issues = []
     
     for i, line in enumerate(lines, 1):
@@ -74,7 +96,7 @@ for f in files:
     if issues:
         print(f"📄 {f}")
         for line_no, severity, issue_type in issues:
-            emoji = '🔴' if severity == 'CRITICAL' else '🟠'
+            emoji = {'CRITICAL': '🔴', 'HIGH': '🟠'}.get(severity, '🟡')
             print(f"  {emoji} Line {line_no}: {issue_type} [{severity}]")
             all_issues.append((severity, f, line_no))
 
@@ -4,8 +4,13 @@ NeuraShield PR Analyzer Script
 Analyzes only changed Python files in a pull request
 """
 import os
+import re
 import sys
+import ast
 import json
+import argparse
+import subprocess
+import textwrap
 from pathlib import Path
 
 # Add project root to path
@@ -14,6 +19,8 @@ sys.path.insert(0, os.path.abspath('.'))
 from phase_1.vector_store import ChromaVectorStore
 from phase_1.embedding_generator import EmbeddingGenerator
 from phase_2.rag_analyzer import RAGAnalyzer
+from phase_2.llm_analyzer import CACHE_ROOT, GATING_FIELDS
+from phase_2.disk_cache import DiskCache
 
 
 def read_file_content(file_path):
@@ -26,8 +33,171 @@ def read_file_content(file_path):
         return None
 
 
-def analyze_changed_files(changed_files):
-    """Analyze all changed Python files"""
+HUNK_HEADER = re.compile(r'^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@')
+FIRST_NUMBER = re.compile(r'\d+')
+
+# Lines of surrounding context sent with module-level changes
+CONTEXT_LINES = 3
+# Above this share of changed lines, one whole-file call is cheaper than per-hunk chunks
+FULL_FILE_RATIO = 0.5
+
+
+def get_changed_lines(file_path, base):
+    """Line numbers in the working tree that were added or modified since the merge base"""
+    try:
+        result = subprocess.run(
+            ['git', 'diff', '-U0', '--no-color', f'{base}...HEAD', '--', file_path],
+            capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"Could not diff {file_path} against {base}: {e}")
+        return None
+
+    changed = set()
+    for line in result.stdout.splitlines():
+        match = HUNK_HEADER.match(line)
+        if not match:
+            continue
+        start = int(match.group(1))
+        count = int(match.group(2)) if match.group(2) is not None else 1
+        if count == 0:
+            # Pure deletion: anchor on the line that now sits where the removed code was
+            changed.add(max(start, 1))
+        else:
+            changed.update(range(start, start + count))
+    return changed
+
+
+SCOPE_TYPES = {ast.FunctionDef: 'function', ast.AsyncFunctionDef: 'function', ast.ClassDef: 'class'}
+
+
+def _scope_spans(tree):
+    spans = []
+    for node in ast.walk(tree):
+        kind = SCOPE_TYPES.get(type(node))
+        if kind:
+            start = min([d.lineno for d in node.decorator_list] + [node.lineno])
+            spans.append((start, node.end_lineno, node.name, kind))
+    return spans
+
+
+def build_hunk_chunks(code, file_path, changed_lines, context_lines=CONTEXT_LINES):
+    """
+    Map changed lines to the innermost enclosing function or class; changes
+    outside any of them get a small window of surrounding lines. Chunks keep
+    their real line_start so merged findings point at lines in the file.
+    """
+    lines = code.splitlines()
+    try:
+        spans = _scope_spans(ast.parse(code, filename=file_path))
+    except (SyntaxError, ValueError):
+        spans = []
+
+    regions = {}
+    window_lines = set()
+    for line_no in sorted(changed_lines):
+        enclosing = [span for span in spans if span[0] <= line_no <= span[1]]
+        if enclosing:
+            start, end, name, kind = min(enclosing, key=lambda span: span[1] - span[0])
+            regions[(start, end)] = (name, kind)
+        elif line_no <= len(lines) and lines[line_no - 1].strip():
+            window_lines.update(range(max(1, line_no - context_lines), min(len(lines), line_no + context_lines) + 1))
+
+    # A class chunk already carries any of its methods that were also hit
+    for start, end in list(regions):
+        if any(s <= start and end <= e and (s, e) != (start, end) for s, e in regions):
+            del regions[(start, end)]
+
+    # Context windows never re-send lines already inside a function or class chunk
+    for start, end in regions:
+        window_lines.difference_update(range(start, end + 1))
+    for line_no in sorted(window_lines):
+        if line_no - 1 in window_lines:
+            continue
+        end = line_no
+        while end + 1 in window_lines:
+            end += 1
+        if any(line.strip() for line in lines[line_no - 1:end]):
+            regions[(line_no, end)] = None
+
+    chunks = []
+    for (start, end), scope in sorted(regions.items()):
+        name, kind = scope or (None, 'diff_hunk')
+        chunks.append({
+            'code': textwrap.dedent('\n'.join(lines[start - 1:end])),
+            'type': kind,
+            'name': f"{file_path}:{name or f'L{start}-{end}'}",
+            'file_path': file_path,
+            'line_start': start,
+            'line_end': end
+        })
+    return chunks
+
+
+def get_blob_sha(file_path):
+    """Git blob SHA of the file as checked out, identical across pushes while the file is unchanged"""
+    try:
+        result = subprocess.run(['git', 'hash-object', '--', file_path],
+                                capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def analyzer_config_hash(analyzer):
+    """Everything besides the file itself that changes what the analyzer reports"""
+    llm = analyzer.llm_analyzer
+    rag = analyzer.rag_core
+    return DiskCache.make_key(
+        llm.model,
+        llm.temperature,
+        llm.max_tokens,
+        llm.prompt_templates.TEMPLATE_VERSION,
+        llm.early_stop_fields,
+        llm.structured_output,
+        rag.top_k,
+        rag.retrieval_mode,
+        rag.context_token_budget,
+        analyzer.combined_analysis,
+        CONTEXT_LINES,
+        FULL_FILE_RATIO
+    )
+
+
+def _has_errors(analysis):
+    if analysis.get('error'):
+        return True
+    return any(isinstance(analysis.get(section), dict) and analysis[section].get('error')
+               for section in ('bug_analysis', 'optimization_analysis', 'security_analysis'))
+
+
+def _finding_line(item):
+    match = FIRST_NUMBER.search(str(item.get('line', '')))
+    return int(match.group()) if match else None
+
+
+def anchor_findings(analysis, changed_lines):
+    """Mark each finding as on a changed line or in the surrounding context"""
+    in_diff = 0
+    sections = (('bug_analysis', 'bugs_found'), ('security_analysis', 'vulnerabilities'),
+                ('optimization_analysis', 'optimizations'))
+    for section, key in sections:
+        for item in (analysis.get(section) or {}).get(key) or []:
+            if not isinstance(item, dict):
+                continue
+            item['in_diff'] = _finding_line(item) in changed_lines
+            in_diff += item['in_diff']
+    analysis['findings_in_diff'] = in_diff
+    return analysis
+
+
+def print_gating_field(section, field, value):
+    """Streamed as soon as the model emits it, before the narrative fields finish"""
+    print(f"  ⚡ {section}.{field} = {value}")
+
+
+def analyze_changed_files(changed_files, base=None, full=False, use_cache=True, stream=False, gate_only=False):
+    """Analyze all changed Python files, scoped to their diff hunks when a base is given"""
     # Connect to existing ChromaDB
     project_root = os.path.abspath('.')
     phase1_db = os.path.join(project_root, 'phase_1', 'chroma_db')
@@ -43,8 +213,18 @@ def analyze_changed_files(changed_files):
         vector_store=vector_store,
         embedding_generator=embedding_gen,
         llm_model="gpt-4o",
-        top_k=5
+        top_k=5,
+        stream_llm=stream or gate_only,
+        # Gate-only scans stop generating once check_critical.py has what it decides on
+        early_stop_fields=GATING_FIELDS if gate_only else None,
+        field_listener=print_gating_field if stream or gate_only else None
     )
+
+    # Results per (blob SHA, analyzer config); the workflow persists CACHE_ROOT between pushes
+    result_cache = DiskCache(os.path.join(CACHE_ROOT, 'pr'), ttl_seconds=30 * 24 * 3600,
+                             max_entries=5000) if use_cache else None
+    config_hash = analyzer_config_hash(analyzer)
+    reused = 0
     
     # Analyze each changed file
     results = []
@@ -58,10 +238,46 @@ def analyze_changed_files(changed_files):
         if not code:
             continue
         
-        # Run full analysis (bugs, optimization, security)
-        analysis = analyzer.analyze_code(code=code, analysis_type="all")
+        changed = None if full or not base else get_changed_lines(file_path, base)
+        total_lines = max(len(code.splitlines()), 1)
+
+        cache_key = None
+        blob_sha = get_blob_sha(file_path) if result_cache is not None else None
+        if blob_sha:
+            # The diff scope is part of the key: same blob against a moved base is a different request
+            cache_key = DiskCache.make_key(blob_sha, config_hash, sorted(changed) if changed is not None else None)
+            cached = result_cache.get(cache_key)
+            if cached is not None:
+                print(f"  Unchanged blob {blob_sha[:12]}, reusing previous result")
+                cached['file_path'] = file_path
+                results.append(cached)
+                reused += 1
+                continue
+
+        if changed is None or len(changed) / total_lines >= FULL_FILE_RATIO:
+            # Run full analysis (bugs, optimization, security)
+            analysis = analyzer.analyze_code(code=code, analysis_type="all", file_path=file_path)
+            analysis['scope'] = 'file'
+        elif not changed:
+            print("  No added or modified lines, skipping")
+            continue
+        else:
+            chunks = build_hunk_chunks(code, file_path, changed)
+            print(f"  {len(changed)} changed lines in {len(chunks)} chunks")
+            analysis = analyzer.analyze_chunks(code, chunks, analysis_type="all", file_path=file_path)
+            analysis['scope'] = 'diff'
+
+        if changed:
+            anchor_findings(analysis, changed)
+            analysis['changed_lines'] = len(changed)
         analysis['file_path'] = file_path
         results.append(analysis)
+
+        if cache_key is not None and not _has_errors(analysis):
+            result_cache.set(cache_key, analysis)
+
+    if reused:
+        print(f"\nReused cached results for {reused} unchanged files")
     
     return results
 
@@ -97,6 +313,11 @@ def generate_markdown_report(results):
         file_path = result.get('file_path', 'unknown')
         lines.append(f"## 📄 `{file_path}`")
         lines.append("")
+        if result.get('scope') == 'diff':
+            lines.append(f"*Scoped to {result.get('changed_lines', 0)} changed lines; "
+                         f"{result.get('findings_in_diff', 0)} findings on changed lines, "
+                         f"📍 marks them.*")
+            lines.append("")
         
         # Bug Analysis
         bug_data = result.get('bug_analysis', {})
@@ -109,7 +330,7 @@ def generate_markdown_report(results):
             
             for i, bug in enumerate(bugs, 1):
                 lines.append(f"**{i}. {bug['type']}** (Severity: `{bug['severity']}`)")
-                lines.append(f"- **Line:** {bug.get('line', 'N/A')}")
+                lines.append(f"- **Line:** {bug.get('line', 'N/A')}{' 📍' if bug.get('in_diff') else ''}")
                 lines.append(f"- **Description:** {bug['description']}")
                 lines.append(f"- **Fix:** {bug.get('fix', 'No fix provided')[:200]}")
                 if 'cwe_id' in bug:
@@ -131,7 +352,7 @@ def generate_markdown_report(results):
             vulns = sec_data.get('vulnerabilities', [])
             if vulns:
                 for i, vuln in enumerate(vulns, 1):
-                    lines.append(f"**{i}. {vuln['type']}**")
+                    lines.append(f"**{i}. {vuln['type']}**{' 📍' if vuln.get('in_diff') else ''}")
                     lines.append(f"- **CVSS Score:** {vuln.get('cvss_score', 'N/A')}")
                     lines.append(f"- **CWE:** {vuln.get('cwe_id', 'N/A')}")
                     lines.append(f"- **Remediation:** {vuln.get('remediation', 'N/A')[:150]}")
@@ -156,18 +377,34 @@ def generate_markdown_report(results):
     return "\n".join(lines)
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description='NeuraShield PR analyzer')
+    parser.add_argument('files', nargs='+', help='Changed files to analyze')
+    parser.add_argument('--base', default=None,
+                        help='Git ref the PR is diffed against, e.g. origin/main (default: analyze whole files)')
+    parser.add_argument('--full', action='store_true',
+                        help='Analyze whole files even when --base is given')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Re-analyze every file instead of reusing results for unchanged blobs')
+    parser.add_argument('--stream', action='store_true',
+                        help='Stream completions and print gating fields (has_bugs, overall_risk, ...) as they arrive')
+    parser.add_argument('--gate-only', action='store_true',
+                        help='Stop each completion once the gating fields are complete (implies --stream)')
+    return parser.parse_args()
+
+
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python pr_analyzer.py <file1.py> <file2.py> ...")
-        sys.exit(1)
+    args = parse_args()
     
     # Get list of changed files from command line arguments
-    changed_files = sys.argv[1:]
+    changed_files = args.files
     
     print(f"Analyzing {len(changed_files)} changed files...")
     
     # Run analysis
-    results = analyze_changed_files(changed_files)
+    results = analyze_changed_files(changed_files, base=args.base, full=args.full,
+                                    use_cache=not args.no_cache, stream=args.stream,
+                                    gate_only=args.gate_only)
     
     if not results:
         print("No files to analyze")
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmark for phase_2/json_recovery.py over a corpus of malformed LLM responses.
+Checks every expected top-level key is recovered and shows that parse time
+grows linearly with response length.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from phase_2.json_recovery import recover_json
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), 'json_recovery_corpus.jsonl')
+
+
+def load_corpus(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def time_call(func, arg, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func(arg)
+    return (time.perf_counter() - started) / repeat
+
+
+def long_truncated_response(num_bugs):
+    """A bug report with num_bugs entries, truncated mid-string so the fast path fails"""
+    bugs = [
+        {'type': 'SQL Injection', 'line': i, 'severity': 'high',
+         'description': f'Query on line {i} concatenates request data', 'fix': 'Use parameters'}
+        for i in range(num_bugs)
+    ]
+    text = json.dumps({'has_bugs': True, 'overall_risk': 'high', 'bugs_found': bugs}, indent=2)
+    return text[:-40]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the recovering JSON parser')
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS, help='JSONL corpus of responses')
+    parser.add_argument('--repeat', type=int, default=200, help='Parses per timing')
+    args = parser.parse_args()
+
+    failures = 0
+    print(f"{'case':<26}{'recovered':<12}{'us/parse':>10}")
+    for case in load_corpus(args.corpus):
+        result = recover_json(case['response'])
+        keys = set(result) if isinstance(result, dict) else set()
+        missing = [key for key in case['expected_keys'] if key not in keys]
+        failures += bool(missing)
+        elapsed = time_call(recover_json, case['response'], args.repeat)
+        status = 'ok' if not missing else f"missing {','.join(missing)}"
+        print(f"{case['name']:<26}{status:<12}{elapsed * 1e6:>10.1f}")
+
+    print("\nScaling on truncated responses:")
+    print(f"{'bugs':>6}{'chars':>10}{'ms/parse':>10}{'us/KB':>8}")
+    for num_bugs in (10, 100, 1000):
+        text = long_truncated_response(num_bugs)
+        elapsed = time_call(recover_json, text, max(1, args.repeat // num_bugs))
+        recovered = len(recover_json(text).get('bugs_found', []))
+        print(f"{num_bugs:>6}{len(text):>10}{elapsed * 1e3:>10.2f}{elapsed * 1e6 / (len(text) / 1024):>8.1f}"
+              f"  ({recovered} bugs recovered)")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
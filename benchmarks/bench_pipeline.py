@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+End-to-end throughput benchmark. Generates a synthetic repository, starts the
+fake OpenAI server and runs each pipeline in its own process against it:
+
+  phase1        Phase1Pipeline: clone, preprocess, chunk, embed, upsert
+  analyze       RAGAnalyzer.batch_analyze over the repository's files
+  main          src/main.py, the CI scan entry point
+  batch_api     BatchAnalysisRunner through the files/batches endpoints
+
+Reports files/s, chunks/s, p50/p95 request latency and peak RSS per scenario,
+and compares them with a stored baseline (--save-baseline records one).
+
+With --cassette, every scenario records its OpenAI traffic to a zip archive
+(--cassette-mode record) or replays it without any server
+(--cassette-mode replay), which leaves only the local work to measure.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_repo import generate_repo
+from fake_openai_server import FakeOpenAIServer
+
+SCENARIOS = ('phase1', 'analyze', 'main', 'batch_api')
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+COLLECTION = "neurashield_code_v1"
+RESULT_PREFIX = "BENCH_RESULT "
+
+# metric -> True when higher is better
+COMPARED_METRICS = {
+    'files_per_s': True,
+    'chunks_per_s': True,
+    'latency_p50': False,
+    'latency_p95': False,
+    'peak_rss_mb': False,
+}
+
+
+# --- worker side: runs inside the scenario's own process ----------------
+
+def _repo_samples(repo, limit):
+    samples = []
+    for root, dirs, files in os.walk(repo):
+        dirs[:] = sorted(d for d in dirs if d != '.git')
+        for name in sorted(files):
+            if name.endswith('.py') and name != '__init__.py':
+                path = os.path.join(root, name)
+                with open(path, 'r', encoding='utf-8') as f:
+                    samples.append({'name': os.path.relpath(path, repo), 'code': f.read()})
+    return samples[:limit] if limit else samples
+
+
+def _analyzer(workdir, metrics):
+    from phase_1.vector_store import ChromaVectorStore
+    from phase_1.embedding_generator import EmbeddingGenerator
+    from phase_2.rag_analyzer import RAGAnalyzer
+
+    vector_store = ChromaVectorStore(collection_name=COLLECTION,
+                                     persist_directory=os.path.join(workdir, 'phase_1', 'chroma_db'))
+    return RAGAnalyzer(vector_store, EmbeddingGenerator(metrics=metrics), llm_model="gpt-4o-mini",
+                       use_llm_cache=False, use_retrieval_cache=False, metrics=metrics)
+
+
+def run_worker(scenario, repo, workdir, max_files):
+    from phase_1.metrics import MetricsCollector
+    metrics = MetricsCollector()
+    started = time.perf_counter()
+
+    if scenario == 'phase1':
+        from phase1_pipeline import Phase1Pipeline
+        # Phase1Pipeline persists to phase_1/chroma_db relative to the working directory
+        os.chdir(workdir)
+        pipeline = Phase1Pipeline(repo_url=repo, collection_name=COLLECTION)
+        pipeline.embedding_gen.metrics = metrics
+        try:
+            stats = pipeline.run_pipeline()
+        finally:
+            pipeline.cleanup()
+        files, chunks = stats['files_extracted'], stats['chunks_created']
+
+    elif scenario == 'analyze':
+        samples = _repo_samples(repo, max_files)
+        results = _analyzer(workdir, metrics).batch_analyze(samples)
+        files, chunks = len(results), None
+
+    elif scenario == 'batch_api':
+        from phase_2.batch_runner import BatchAnalysisRunner
+        samples = _repo_samples(repo, max_files)
+        runner = BatchAnalysisRunner(_analyzer(workdir, metrics), work_dir=os.path.join(workdir, 'batch_jobs'),
+                                     poll_interval=0.2)
+        results = runner.run(samples, timeout=600)
+        files, chunks = len(results), None
+
+    else:
+        raise ValueError(f"Unknown worker scenario {scenario}")
+
+    elapsed = time.perf_counter() - started
+    run = metrics.summary(include_files=False)['run']
+    print(RESULT_PREFIX + json.dumps({'wall_s': elapsed, 'files': files, 'chunks': chunks,
+                                      'latency_p50': run['latency_p50'], 'latency_p95': run['latency_p95'],
+                                      'requests': run['requests'], 'errors': run['errors'],
+                                      'retries': run['retries']}))
+
+
+# --- orchestrator side --------------------------------------------------
+
+def _run_measured(command, env, cwd):
+    """Run a child process; returns (stdout, exit code, peak RSS in MB) for that child alone"""
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=env, cwd=cwd,
+                               text=True)
+    output = process.stdout.read()
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak_rss = usage.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+    return output, process.returncode, peak_rss
+
+
+def run_scenario(scenario, repo, workdir, env, max_files, jobs):
+    if scenario == 'main':
+        output_path = os.path.join(workdir, 'main_report.json')
+        metrics_path = os.path.join(workdir, 'main.metrics.json')
+        command = [sys.executable, os.path.join(PROJECT_ROOT, 'src', 'main.py'), '--source-path', repo,
+                   '--output', output_path, '--metrics', metrics_path,
+                   '--db-path', os.path.join(workdir, 'phase_1', 'chroma_db'),
+                   '--jobs', str(jobs), '--model', 'gpt-4o-mini']
+        if max_files:
+            command += ['--max-files', str(max_files)]
+        started = time.perf_counter()
+        output, code, peak_rss = _run_measured(command, env, PROJECT_ROOT)
+        elapsed = time.perf_counter() - started
+        if code != 0:
+            raise RuntimeError(f"main scenario failed:\n{output[-2000:]}")
+        with open(output_path, 'r', encoding='utf-8') as f:
+            report = json.load(f)
+        run = report['metrics']['run']
+        result = {'wall_s': elapsed, 'files': report['statistics']['files_analyzed'], 'chunks': None,
+                  'latency_p50': run['latency_p50'], 'latency_p95': run['latency_p95'],
+                  'requests': run['requests'], 'errors': run['errors'], 'retries': run['retries']}
+    else:
+        command = [sys.executable, os.path.abspath(__file__), '--worker', scenario, '--repo', repo,
+                   '--workdir', workdir, '--max-files', str(max_files or 0)]
+        output, code, peak_rss = _run_measured(command, env, PROJECT_ROOT)
+        lines = [line for line in output.splitlines() if line.startswith(RESULT_PREFIX)]
+        if code != 0 or not lines:
+            raise RuntimeError(f"{scenario} scenario failed:\n{output[-2000:]}")
+        result = json.loads(lines[-1][len(RESULT_PREFIX):])
+
+    wall = result['wall_s'] or 1e-9
+    result['files_per_s'] = round(result['files'] / wall, 3)
+    result['chunks_per_s'] = round(result['chunks'] / wall, 3) if result['chunks'] is not None else None
+    result['peak_rss_mb'] = round(peak_rss, 1)
+    result['wall_s'] = round(result['wall_s'], 3)
+    return result
+
+
+def compare(results, baseline, threshold):
+    """Print each metric against the baseline; returns the regressions beyond threshold"""
+    regressions = []
+    print(f"\n{'scenario':<11}{'metric':<14}{'baseline':>11}{'current':>11}{'change':>9}")
+    for scenario, result in results.items():
+        previous = baseline.get('results', {}).get(scenario)
+        if not previous:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = previous.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            flag = '  REGRESSION' if worse > threshold else ''
+            if flag:
+                regressions.append((scenario, metric, change))
+            print(f"{scenario:<11}{metric:<14}{old:>11.3f}{new:>11.3f}{change:>+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end pipeline benchmark against a fake OpenAI server')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help=f"Comma-separated subset of {SCENARIOS}")
+    parser.add_argument('--files', type=int, default=200, help='Files in the synthetic repository')
+    parser.add_argument('--max-depth', type=int, default=3, help='Package nesting depth')
+    parser.add_argument('--mean-lines', type=int, default=120, help='Mean lines per file')
+    parser.add_argument('--sigma', type=float, default=0.8, help='Log-normal spread of file sizes')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-files', type=int, default=50, help='Files analyzed by the Phase 2 scenarios (0 = all)')
+    parser.add_argument('--jobs', type=int, default=4, help='--jobs for the main scenario')
+    parser.add_argument('--latency', type=float, default=0.05, help='Fake server base latency in seconds')
+    parser.add_argument('--seconds-per-token', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit', type=float, default=None, help='Fake server requests per second')
+    parser.add_argument('--cassette', default=None, help='Record/replay archive shared by all scenarios')
+    parser.add_argument('--cassette-mode', choices=['record', 'replay'], default='replay')
+    parser.add_argument('--replay-latency', type=float, default=0.0, help='Multiple of recorded latency on replay')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='Store these results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=0.15, help='Relative change counted as a regression')
+    parser.add_argument('--output', default=None, help='Write results JSON here')
+    parser.add_argument('--keep', action='store_true', help='Keep the temporary work directory')
+    # Internal: run one scenario inside this process
+    parser.add_argument('--worker', choices=[s for s in SCENARIOS if s != 'main'], help=argparse.SUPPRESS)
+    parser.add_argument('--repo', help=argparse.SUPPRESS)
+    parser.add_argument('--workdir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.repo, args.workdir, args.max_files)
+        return
+
+    scenarios = [s.strip() for s in args.scenarios.split(',') if s.strip()]
+    workdir = tempfile.mkdtemp(prefix='neurashield-bench-')
+    repo = os.path.join(workdir, 'repo')
+    config = {key: getattr(args, key) for key in ('files', 'max_depth', 'mean_lines', 'sigma', 'seed', 'max_files',
+                                                  'jobs', 'latency', 'seconds_per_token', 'error_rate', 'rate_limit')}
+
+    server = FakeOpenAIServer(latency=args.latency, seconds_per_token=args.seconds_per_token,
+                              error_rate=args.error_rate, rate_limit=args.rate_limit, seed=args.seed)
+    env = dict(os.environ, OPENAI_BASE_URL=server.start(), OPENAI_API_KEY='bench-key',  # nosec - placeholder for the local fake server
+               NEURASHIELD_CACHE_DIR=os.path.join(workdir, 'cache'),
+               NEURASHIELD_LLM_CACHE='0', NEURASHIELD_RETRIEVAL_CACHE='0')
+    env.pop('NEURASHIELD_TRACE', None)
+    if args.cassette:
+        env.update(NEURASHIELD_CASSETTE=os.path.abspath(args.cassette), NEURASHIELD_CASSETTE_MODE=args.cassette_mode,
+                   NEURASHIELD_CASSETTE_LATENCY=str(args.replay_latency))
+        config['cassette_mode'] = args.cassette_mode
+
+    results = {}
+    try:
+        repo_stats = generate_repo(repo, num_files=args.files, max_depth=args.max_depth, mean_lines=args.mean_lines,
+                                   sigma=args.sigma, seed=args.seed)
+        print(f"Synthetic repo: {repo_stats['files']} files, {repo_stats['lines']} lines")
+
+        # The Phase 2 scenarios retrieve from the knowledge base phase1 builds
+        if 'phase1' not in scenarios and any(s != 'phase1' for s in scenarios):
+            scenarios.insert(0, 'phase1')
+        for scenario in scenarios:
+            print(f"Running {scenario}...")
+            results[scenario] = run_scenario(scenario, repo, workdir, env, args.max_files, args.jobs)
+            r = results[scenario]
+            chunks = f", {r['chunks_per_s']} chunks/s" if r['chunks_per_s'] is not None else ''
+            print(f"  {r['files']} files in {r['wall_s']}s: {r['files_per_s']} files/s{chunks}, "
+                  f"p50 {r['latency_p50']}s, p95 {r['latency_p95']}s, peak RSS {r['peak_rss_mb']} MB")
+    finally:
+        server.stop()
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+        else:
+            print(f"Work directory kept: {workdir}")
+
+    print(f"Server: {server.stats}")
+    payload = {'config': config, 'results': results, 'server': server.stats}
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, indent=2)
+
+    regressions = []
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('config') != config:
+            print("WARNING: baseline was recorded with a different configuration")
+        regressions = compare(results, baseline, args.threshold)
+    else:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to record one")
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
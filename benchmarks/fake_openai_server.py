@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+Local OpenAI-compatible stand-in for benchmarks. Serves chat completions
+(plain and streamed), embeddings, and the files + batches endpoints the batch
+runner uses, with configurable latency, error rate and a requests-per-second
+limit that answers 429 with Retry-After. Point a client at it with
+OPENAI_BASE_URL=http://host:port/v1.
+"""
+import re
+import json
+import time
+import uuid
+import random
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+RISKY_CODE = re.compile(r'\beval\(|\bexec\(|SELECT .*" \+|shell=True|pickle\.loads|PASSWORD = "')
+CODE_SECTION = re.compile(r'# CODE TO (?:ANALYZE|CLASSIFY)\n(.*)', re.DOTALL)
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _bug_section(risky: bool) -> Dict:
+    bugs = [{'type': 'Injection', 'line': '3', 'description': 'Untrusted input reaches a dangerous sink',
+             'severity': 'high', 'cwe_id': 'CWE-94'}] if risky else []
+    # Same key order as the templates: gating fields first
+    return {'has_bugs': risky, 'overall_risk': 'high' if risky else 'low', 'bugs_found': bugs}
+
+
+def _optimization_section() -> Dict:
+    return {'current_complexity': {'time': 'O(n)', 'space': 'O(n)', 'bottlenecks': []},
+            'optimizations': [{'type': 'syntactic', 'description': 'Use a comprehension',
+                               'improvement': '1.2x'}],
+            'estimated_speedup': '1.2x'}
+
+
+def _security_section(risky: bool) -> Dict:
+    vulnerabilities = [{'type': 'Code Injection', 'cvss_score': 8.1, 'severity': 'HIGH',
+                        'description': 'Dynamic evaluation of input', 'remediation': 'Validate input'}] if risky else []
+    return {'overall_security_score': 3.0 if risky else 9.0, 'overall_severity': 'HIGH' if risky else 'LOW',
+            'vulnerabilities': vulnerabilities, 'risk_summary': 'Synthetic assessment',
+            'immediate_actions': ['Validate input'] if risky else []}
+
+
+def canned_completion(messages) -> str:
+    """A well-formed answer for whichever NeuraShield template the prompt came from"""
+    prompt = messages[-1].get('content', '') if messages else ''
+    code = CODE_SECTION.search(prompt)
+    risky = bool(RISKY_CODE.search(code.group(1) if code else prompt))
+
+    if '"bug_analysis"' in prompt:
+        result = {'bug_analysis': _bug_section(risky), 'security_analysis': _security_section(risky),
+                  'optimization_analysis': _optimization_section()}
+    elif 'suspicion_score' in prompt:
+        result = {'suspicion_score': 0.9 if risky else 0.1, 'reason': 'synthetic triage'}
+    elif 'overall_security_score' in prompt:
+        result = _security_section(risky)
+    elif 'estimated_speedup' in prompt:
+        result = _optimization_section()
+    else:
+        result = _bug_section(risky)
+    return json.dumps(result)
+
+
+def fake_embedding(text: str, dims: int):
+    """Deterministic unit vector per text, so retrieval results are stable run to run"""
+    rng = random.Random(hashlib.sha256(text.encode('utf-8')).digest())
+    vector = [rng.gauss(0, 1) for _ in range(dims)]
+    norm = sum(v * v for v in vector) ** 0.5 or 1.0
+    return [v / norm for v in vector]
+
+
+class FakeOpenAIServer:
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.05,
+                 seconds_per_token: float = 0.0, jitter: float = 0.5, error_rate: float = 0.0,
+                 rate_limit: Optional[float] = None, embedding_dims: int = 1536, seed: int = 0):
+        self.latency = latency
+        self.seconds_per_token = seconds_per_token
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.embedding_dims = embedding_dims
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+        self.files: Dict[str, bytes] = {}
+        self.batches: Dict[str, Dict] = {}
+        self.seen_prefixes = set()
+        self.stats = {'requests': 0, 'rate_limited': 0, 'errors': 0}
+
+        # Token bucket: rate_limit requests per second, bursts up to one second's worth
+        self._tokens = rate_limit or 0.0
+        self._refilled = time.monotonic()
+
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> str:
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='fake-openai', daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    # --- behaviour ------------------------------------------------------
+
+    def admit(self) -> Optional[tuple]:
+        """None to serve the request, else (status, retry_after_seconds)"""
+        with self.lock:
+            self.stats['requests'] += 1
+            if self.rate_limit:
+                now = time.monotonic()
+                self._tokens = min(self.rate_limit, self._tokens + (now - self._refilled) * self.rate_limit)
+                self._refilled = now
+                if self._tokens < 1:
+                    self.stats['rate_limited'] += 1
+                    return 429, (1 - self._tokens) / self.rate_limit
+                self._tokens -= 1
+            if self.error_rate and self.rng.random() < self.error_rate:
+                self.stats['errors'] += 1
+                return 500, None
+        return None
+
+    def delay(self, output_tokens: int = 0) -> float:
+        with self.lock:
+            spread = self.rng.uniform(1 - self.jitter, 1 + self.jitter) if self.jitter else 1.0
+        return max(0.0, self.latency * spread + output_tokens * self.seconds_per_token)
+
+    def completion(self, body: Dict) -> Dict:
+        messages = body.get('messages') or []
+        content = canned_completion(messages)
+        prompt_text = ''.join(m.get('content', '') for m in messages)
+        prompt_tokens = _tokens(prompt_text)
+
+        # Mimic provider prefix caching: a repeated 1024+ token prefix is reported as cached
+        prefix = hashlib.sha256(prompt_text[:4096].encode('utf-8')).hexdigest()
+        with self.lock:
+            cached = prefix in self.seen_prefixes
+            self.seen_prefixes.add(prefix)
+        cached_tokens = (min(prompt_tokens, 1024) // 128) * 128 if cached and prompt_tokens >= 1024 else 0
+
+        completion_tokens = _tokens(content)
+        return {
+            'id': f"chatcmpl-{uuid.uuid4().hex[:24]}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model', 'fake-model'),
+            'choices': [{'index': 0, 'finish_reason': 'stop',
+                         'message': {'role': 'assistant', 'content': content}}],
+            'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                      'total_tokens': prompt_tokens + completion_tokens,
+                      'prompt_tokens_details': {'cached_tokens': cached_tokens}},
+        }
+
+    def embeddings(self, body: Dict) -> Dict:
+        inputs = body.get('input')
+        inputs = [inputs] if isinstance(inputs, str) else list(inputs or [])
+        tokens = sum(_tokens(text) for text in inputs)
+        return {
+            'object': 'list',
+            'model': body.get('model', 'fake-embedding'),
+            'data': [{'object': 'embedding', 'index': i, 'embedding': fake_embedding(text, self.embedding_dims)}
+                     for i, text in enumerate(inputs)],
+            'usage': {'prompt_tokens': tokens, 'total_tokens': tokens},
+        }
+
+    def create_file(self, filename: str, purpose: str, content: bytes) -> Dict:
+        file_id = f"file-{uuid.uuid4().hex[:24]}"
+        with self.lock:
+            self.files[file_id] = content
+        return {'id': file_id, 'object': 'file', 'bytes': len(content), 'created_at': int(time.time()),
+                'filename': filename, 'purpose': purpose, 'status': 'processed'}
+
+    def create_batch(self, body: Dict) -> Dict:
+        batch = {
+            'id': f"batch_{uuid.uuid4().hex[:24]}", 'object': 'batch', 'endpoint': body.get('endpoint'),
+            'input_file_id': body.get('input_file_id'), 'completion_window': body.get('completion_window', '24h'),
+            'status': 'in_progress', 'created_at': int(time.time()), 'output_file_id': None,
+            'error_file_id': None, 'metadata': body.get('metadata'),
+            'request_counts': {'total': 0, 'completed': 0, 'failed': 0},
+        }
+        with self.lock:
+            self.batches[batch['id']] = batch
+        threading.Thread(target=self._run_batch, args=(batch,), daemon=True).start()
+        return dict(batch)
+
+    def _run_batch(self, batch: Dict):
+        lines = [json.loads(line) for line in self.files.get(batch['input_file_id'], b'').decode('utf-8').splitlines()
+                 if line.strip()]
+        batch['request_counts']['total'] = len(lines)
+        output, errors = [], []
+        for request in lines:
+            time.sleep(self.delay() / 10)
+            if self.batch_request_fails(request):
+                # Failed requests go to the batch's error file, as the real endpoint does
+                errors.append(json.dumps({
+                    'id': f"batch_req_{uuid.uuid4().hex[:16]}",
+                    'custom_id': request['custom_id'],
+                    'response': None,
+                    'error': {'code': 'server_error', 'message': 'Injected batch request failure'},
+                }))
+                batch['request_counts']['failed'] += 1
+                continue
+            output.append(json.dumps({
+                'id': f"batch_req_{uuid.uuid4().hex[:16]}",
+                'custom_id': request['custom_id'],
+                'response': {'status_code': 200, 'request_id': uuid.uuid4().hex,
+                             'body': self.completion(request['body'])},
+                'error': None,
+            }))
+            batch['request_counts']['completed'] += 1
+        if output:
+            output_file = self.create_file('batch_output.jsonl', 'batch_output', ('\n'.join(output) + '\n').encode('utf-8'))
+            batch['output_file_id'] = output_file['id']
+        if errors:
+            error_file = self.create_file('batch_errors.jsonl', 'batch_output', ('\n'.join(errors) + '\n').encode('utf-8'))
+            batch['error_file_id'] = error_file['id']
+        batch['status'] = 'completed'
+
+    def batch_request_fails(self, request: Dict) -> bool:
+        """Whether a batch line lands in the error file; override for targeted failures"""
+        with self.lock:
+            return bool(self.error_rate) and self.rng.random() < self.error_rate
+
+    # --- HTTP -----------------------------------------------------------
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def _body(self) -> bytes:
+                return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+            def _send_json(self, payload: Dict, status: int = 200, headers: Optional[Dict] = None):
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_chunk(self, data: bytes):
+                self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+
+            def _stream(self, completion: Dict, include_usage: bool):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+
+                content = completion['choices'][0]['message']['content']
+                base = {'id': completion['id'], 'object': 'chat.completion.chunk',
+                        'created': completion['created'], 'model': completion['model']}
+                pieces = [content[i:i + 16] for i in range(0, len(content), 16)]
+                per_piece = server.seconds_per_token * 4
+                try:
+                    for index, piece in enumerate(pieces):
+                        delta = {'content': piece} if index else {'role': 'assistant', 'content': piece}
+                        chunk = dict(base, choices=[{'index': 0, 'delta': delta, 'finish_reason': None}])
+                        self._send_chunk(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+                        if per_piece:
+                            time.sleep(per_piece)
+                    final = dict(base, choices=[{'index': 0, 'delta': {}, 'finish_reason': 'stop'}])
+                    self._send_chunk(f"data: {json.dumps(final)}\n\n".encode('utf-8'))
+                    if include_usage:
+                        usage = dict(base, choices=[], usage=completion['usage'])
+                        self._send_chunk(f"data: {json.dumps(usage)}\n\n".encode('utf-8'))
+                    self._send_chunk(b"data: [DONE]\n\n")
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client closed the stream early (early-stop on gating fields)
+                    self.close_connection = True
+
+            def _refuse(self, refusal: tuple):
+                status, retry_after = refusal
+                headers = {}
+                if retry_after is not None:
+                    headers = {'retry-after': str(max(1, round(retry_after))),
+                               'retry-after-ms': str(int(retry_after * 1000))}
+                message = 'Rate limit reached' if status == 429 else 'Injected server error'
+                self._send_json({'error': {'message': message, 'type': 'fake_error', 'code': None}},
+                                status=status, headers=headers)
+
+            def do_POST(self):
+                path = self.path.split('?')[0]
+                raw = self._body()
+
+                if path == '/v1/files':
+                    return self._send_json(self._upload(raw))
+
+                body = json.loads(raw or b'{}')
+                if path == '/v1/batches':
+                    return self._send_json(server.create_batch(body))
+
+                refusal = server.admit()
+                if refusal is not None:
+                    return self._refuse(refusal)
+
+                if path == '/v1/chat/completions':
+                    completion = server.completion(body)
+                    time.sleep(server.delay(0 if body.get('stream') else completion['usage']['completion_tokens']))
+                    if body.get('stream'):
+                        include_usage = bool((body.get('stream_options') or {}).get('include_usage'))
+                        return self._stream(completion, include_usage)
+                    return self._send_json(completion)
+
+                if path == '/v1/embeddings':
+                    time.sleep(server.delay())
+                    return self._send_json(server.embeddings(body))
+
+                self._send_json({'error': {'message': f"Unknown path {path}"}}, status=404)
+
+            def do_GET(self):
+                path = self.path.split('?')[0]
+                match = re.fullmatch(r'/v1/batches/([\w-]+)', path)
+                if match and match.group(1) in server.batches:
+                    return self._send_json(dict(server.batches[match.group(1)]))
+
+                match = re.fullmatch(r'/v1/files/([\w-]+)/content', path)
+                if match and match.group(1) in server.files:
+                    data = server.files[match.group(1)]
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'application/octet-stream')
+                    self.send_header('Content-Length', str(len(data)))
+                    self.end_headers()
+                    return self.wfile.write(data)
+
+                self._send_json({'error': {'message': f"Unknown path {path}"}}, status=404)
+
+            def _upload(self, raw: bytes) -> Dict:
+                """Minimal multipart/form-data parsing for the files endpoint"""
+                boundary = re.search(r'boundary=("?)([^";]+)\1', self.headers.get('Content-Type', ''))
+                fields, content, filename = {}, b'', 'upload.jsonl'
+                for part in raw.split(b'--' + boundary.group(2).encode('latin-1')) if boundary else []:
+                    head, _, data = part.partition(b'\r\n\r\n')
+                    name = re.search(rb'name="([^"]+)"', head)
+                    if not name:
+                        continue
+                    data = data[:-2] if data.endswith(b'\r\n') else data
+                    if name.group(1) == b'file':
+                        content = data
+                        found = re.search(rb'filename="([^"]*)"', head)
+                        filename = found.group(1).decode('utf-8') if found else filename
+                    else:
+                        fields[name.group(1).decode('utf-8')] = data.decode('utf-8')
+                return server.create_file(filename, fields.get('purpose', 'batch'), content)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a local OpenAI-compatible stub server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8787)
+    parser.add_argument('--latency', type=float, default=0.05, help='Base seconds per request')
+    parser.add_argument('--seconds-per-token', type=float, default=0.0, help='Extra seconds per output token')
+    parser.add_argument('--jitter', type=float, default=0.5, help='Relative latency spread (0-1)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests answered with HTTP 500')
+    parser.add_argument('--rate-limit', type=float, default=None, help='Requests per second before HTTP 429')
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(args.host, args.port, latency=args.latency, seconds_per_token=args.seconds_per_token,
+                              jitter=args.jitter, error_rate=args.error_rate, rate_limit=args.rate_limit)
+    print(f"Serving on {server.base_url} (Ctrl+C to stop)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Synthetic Python repositories for benchmarks: configurable file count,
+package nesting and a log-normal file-size distribution, with a share of
+files seeded with the risky patterns the static rules and triage look for.
+Output is deterministic for a given seed.
+"""
+import os
+import math
+import random
+import argparse
+import subprocess
+
+SAFE_FUNCTION = '''def {name}(items, limit={limit}):
+    """Return the first items above the threshold"""
+    selected = []
+    for index, item in enumerate(items):
+        if index >= limit:
+            break
+        if item > {threshold}:
+            selected.append(item * {factor})
+    return selected
+'''
+
+RISKY_FUNCTIONS = [
+    '''def {name}(cursor, user_id):
+    query = "SELECT * FROM users WHERE id = " + str(user_id)
+    cursor.execute(query)
+    return cursor.fetchall()
+''',
+    '''def {name}(expression):
+    return eval(expression)
+''',
+    '''def {name}(host):
+    import subprocess
+    return subprocess.check_output("ping -c 1 " + host, shell=True)
+''',
+    '''def {name}(payload):
+    import pickle
+    return pickle.loads(payload)
+''',
+]
+
+CLASS_TEMPLATE = '''class {name}:
+    def __init__(self, values):
+        self.values = list(values)
+        self.cache = {{}}
+
+    def total(self):
+        return sum(self.values)
+
+    def lookup(self, key):
+        if key not in self.cache:
+            self.cache[key] = [v for v in self.values if v == key]
+        return self.cache[key]
+'''
+
+HEADER = '''import os
+import json
+from typing import Dict, List
+
+'''
+HARDCODED_SECRET = 'API_PASSWORD = "hunter2"\n\n'  # nosec - planted finding for the risky modules
+
+
+def _file_lines(rng: random.Random, mean_lines: int, sigma: float) -> int:
+    # Log-normal with the requested mean: a few large modules, many small ones
+    mu = math.log(mean_lines) - sigma ** 2 / 2
+    return max(5, min(5000, int(rng.lognormvariate(mu, sigma))))
+
+
+def _module_source(rng: random.Random, target_lines: int, risky: bool, index: int) -> str:
+    parts = [HEADER + (HARDCODED_SECRET if risky else '')]
+    lines = parts[0].count('\n')
+    block = 0
+    while lines < target_lines:
+        name = f"func_{index}_{block}"
+        if risky and block % 4 == 1:
+            source = rng.choice(RISKY_FUNCTIONS).format(name=name)
+        elif block % 5 == 4:
+            source = CLASS_TEMPLATE.format(name=f"Model{index}x{block}")
+        else:
+            source = SAFE_FUNCTION.format(name=name, limit=rng.randint(5, 500),
+                                          threshold=rng.randint(0, 100), factor=rng.randint(2, 9))
+        parts.append(source + '\n\n')
+        lines += source.count('\n') + 2
+        block += 1
+    return ''.join(parts)
+
+
+def generate_repo(root: str, num_files: int = 200, max_depth: int = 3, mean_lines: int = 120,
+                  sigma: float = 0.8, risky_ratio: float = 0.2, seed: int = 0, git_init: bool = True) -> dict:
+    """Write the repository under root and return its file/line counts"""
+    rng = random.Random(seed)
+    total_lines = 0
+
+    for index in range(num_files):
+        depth = rng.randint(0, max_depth)
+        package = [f"pkg{rng.randint(0, 3)}"] + [f"sub{rng.randint(0, 2)}" for _ in range(depth)]
+        directory = os.path.join(root, *package[:depth]) if depth else root
+        os.makedirs(directory, exist_ok=True)
+
+        # Make every level importable, as in a real project
+        current = root
+        for part in package[:depth]:
+            current = os.path.join(current, part)
+            init = os.path.join(current, '__init__.py')
+            if not os.path.exists(init):
+                open(init, 'w').close()
+
+        source = _module_source(rng, _file_lines(rng, mean_lines, sigma), rng.random() < risky_ratio, index)
+        with open(os.path.join(directory, f"module_{index}.py"), 'w', encoding='utf-8') as f:
+            f.write(source)
+        total_lines += source.count('\n')
+
+    if git_init:
+        # Phase1Pipeline clones its input, and a local path clones like any remote
+        git = ['git', '-C', root, '-c', 'user.name=bench', '-c', 'user.email=bench@localhost']
+        subprocess.run(git[:3] + ['init', '-q'], check=True)
+        subprocess.run(git[:3] + ['add', '-A'], check=True)
+        subprocess.run(git + ['commit', '-q', '-m', 'synthetic repository'], check=True)
+
+    return {'path': root, 'files': num_files, 'lines': total_lines, 'seed': seed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic Python repository')
+    parser.add_argument('root', help='Directory to create')
+    parser.add_argument('--files', type=int, default=200)
+    parser.add_argument('--max-depth', type=int, default=3)
+    parser.add_argument('--mean-lines', type=int, default=120)
+    parser.add_argument('--sigma', type=float, default=0.8, help='Log-normal spread of file sizes')
+    parser.add_argument('--risky-ratio', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-git', action='store_true')
+    args = parser.parse_args()
+
+    stats = generate_repo(args.root, num_files=args.files, max_depth=args.max_depth, mean_lines=args.mean_lines,
+                          sigma=args.sigma, risky_ratio=args.risky_ratio, seed=args.seed, git_init=not args.no_git)
+    print(f"Generated {stats['files']} files, {stats['lines']} lines under {stats['path']}")
+
+
+if __name__ == '__main__':
+    main()
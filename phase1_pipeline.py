@@ -18,6 +18,7 @@ from phase_1.code_preprocessor import CodePreprocessor
 from phase_1.code_chunker import CodeChunker
 from phase_1.embedding_generator import EmbeddingGenerator
 from phase_1.vector_store import ChromaVectorStore
+from phase_1.tracing import span, tracer
 
 
 class Phase1Pipeline:
@@ -37,33 +38,37 @@ class Phase1Pipeline:
         stats = {'repo_url': self.repo_url, 'files_extracted': 0, 'chunks_created': 0, 
                 'embeddings_generated': 0, 'stored_in_db': 0}
 
-        code_files = self.extractor.extract_python_files()
+        with span('extract'):
+            code_files = self.extractor.extract_python_files()
         stats['files_extracted'] = len(code_files)
 
         if not code_files:
             return stats
 
-        for file_data in code_files:
-            result = self.preprocessor.preprocess(file_data['source_code'], remove_comments=remove_comments)
-            file_data['cleaned_code'] = result['cleaned_code']
-            file_data['complexity_score'] = result['complexity_score']
-            file_data['reduction_percentage'] = result['reduction_percentage']
+        with span('preprocess', files=len(code_files)):
+            for file_data in code_files:
+                result = self.preprocessor.preprocess(file_data['source_code'], remove_comments=remove_comments)
+                file_data['cleaned_code'] = result['cleaned_code']
+                file_data['complexity_score'] = result['complexity_score']
+                file_data['reduction_percentage'] = result['reduction_percentage']
 
         all_chunks = []
-        for file_data in code_files:
-            chunks = self.chunker.chunk_by_function(
-                file_data['cleaned_code'], file_data['file_path'], max_tokens=max_tokens_per_chunk
-            )
-            for chunk in chunks:
-                chunk['file_metadata'] = {
-                    'complexity_score': file_data['complexity_score'],
-                    'loc': file_data['loc'],
-                    'functions': file_data.get('functions', []),
-                    'classes': file_data.get('classes', []),
-                    'imports': file_data.get('imports', [])
-                }
-                chunk['language'] = 'python'
-            all_chunks.extend(chunks)
+        with span('chunk', files=len(code_files)) as chunk_span:
+            for file_data in code_files:
+                chunks = self.chunker.chunk_by_function(
+                    file_data['cleaned_code'], file_data['file_path'], max_tokens=max_tokens_per_chunk
+                )
+                for chunk in chunks:
+                    chunk['file_metadata'] = {
+                        'complexity_score': file_data['complexity_score'],
+                        'loc': file_data['loc'],
+                        'functions': file_data.get('functions', []),
+                        'classes': file_data.get('classes', []),
+                        'imports': file_data.get('imports', [])
+                    }
+                    chunk['language'] = 'python'
+                all_chunks.extend(chunks)
+            chunk_span.set(chunks=len(all_chunks))
 
         stats['chunks_created'] = len(all_chunks)
 
@@ -71,10 +76,12 @@ class Phase1Pipeline:
         cost_estimate = self.embedding_gen.estimate_cost(total_tokens)
         print(f"Tokens: {total_tokens:,} | Cost: {cost_estimate['estimated_cost_usd']}")
 
-        enriched_chunks = self.embedding_gen.generate_batch_embeddings(all_chunks, batch_size=batch_size)
+        with span('embed', chunks=len(all_chunks)):
+            enriched_chunks = self.embedding_gen.generate_batch_embeddings(all_chunks, batch_size=batch_size)
         stats['embeddings_generated'] = len(enriched_chunks)
 
-        self.vector_store.upsert_chunks(enriched_chunks)
+        with span('upsert', chunks=len(enriched_chunks)):
+            self.vector_store.upsert_chunks(enriched_chunks)
         stats['stored_in_db'] = self.vector_store.collection.count()
 
         print(f"Pipeline complete: {stats['files_extracted']} files | {stats['chunks_created']} chunks | {stats['stored_in_db']} in DB")
@@ -99,4 +106,7 @@ if __name__ == "__main__":
     except Exception as e:
         print(f"Pipeline failed: {e}")
     finally:
-        pipeline.cleanup()
\ No newline at end of file
+        pipeline.cleanup()
+        # Set NEURASHIELD_TRACE=trace.json to open the run in ui.perfetto.dev
+        if tracer.enabled:
+            print(f"Trace: {tracer.export()}")
\ No newline at end of file
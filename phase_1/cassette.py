@@ -0,0 +1,254 @@
+import os
+import json
+import time
+import array
+import atexit
+import base64
+import hashlib
+import zipfile
+import threading
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+# NEURASHIELD_CASSETTE=<archive> records/replays every OpenAI call in the process;
+# NEURASHIELD_CASSETTE_MODE picks record or replay, NEURASHIELD_CASSETTE_LATENCY scales replay delays
+CASSETTE_ENV = "NEURASHIELD_CASSETTE"
+MODES = ('record', 'replay')
+
+# Per-attempt arguments that do not change what the model is asked
+_UNKEYED_ARGS = ('timeout', 'extra_headers')
+
+
+class CassetteMiss(LookupError):
+    """A replayed request that was never recorded"""
+    # Lets RetryPolicy treat a miss as fatal instead of retrying it
+    status_code = 404
+
+
+def _namespace(value: Any) -> Any:
+    """Recorded JSON -> attribute access, the shape the SDK response objects have"""
+    if isinstance(value, dict):
+        return SimpleNamespace(**{key: _namespace(item) for key, item in value.items()})
+    if isinstance(value, list) and value and isinstance(value[0], (dict, list)):
+        return [_namespace(item) for item in value]
+    return value
+
+
+def _dump(response: Any) -> Any:
+    # Every field, unset ones included: a replayed delta must still have .content
+    if hasattr(response, 'model_dump'):
+        return response.model_dump()
+    return response
+
+
+def _pack_embeddings(response: Dict) -> Dict:
+    # float32 is the precision the API serves; base64 keeps a 1536-d vector at ~8 KB instead of ~30 KB of text
+    packed = dict(response)
+    packed['data'] = [
+        dict(item, embedding={'f32': base64.b64encode(array.array('f', item['embedding']).tobytes()).decode('ascii')})
+        if isinstance(item.get('embedding'), list) else item
+        for item in response.get('data') or []
+    ]
+    return packed
+
+
+def _unpack_embeddings(response: Dict) -> Dict:
+    for item in response.get('data') or []:
+        packed = item.get('embedding')
+        if isinstance(packed, dict) and 'f32' in packed:
+            vector = array.array('f')
+            vector.frombytes(base64.b64decode(packed['f32']))
+            item['embedding'] = vector.tolist()
+    return response
+
+
+class Cassette:
+    """
+    Records OpenAI responses into a zip archive and replays them without the
+    network. Each interaction is one deflated JSON member named by a hash of
+    its request, so the zip directory doubles as the lookup index.
+
+    record  serves requests already in the archive and records the rest
+    replay  serves only from the archive; an unrecorded request raises CassetteMiss
+
+    latency_scale=0 replays at full speed; 1.0 reproduces the recorded latencies.
+    """
+
+    def __init__(self, path: str, mode: str = "replay", latency_scale: float = 0.0):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cassette mode {mode!r}; expected one of {MODES}")
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+        self._lock = threading.Lock()
+
+        if mode == 'replay':
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"No cassette at {path}")
+            self._archive = zipfile.ZipFile(path, 'r')
+        else:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Append mode reads back members it has written, so one handle serves both directions
+            self._archive = zipfile.ZipFile(path, 'a', compression=zipfile.ZIP_DEFLATED)
+            atexit.register(self.close)
+        self._index = set(self._archive.namelist())
+
+    @staticmethod
+    def request_key(endpoint: str, kwargs: Dict) -> str:
+        body = {key: value for key, value in kwargs.items() if key not in _UNKEYED_ARGS}
+        payload = json.dumps([endpoint, body], sort_keys=True, default=str, ensure_ascii=False)
+        return f"{endpoint}/{hashlib.sha256(payload.encode('utf-8')).hexdigest()}.json"
+
+    def lookup(self, name: str) -> Optional[Dict]:
+        with self._lock:
+            if name not in self._index:
+                self.misses += 1
+                return None
+            self.hits += 1
+            data = self._archive.read(name)
+        return json.loads(data)
+
+    def store(self, name: str, entry: Dict):
+        data = json.dumps(entry, separators=(',', ':'), ensure_ascii=False)
+        with self._lock:
+            # Concurrent misses on the same request both reach the API; keep the first answer
+            if name in self._index or self._archive.fp is None:
+                return
+            self._archive.writestr(name, data)
+            self._index.add(name)
+            self.recorded += 1
+
+    def close(self):
+        """Finish the archive; a recording is only replayable once its zip directory is written"""
+        with self._lock:
+            self._archive.close()
+
+    def stats(self) -> Dict:
+        return {'path': self.path, 'mode': self.mode, 'hits': self.hits, 'misses': self.misses,
+                'recorded': self.recorded, 'entries': len(self._index)}
+
+    def wrap(self, client) -> 'CassetteClient':
+        """client may be None when replaying without an API key"""
+        return CassetteClient(self, client)
+
+    def _delay(self, seconds: float):
+        if self.latency_scale and seconds:
+            time.sleep(seconds * self.latency_scale)
+
+
+class _RecordingStream:
+    """Passes a live stream through while keeping the chunks the caller consumed"""
+
+    def __init__(self, cassette: Cassette, name: str, stream, started: float):
+        self.cassette = cassette
+        self.name = name
+        self.stream = stream
+        self.started = started
+        self.first_chunk = None
+        self.chunks: List[Dict] = []
+
+    def __iter__(self):
+        for chunk in self.stream:
+            if self.first_chunk is None:
+                self.first_chunk = time.perf_counter() - self.started
+            self.chunks.append(_dump(chunk))
+            yield chunk
+
+    def close(self):
+        self.stream.close()
+        # A stream stopped early is stored as consumed; replaying the same request stops at the same point
+        if self.chunks:
+            self.cassette.store(self.name, {'latency': time.perf_counter() - self.started,
+                                            'first_chunk': self.first_chunk, 'chunks': self.chunks})
+
+
+class _ReplayStream:
+    def __init__(self, cassette: Cassette, entry: Dict):
+        self.cassette = cassette
+        self.entry = entry
+
+    def __iter__(self):
+        chunks = self.entry['chunks']
+        first = self.entry.get('first_chunk') or 0.0
+        between = max(self.entry.get('latency', 0.0) - first, 0.0) / max(len(chunks) - 1, 1)
+        for index, chunk in enumerate(chunks):
+            self.cassette._delay(first if index == 0 else between)
+            yield _namespace(chunk)
+
+    def close(self):
+        pass
+
+
+class CassetteClient:
+    """
+    Stands in for the OpenAI client: embeddings.create and chat.completions.create
+    go through the cassette, everything else (files, batches) reaches the real client.
+    """
+
+    def __init__(self, cassette: Cassette, client):
+        self._cassette = cassette
+        self._client = client
+        self.embeddings = SimpleNamespace(create=self._create_embeddings)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create_completion))
+
+    def __getattr__(self, name):
+        if self._client is None:
+            raise CassetteMiss(f"'{name}' is not recorded and there is no live client to pass it to")
+        return getattr(self._client, name)
+
+    def _live(self, name: str):
+        if self._cassette.mode == 'replay' or self._client is None:
+            raise CassetteMiss(f"No recorded response for {name} in {self._cassette.path}")
+
+    def _create_embeddings(self, **kwargs):
+        name = Cassette.request_key('embeddings', kwargs)
+        entry = self._cassette.lookup(name)
+        if entry is None:
+            self._live(name)
+            started = time.perf_counter()
+            response = self._client.embeddings.create(**kwargs)
+            self._cassette.store(name, {'latency': time.perf_counter() - started,
+                                        'response': _pack_embeddings(_dump(response))})
+            return response
+
+        self._cassette._delay(entry.get('latency', 0.0))
+        return _namespace(_unpack_embeddings(entry['response']))
+
+    def _create_completion(self, **kwargs):
+        name = Cassette.request_key('chat', kwargs)
+        entry = self._cassette.lookup(name)
+        if entry is None:
+            self._live(name)
+            started = time.perf_counter()
+            response = self._client.chat.completions.create(**kwargs)
+            if kwargs.get('stream'):
+                return _RecordingStream(self._cassette, name, response, started)
+            self._cassette.store(name, {'latency': time.perf_counter() - started, 'response': _dump(response)})
+            return response
+
+        if 'chunks' in entry:
+            return _ReplayStream(self._cassette, entry)
+        self._cassette._delay(entry.get('latency', 0.0))
+        return _namespace(entry['response'])
+
+
+_active: Optional[Cassette] = None
+_active_lock = threading.Lock()
+
+
+def active_cassette() -> Optional[Cassette]:
+    """The process-wide cassette named by NEURASHIELD_CASSETTE, shared so every client writes one archive"""
+    global _active
+    path = os.getenv(CASSETTE_ENV)
+    if not path:
+        return None
+    with _active_lock:
+        if _active is None or _active.path != path:
+            _active = Cassette(path, mode=os.getenv("NEURASHIELD_CASSETTE_MODE", "replay"),
+                               latency_scale=float(os.getenv("NEURASHIELD_CASSETTE_LATENCY", "0")))
+        return _active
@@ -109,6 +109,7 @@ class CodeChunker:
         current_chunk = []
         current_tokens = 0
         part_num = 1
+        part_start = line_start
 
         for line in lines:
             line_tokens = self.count_tokens(line + '\n')
@@ -120,11 +121,13 @@ class CodeChunker:
                     'type': f'{chunk_type}_part',
                     'name': f"{name}_part_{part_num}",
                     'file_path': file_path,
-                    'line_start': line_start,
+                    'line_start': part_start,
+                    'line_end': part_start + len(current_chunk) - 1,
                     'token_count': current_tokens,
                     'parent_name': name
                 })
                 part_num += 1
+                part_start += len(current_chunk)
                 current_chunk = [line]
                 current_tokens = line_tokens
             else:
@@ -138,7 +141,8 @@ class CodeChunker:
                 'type': f'{chunk_type}_part',
                 'name': f"{name}_part_{part_num}",
                 'file_path': file_path,
-                'line_start': line_start,
+                'line_start': part_start,
+                'line_end': part_start + len(current_chunk) - 1,
                 'token_count': self.count_tokens(chunk_code),
                 'parent_name': name
             })
@@ -151,6 +155,7 @@ class CodeChunker:
         current_chunk = []
         current_tokens = 0
         chunk_num = 1
+        chunk_start = 1
 
         for line in lines:
             line_tokens = self.count_tokens(line + '\n')
@@ -163,9 +168,12 @@ class CodeChunker:
                     'name': f"{file_path}_chunk_{chunk_num}",
                     'file_path': file_path,
                     'chunk_index': chunk_num - 1,
+                    'line_start': chunk_start,
+                    'line_end': chunk_start + len(current_chunk) - 1,
                     'token_count': current_tokens
                 })
                 chunk_num += 1
+                chunk_start += len(current_chunk)
                 current_chunk = [line]
                 current_tokens = line_tokens
             else:
@@ -180,6 +188,8 @@ class CodeChunker:
                 'name': f"{file_path}_chunk_{chunk_num}",
                 'file_path': file_path,
                 'chunk_index': chunk_num - 1,
+                'line_start': chunk_start,
+                'line_end': chunk_start + len(current_chunk) - 1,
                 'token_count': self.count_tokens(chunk_code)
             })
 
@@ -8,6 +8,11 @@ import tempfile
 import shutil
 import subprocess
 
+try:
+    from phase_1.tracing import span
+except ImportError:
+    from tracing import span
+
 
 class GitHubCodeExtractor:
     def __init__(self, repo_url: str, target_dir: Optional[str] = None):
@@ -17,12 +22,13 @@ class GitHubCodeExtractor:
 
     def clone_repository(self) -> Path:
         try:
-            subprocess.run(
-                ['git', 'clone', self.repo_url, self.target_dir], 
-                check=True, 
-                stdout=subprocess.DEVNULL, 
-                stderr=subprocess.DEVNULL
-            )
+            with span('clone', repo=self.repo_url):
+                subprocess.run(
+                    ['git', 'clone', self.repo_url, self.target_dir], 
+                    check=True, 
+                    stdout=subprocess.DEVNULL, 
+                    stderr=subprocess.DEVNULL
+                )
             self.repo_path = Path(self.target_dir)
             return self.repo_path
         except Exception as e:
@@ -2,27 +2,55 @@
 import os
 import json
 from openai import OpenAI
-from typing import List, Dict
+from typing import List, Dict, Optional
 import time
 
+try:
+    from phase_1.metrics import MetricsCollector, MODEL_PRICES
+    from phase_1.tracing import span
+    from phase_1.cassette import Cassette, active_cassette
+except ImportError:
+    from metrics import MetricsCollector, MODEL_PRICES
+    from tracing import span
+    from cassette import Cassette, active_cassette
+
 
 class EmbeddingGenerator:
-    def __init__(self, model: str = "text-embedding-3-small", api_key: str = None):
+    def __init__(self, model: str = "text-embedding-3-small", api_key: str = None,
+                 metrics: Optional[MetricsCollector] = None, cassette: Optional[Cassette] = None):
         self.model = model
+        self.metrics = metrics
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        # Record responses to, or replay them from, an archive (default: NEURASHIELD_CASSETTE)
+        self.cassette = cassette or active_cassette()
+        replaying = self.cassette is not None and self.cassette.mode == 'replay'
 
-        if not self.api_key:
+        if not self.api_key and not replaying:
             raise ValueError("OpenAI API key not found. Set OPENAI_API_KEY environment variable.")
 
-        self.client = OpenAI(api_key=self.api_key)
+        self.client = OpenAI(api_key=self.api_key) if self.api_key else None
+        if self.cassette is not None:
+            self.client = self.cassette.wrap(self.client)
         self.dimensions = 1536 if "small" in model else 3072
 
+    def _record(self, started: float, response=None, error: Optional[Exception] = None):
+        if self.metrics is None:
+            return
+        usage = getattr(response, 'usage', None)
+        self.metrics.record('embedding', self.model, time.perf_counter() - started,
+                            prompt_tokens=getattr(usage, 'prompt_tokens', 0) or 0,
+                            error=str(error) if error else None)
+
     def generate_embedding(self, text: str) -> List[float]:
+        started = time.perf_counter()
         try:
-            response = self.client.embeddings.create(input=text, model=self.model)
-            return response.data[0].embedding
+            with span('embed_query', 'api', model=self.model):
+                response = self.client.embeddings.create(input=text, model=self.model)
         except Exception as e:
+            self._record(started, error=e)
             raise RuntimeError(f"Error generating embedding: {e}")
+        self._record(started, response)
+        return response.data[0].embedding
 
     def generate_batch_embeddings(self, chunks: List[Dict], batch_size: int = 100, 
                                   delay_seconds: float = 0.1) -> List[Dict]:
@@ -32,9 +60,12 @@ class EmbeddingGenerator:
         for i in range(0, total_chunks, batch_size):
             batch = chunks[i:i + batch_size]
 
+            started = time.perf_counter()
             try:
                 texts = [chunk['code'] for chunk in batch]
-                response = self.client.embeddings.create(input=texts, model=self.model)
+                with span('embed_batch', 'api', model=self.model, size=len(texts)):
+                    response = self.client.embeddings.create(input=texts, model=self.model)
+                self._record(started, response)
 
                 for chunk, embedding_obj in zip(batch, response.data):
                     chunk['embedding'] = embedding_obj.embedding
@@ -45,13 +76,14 @@ class EmbeddingGenerator:
                 if i + batch_size < total_chunks:
                     time.sleep(delay_seconds)
 
-            except Exception:
+            except Exception as e:
+                self._record(started, error=e)
                 continue
 
         return enriched_chunks
 
     def estimate_cost(self, total_tokens: int) -> Dict:
-        cost_per_million = 0.02 if "small" in self.model else 0.13
+        cost_per_million = MODEL_PRICES.get(self.model, (0.02 if "small" in self.model else 0.13,))[0]
         estimated_cost = (total_tokens / 1_000_000) * cost_per_million
 
         return {
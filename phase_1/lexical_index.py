@@ -0,0 +1,181 @@
+import os
+import re
+import json
+import math
+import uuid
+import threading
+from typing import Dict, Iterable, List, Optional
+
+IDENTIFIER = re.compile(r'[A-Za-z_][A-Za-z0-9_]*(?:\.[A-Za-z_][A-Za-z0-9_]*)*')
+CAMEL_BOUNDARY = re.compile(r'(?<=[a-z0-9])(?=[A-Z])')
+
+# Python keywords carry no signal for finding similar patterns
+STOPWORDS = {
+    'and', 'as', 'assert', 'async', 'await', 'break', 'class', 'continue', 'def', 'del', 'elif',
+    'else', 'except', 'finally', 'for', 'from', 'global', 'if', 'import', 'in', 'is', 'lambda',
+    'nonlocal', 'not', 'or', 'pass', 'raise', 'return', 'try', 'while', 'with', 'yield',
+    'none', 'true', 'false', 'self', 'cls',
+}
+
+
+def tokenize(code: str) -> List[str]:
+    """
+    Identifier tokens for BM25. Dotted names are kept whole and split, and
+    snake_case / camelCase names add their parts, so `pickle.loads` matches
+    both `pickle.loads(...)` and `from pickle import loads`.
+    """
+    tokens = []
+    for match in IDENTIFIER.findall(code):
+        lowered = match.lower()
+        if lowered in STOPWORDS:
+            continue
+        tokens.append(lowered)
+
+        parts = lowered.split('.') if '.' in match else []
+        for name in match.split('.'):
+            subparts = [p.lower() for piece in name.split('_') for p in CAMEL_BOUNDARY.split(piece) if p]
+            if len(subparts) > 1:
+                parts.extend(subparts)
+        tokens.extend(p for p in parts if len(p) > 1 and p not in STOPWORDS)
+    return tokens
+
+
+class LexicalIndex:
+    """
+    In-process BM25 inverted index over chunk identifiers, kept next to the
+    vector store and updated incrementally. Needs no embeddings or network,
+    so it also serves the embedding-free retrieval mode.
+    """
+
+    def __init__(self, path: str, k1: float = 1.2, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self.documents: Dict[str, Dict] = {}
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.total_length = 0
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        for doc_id, doc in data.get('documents', {}).items():
+            self._add(doc_id, doc['code'], doc['metadata'])
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        # Postings are rebuilt on load, so only the documents are persisted
+        with self._lock:
+            data = {'documents': {
+                doc_id: {'code': doc['code'], 'metadata': doc['metadata']}
+                for doc_id, doc in self.documents.items()
+            }}
+        tmp_path = f"{self.path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def _add(self, doc_id: str, code: str, metadata: Dict):
+        term_freqs: Dict[str, int] = {}
+        for token in tokenize(code):
+            term_freqs[token] = term_freqs.get(token, 0) + 1
+
+        length = sum(term_freqs.values())
+        self.documents[doc_id] = {'code': code, 'metadata': metadata, 'terms': term_freqs, 'length': length}
+        self.total_length += length
+        for term, freq in term_freqs.items():
+            self.postings.setdefault(term, {})[doc_id] = freq
+
+    def _remove(self, doc_id: str):
+        doc = self.documents.pop(doc_id, None)
+        if doc is None:
+            return
+        self.total_length -= doc['length']
+        for term in doc['terms']:
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self.postings[term]
+
+    def upsert(self, ids: List[str], documents: List[str], metadatas: List[Dict]):
+        with self._lock:
+            for doc_id, code, metadata in zip(ids, documents, metadatas):
+                self._remove(doc_id)
+                self._add(doc_id, code, metadata)
+
+    def delete(self, ids: Iterable[str]):
+        with self._lock:
+            for doc_id in ids:
+                self._remove(doc_id)
+
+    def clear(self):
+        with self._lock:
+            self.documents = {}
+            self.postings = {}
+            self.total_length = 0
+        self.save()
+
+    @staticmethod
+    def _matches(metadata: Dict, filter_metadata: Optional[Dict], exclude_file_path: Optional[str],
+                 exclude_content_hash: Optional[str]) -> bool:
+        for key, value in (filter_metadata or {}).items():
+            if metadata.get(key) != value:
+                return False
+        if exclude_file_path and metadata.get('file_path') == exclude_file_path:
+            return False
+        if exclude_content_hash and metadata.get('content_hash') == exclude_content_hash:
+            return False
+        return True
+
+    def search(self, query_text: str, top_k: int = 5, filter_metadata: Optional[Dict] = None,
+               exclude_file_path: Optional[str] = None, exclude_content_hash: Optional[str] = None) -> List[Dict]:
+        """BM25 over the query's identifiers; results match search_similar_code's shape"""
+        query_terms = set(tokenize(query_text))
+
+        with self._lock:
+            num_docs = len(self.documents)
+            if not num_docs or not query_terms:
+                return []
+            avg_length = self.total_length / num_docs
+
+            scores: Dict[str, float] = {}
+            for term in query_terms:
+                posting = self.postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(1 + (num_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+                for doc_id, freq in posting.items():
+                    length = self.documents[doc_id]['length']
+                    norm = freq + self.k1 * (1 - self.b + self.b * length / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * freq * (self.k1 + 1) / norm
+
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+            results = []
+            for doc_id, score in ranked:
+                doc = self.documents[doc_id]
+                if not self._matches(doc['metadata'], filter_metadata, exclude_file_path, exclude_content_hash):
+                    continue
+                results.append({
+                    'id': doc_id,
+                    'bm25_score': score,
+                    'code': doc['code'],
+                    'metadata': dict(doc['metadata'])
+                })
+                if len(results) >= top_k:
+                    break
+
+        # BM25 is unbounded; scale against the best hit so similarity_score stays in [0, 1]
+        if results:
+            best = results[0]['bm25_score']
+            for result in results:
+                result['similarity_score'] = result['bm25_score'] / best if best > 0 else 0.0
+        return results
@@ -0,0 +1,146 @@
+import os
+import json
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+# USD per million tokens: (input, cached input, output)
+MODEL_PRICES = {
+    'gpt-4o': (2.50, 1.25, 10.0),
+    'gpt-4o-mini': (0.15, 0.075, 0.60),
+    'gpt-3.5-turbo': (0.50, 0.50, 1.50),
+    'text-embedding-3-small': (0.02, 0.02, 0.0),
+    'text-embedding-3-large': (0.13, 0.13, 0.0),
+}
+# The Batch API bills input and output at half the interactive rate
+BATCH_DISCOUNT = 0.5
+
+# Labels for whatever is running in this context; ThreadPoolExecutor workers
+# start with an empty context, so submit work through contextvars.copy_context().run
+current_file: contextvars.ContextVar = contextvars.ContextVar('neurashield_file', default=None)
+current_stage: contextvars.ContextVar = contextvars.ContextVar('neurashield_stage', default=None)
+
+
+@contextmanager
+def metrics_scope(file: Optional[str] = None, stage: Optional[str] = None):
+    """Attribute requests made inside the block to a file and/or stage"""
+    tokens = []
+    if file is not None:
+        tokens.append((current_file, current_file.set(file)))
+    if stage is not None:
+        tokens.append((current_stage, current_stage.set(stage)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+def request_cost(model: str, prompt_tokens: int, completion_tokens: int = 0, cached_tokens: int = 0) -> float:
+    """USD cost of one request; unknown models fall back to their longest-matching prefix, else 0"""
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        matches = [name for name in MODEL_PRICES if model.startswith(name)]
+        prices = MODEL_PRICES[max(matches, key=len)] if matches else (0.0, 0.0, 0.0)
+    input_price, cached_price, output_price = prices
+    uncached = max(prompt_tokens - cached_tokens, 0)
+    return (uncached * input_price + cached_tokens * cached_price + completion_tokens * output_price) / 1_000_000
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+class MetricsCollector:
+    """
+    Thread-safe per-request accounting for LLM and embedding calls. Each
+    record carries the file and stage active in its context, so totals can be
+    rolled up per file, per stage and for the whole run.
+    """
+
+    def __init__(self):
+        self._records: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def record(self, kind: str, model: str, latency: float, prompt_tokens: int = 0,
+               completion_tokens: int = 0, cached_tokens: int = 0, retries: int = 0, hedges: int = 0,
+               cache_hit: bool = False, error: Optional[str] = None, stage: Optional[str] = None):
+        cost = 0.0 if cache_hit else request_cost(model, prompt_tokens, completion_tokens, cached_tokens)
+        if kind == 'batch':
+            cost *= BATCH_DISCOUNT
+        record = {
+            'kind': kind,
+            'model': model,
+            'file': current_file.get(),
+            'stage': stage or current_stage.get() or kind,
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'cached_tokens': cached_tokens,
+            'latency': round(latency, 4),
+            'retries': retries,
+            # Duplicate requests raced against a slow one; not failures, so not retries
+            'hedges': hedges,
+            'cache_hit': cache_hit,
+            'error': error,
+            # Cache hits cost nothing: the tokens were paid for by an earlier run
+            'cost_usd': cost
+        }
+        with self._lock:
+            self._records.append(record)
+
+    @property
+    def records(self) -> List[Dict]:
+        with self._lock:
+            return list(self._records)
+
+    @staticmethod
+    def aggregate(records: List[Dict]) -> Dict:
+        latencies = [r['latency'] for r in records if not r['cache_hit'] and r['kind'] != 'batch']
+        prompt_tokens = sum(r['prompt_tokens'] for r in records)
+        cached_tokens = sum(r['cached_tokens'] for r in records)
+        return {
+            'requests': len(records),
+            'cache_hits': sum(r['cache_hit'] for r in records),
+            'errors': sum(1 for r in records if r['error']),
+            'retries': sum(r['retries'] for r in records),
+            'hedges': sum(r['hedges'] for r in records),
+            'prompt_tokens': prompt_tokens,
+            'cached_tokens': cached_tokens,
+            # Share of prompt tokens the provider served from its prompt cache
+            'cached_ratio': round(cached_tokens / prompt_tokens, 3) if prompt_tokens else 0.0,
+            'completion_tokens': sum(r['completion_tokens'] for r in records),
+            'cost_usd': round(sum(r['cost_usd'] for r in records), 6),
+            'latency_total': round(sum(latencies), 3),
+            'latency_p50': round(_percentile(latencies, 50), 3),
+            'latency_p95': round(_percentile(latencies, 95), 3),
+        }
+
+    def _grouped(self, records: List[Dict], field: str) -> Dict[str, Dict]:
+        groups: Dict[str, List[Dict]] = {}
+        for record in records:
+            groups.setdefault(record[field] or 'unattributed', []).append(record)
+        return {name: self.aggregate(group) for name, group in sorted(groups.items())}
+
+    def summary(self, include_files: bool = True) -> Dict:
+        records = self.records
+        summary = {
+            'run': self.aggregate(records),
+            'by_stage': self._grouped(records, 'stage'),
+            'by_model': self._grouped(records, 'model'),
+        }
+        if include_files:
+            summary['by_file'] = self._grouped(records, 'file')
+        return summary
+
+    def write(self, path: str):
+        """Summary plus every request record, for dashboards and run-to-run comparison"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'summary': self.summary(), 'requests': self.records}, f, indent=2)
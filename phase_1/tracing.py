@@ -0,0 +1,134 @@
+import os
+import json
+import time
+import threading
+from typing import Dict, List, Optional
+
+# NEURASHIELD_TRACE=<path> turns tracing on for a whole run and names the export
+TRACE_ENV = "NEURASHIELD_TRACE"
+
+
+class _NoopSpan:
+    """Shared stand-in returned while tracing is off; entering it does nothing"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ('tracer', 'name', 'category', 'args', 'start')
+
+    def __init__(self, tracer: 'Tracer', name: str, category: str, args: Dict):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        self.tracer._add(self.name, self.category, self.start, end, self.args)
+        return False
+
+    def set(self, **args):
+        """Attach results known only at the end of the span, e.g. counts"""
+        self.args.update(args)
+
+
+class Tracer:
+    """
+    Collects complete-duration spans per thread and exports them as Chrome
+    trace-event JSON, which chrome://tracing and ui.perfetto.dev open directly.
+    While disabled, span() returns a shared no-op object and records nothing.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.output_path: Optional[str] = None
+        self._events: List[Dict] = []
+        self._thread_names: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+
+    def enable(self, output_path: Optional[str] = None):
+        with self._lock:
+            self.enabled = True
+            self.output_path = output_path or self.output_path
+            self._events = []
+            self._thread_names = {}
+            self._origin = time.perf_counter()
+
+    def disable(self):
+        self.enabled = False
+
+    def span(self, name: str, category: str = "pipeline", **args):
+        if not self.enabled:
+            return _NOOP_SPAN
+        return _Span(self, name, category, args)
+
+    def _add(self, name: str, category: str, start: float, end: float, args: Dict):
+        thread = threading.current_thread()
+        event = {
+            'name': name,
+            'cat': category,
+            'ph': 'X',
+            'ts': round((start - self._origin) * 1e6, 1),
+            'dur': round((end - start) * 1e6, 1),
+            'pid': os.getpid(),
+            'tid': thread.ident,
+        }
+        if args:
+            event['args'] = {key: value if isinstance(value, (int, float, bool, str)) or value is None else str(value)
+                             for key, value in args.items()}
+        with self._lock:
+            self._events.append(event)
+            self._thread_names.setdefault(thread.ident, thread.name)
+
+    def export(self, path: Optional[str] = None) -> Optional[str]:
+        """Write the trace; returns the path, or None when there was nothing to write"""
+        path = path or self.output_path
+        if not path:
+            return None
+
+        with self._lock:
+            events = list(self._events)
+            thread_names = dict(self._thread_names)
+
+        pid = os.getpid()
+        metadata = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'args': {'name': 'neurashield'}}]
+        metadata += [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+                     for tid, name in thread_names.items()]
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': metadata + events, 'displayTimeUnit': 'ms'}, f)
+        return path
+
+
+tracer = Tracer()
+if os.getenv(TRACE_ENV):
+    tracer.enable(os.getenv(TRACE_ENV))
+
+
+def span(name: str, category: str = "pipeline", **args):
+    """with span('embed', chunks=n): ... records a span on the global tracer when enabled"""
+    return tracer.span(name, category, **args)
+
@@ -1,7 +1,23 @@
 import chromadb
 from typing import List, Dict, Optional
+import hashlib
 import json
 import os
+import uuid
+import threading
+
+try:
+    from phase_1.lexical_index import LexicalIndex
+except ImportError:
+    # Run as a script from inside phase_1 (e.g. query_code.py)
+    from lexical_index import LexicalIndex
+
+
+def content_hash(code: str) -> str:
+    """Hash of code ignoring indentation, blank lines and full-line comments"""
+    lines = [line.strip() for line in code.splitlines()]
+    normalized = '\n'.join(line for line in lines if line and not line.startswith('#'))
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
 
 
 class ChromaVectorStore:
@@ -15,9 +31,55 @@ class ChromaVectorStore:
             name=collection_name,
             metadata={"description": "NeuraShield code embeddings for RAG analysis"}
         )
+        self.generation_file = os.path.join(persist_directory, 'index_generation.json')
+        self._lexical_index = None
+        # Parallel analysis workers share the store; one of them loads or rebuilds the index
+        self._lexical_lock = threading.RLock()
+
+    def _read_generations(self) -> Dict:
+        try:
+            with open(self.generation_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @property
+    def generation(self) -> str:
+        """
+        Changes whenever this collection's contents change. The random index id
+        keeps a rebuilt database from reusing the counters of an old one.
+        """
+        entry = self._read_generations().get(self.collection_name)
+        if entry is None:
+            entry = self._bump_generation()
+        return f"{entry['index_id']}:{entry['counter']}"
+
+    def _bump_generation(self) -> Dict:
+        generations = self._read_generations()
+        entry = generations.get(self.collection_name) or {'index_id': uuid.uuid4().hex, 'counter': 0}
+        entry['counter'] += 1
+        generations[self.collection_name] = entry
+
+        tmp_path = f"{self.generation_file}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(generations, f)
+        os.replace(tmp_path, self.generation_file)
+        return entry
+
+    @property
+    def lexical_index(self) -> LexicalIndex:
+        """BM25 index over the same chunks, loaded on first use"""
+        if self._lexical_index is None:
+            with self._lexical_lock:
+                if self._lexical_index is None:
+                    self._lexical_index = LexicalIndex(
+                        os.path.join(self.persist_directory, f'lexical_{self.collection_name}.json')
+                    )
+        return self._lexical_index
 
     def upsert_chunks(self, chunks: List[Dict], batch_size: int = 100):
         total_upserted = 0
+        lexical_upserted = 0
 
         for i in range(0, len(chunks), batch_size):
             batch = chunks[i:i + batch_size]
@@ -26,17 +88,13 @@ class ChromaVectorStore:
             embeddings = []
             documents = []
             metadatas = []
+            lexical_ids = []
+            lexical_documents = []
+            lexical_metadatas = []
 
             for idx, chunk in enumerate(batch):
                 chunk_id = f"{chunk.get('file_path', 'unknown')}_{chunk.get('name', f'chunk_{idx}')}"
                 chunk_id = chunk_id.replace('/', '_').replace('.', '_')
-                ids.append(chunk_id)
-
-                if 'embedding' not in chunk:
-                    continue
-
-                embeddings.append(chunk['embedding'])
-                documents.append(chunk['code'])
 
                 metadata = {
                     'file_path': str(chunk.get('file_path', '')),
@@ -45,7 +103,8 @@ class ChromaVectorStore:
                     'line_start': int(chunk.get('line_start', 0)),
                     'line_end': int(chunk.get('line_end', 0)),
                     'token_count': int(chunk.get('token_count', 0)),
-                    'language': str(chunk.get('language', 'python'))
+                    'language': str(chunk.get('language', 'python')),
+                    'content_hash': content_hash(chunk['code'])
                 }
 
                 if 'file_metadata' in chunk:
@@ -58,25 +117,63 @@ class ChromaVectorStore:
                 if 'is_async' in chunk:
                     metadata['is_async'] = str(chunk['is_async'])
 
+                # The lexical index takes every chunk, so it works without embeddings
+                lexical_ids.append(chunk_id)
+                lexical_documents.append(chunk['code'])
+                lexical_metadatas.append(metadata)
+
+                if 'embedding' not in chunk:
+                    continue
+
+                ids.append(chunk_id)
+                embeddings.append(chunk['embedding'])
+                documents.append(chunk['code'])
                 metadatas.append(metadata)
 
             if embeddings:
                 self.collection.upsert(
-                    ids=ids[:len(embeddings)],
+                    ids=ids,
                     embeddings=embeddings,
-                    documents=documents[:len(embeddings)],
-                    metadatas=metadatas[:len(embeddings)]
+                    documents=documents,
+                    metadatas=metadatas
                 )
                 total_upserted += len(embeddings)
 
+            if lexical_ids:
+                self.lexical_index.upsert(lexical_ids, lexical_documents, lexical_metadatas)
+                lexical_upserted += len(lexical_ids)
+
+        if lexical_upserted:
+            self.lexical_index.save()
+        if total_upserted or lexical_upserted:
+            self._bump_generation()
+
         return total_upserted
 
+    @staticmethod
+    def build_where(filter_metadata: Optional[Dict] = None, exclude_file_path: Optional[str] = None,
+                    exclude_content_hash: Optional[str] = None) -> Optional[Dict]:
+        clauses = [{key: value} for key, value in (filter_metadata or {}).items()]
+        if exclude_file_path:
+            clauses.append({'file_path': {'$ne': exclude_file_path}})
+        if exclude_content_hash:
+            clauses.append({'content_hash': {'$ne': exclude_content_hash}})
+
+        if not clauses:
+            return None
+        if len(clauses) == 1:
+            return clauses[0]
+        return {'$and': clauses}
+
     def search_similar_code(self, query_embedding: List[float], top_k: int = 5,
-                           filter_metadata: Optional[Dict] = None) -> List[Dict]:
+                           filter_metadata: Optional[Dict] = None, exclude_file_path: Optional[str] = None,
+                           exclude_content_hash: Optional[str] = None) -> List[Dict]:
+        # Exclusions are part of the where clause, so the index fills all top_k slots
+        # from the remaining chunks instead of returning fewer hits after a post-filter
         results = self.collection.query(
             query_embeddings=[query_embedding],
             n_results=top_k,
-            where=filter_metadata if filter_metadata else None
+            where=self.build_where(filter_metadata, exclude_file_path, exclude_content_hash)
         )
 
         similar_chunks = []
@@ -90,6 +187,32 @@ class ChromaVectorStore:
 
         return similar_chunks
 
+    def rebuild_lexical_index(self) -> int:
+        """Backfill the lexical index from a collection stored before it existed"""
+        stored = self.collection.get(include=['documents', 'metadatas'])
+        self.lexical_index.clear()
+        if stored['ids']:
+            self.lexical_index.upsert(stored['ids'], stored['documents'], stored['metadatas'])
+            self.lexical_index.save()
+        return len(stored['ids'])
+
+    def search_lexical(self, query_text: str, top_k: int = 5, filter_metadata: Optional[Dict] = None,
+                       exclude_file_path: Optional[str] = None,
+                       exclude_content_hash: Optional[str] = None) -> List[Dict]:
+        if len(self.lexical_index) == 0:
+            with self._lexical_lock:
+                # Workers that waited here find the index already rebuilt
+                if len(self.lexical_index) == 0 and self.collection.count() > 0:
+                    self.rebuild_lexical_index()
+
+        return self.lexical_index.search(
+            query_text,
+            top_k=top_k,
+            filter_metadata=filter_metadata,
+            exclude_file_path=exclude_file_path,
+            exclude_content_hash=exclude_content_hash
+        )
+
     def search_by_text(self, query_text: str, embedding_generator, top_k: int = 5,
                       filter_metadata: Optional[Dict] = None) -> List[Dict]:
         query_embedding = embedding_generator.generate_embedding(query_text)
@@ -127,6 +250,8 @@ class ChromaVectorStore:
     def clear_collection(self):
         self.client.delete_collection(name=self.collection_name)
         self.collection = self.client.create_collection(name=self.collection_name)
+        self.lexical_index.clear()
+        self._bump_generation()
 
     def load_and_store_embeddings(self, embeddings_file: str = 'phase_1/embeddings.json'):
         with open(embeddings_file, 'r', encoding='utf-8') as f:
@@ -2,6 +2,7 @@
 import os
 import sys
 import json
+import argparse
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
@@ -10,9 +11,46 @@ from phase_1.vector_store import ChromaVectorStore
 from phase_1.embedding_generator import EmbeddingGenerator
 from phase_1.code_extractor import GitHubCodeExtractor
 from phase_2.rag_analyzer import RAGAnalyzer
+from phase_2.batch_runner import BatchAnalysisRunner
+from phase_2.checkpoint import ScanCheckpoint, code_sha256, current_results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='NeuraShield full repository analysis')
+    parser.add_argument('--batch', action='store_true',
+                        help='Submit all LLM requests as one provider batch job instead of live calls')
+    parser.add_argument('--batch-dir', default=None,
+                        help='Working directory for batch request/manifest/output files')
+    parser.add_argument('--poll-interval', type=float, default=30.0,
+                        help='Seconds between batch status checks')
+    parser.add_argument('--resume-batch', action='store_true',
+                        help='Wait for the batch recorded in --batch-dir and ingest it without resubmitting')
+    parser.add_argument('--cascade', action='store_true',
+                        help='Triage files first and only send suspicious ones to the deep-analysis model')
+    parser.add_argument('--triage-model', default=None,
+                        help='Cheap model for the triage pass (default: local heuristic only)')
+    parser.add_argument('--escalation-threshold', type=float, default=0.35,
+                        help='Triage score at or above which a file gets deep analysis')
+    parser.add_argument('--static-prefilter', action='store_true',
+                        help='Skip the LLM for files the static rules show have no sinks, I/O or dynamic execution')
+    parser.add_argument('--chunked', action='store_true',
+                        help='Analyze each function/class separately and merge findings per file')
+    parser.add_argument('--context-budget', type=int, default=2000,
+                        help='Token budget for retrieved patterns per prompt (0 = unbounded)')
+    parser.add_argument('--checkpoint', default=None,
+                        help='JSONL file each finished file is appended to (default: phase_2/repo_analysis_checkpoint.jsonl)')
+    parser.add_argument('--resume', action='store_true',
+                        help='Skip files whose content hash is already in the checkpoint')
+    parser.add_argument('--retrieval-mode', choices=['vector', 'hybrid', 'lexical'], default='hybrid',
+                        help='Similar-pattern retrieval: embeddings, BM25, or both fused by reciprocal rank')
+    args = parser.parse_args()
+    if args.chunked and (args.batch or args.resume_batch):
+        parser.error('--chunked is not supported together with batch mode')
+    return args
 
 
 def main():
+    args = parse_args()
     project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
     phase1_db = os.path.join(project_root, 'phase_1', 'chroma_db')
 
@@ -20,39 +58,88 @@ def main():
         collection_name="neurashield_code_v1",
         persist_directory=phase1_db
     )
-    embedding_gen = EmbeddingGenerator()
+    embedding_gen = EmbeddingGenerator() if args.retrieval_mode != 'lexical' else None
 
     analyzer = RAGAnalyzer(
         vector_store=vector_store,
         embedding_generator=embedding_gen,
         llm_model="gpt-4o",
-        top_k=5
+        top_k=5,
+        cascade=args.cascade,
+        triage_model=args.triage_model,
+        escalation_threshold=args.escalation_threshold,
+        static_prefilter=args.static_prefilter,
+        context_token_budget=args.context_budget or None,
+        retrieval_mode=args.retrieval_mode
     )
 
+    batch_runner = None
+    if args.batch or args.resume_batch:
+        batch_runner = BatchAnalysisRunner(
+            analyzer=analyzer,
+            work_dir=args.batch_dir or os.path.join(project_root, 'phase_2', 'batch_jobs'),
+            poll_interval=args.poll_interval
+        )
+
     extractor = GitHubCodeExtractor(GITHUB_REPO_URL)
-    code_files = extractor.extract_python_files()
 
-    print(f"Analyzing {len(code_files)} files from {GITHUB_REPO_URL}")
+    checkpoint = ScanCheckpoint(
+        args.checkpoint or os.path.join(project_root, 'phase_2', 'repo_analysis_checkpoint.jsonl'),
+        resume=args.resume or args.resume_batch
+    )
+
+    failed = {}
+
+    def record_result(sample, analysis):
+        # Failed files stay out of the checkpoint so a resume retries them,
+        # but this run's results and report still list them
+        if analysis.get('error'):
+            failed[sample['name']] = analysis
+        else:
+            checkpoint.append(sample['name'], code_sha256(sample['code']), analysis)
 
-    samples = [
+    # Extracted even when resuming a batch: the report covers exactly the files in the repository now
+    code_files = extractor.extract_python_files()
+    all_samples = [
         {'code': data['source_code'], 'name': data['file_path']}
         for data in code_files
     ]
 
-    results = analyzer.batch_analyze(code_samples=samples, analysis_type='all')
-
+    if args.resume_batch:
+        for result in batch_runner.resume():
+            record_result({'name': result['sample_name'], 'code': result['code']}, result)
+    else:
+        print(f"Analyzing {len(code_files)} files from {GITHUB_REPO_URL}")
+
+        samples = all_samples
+        if args.resume:
+            done_hashes = checkpoint.completed_hashes()
+            samples = [sample for sample in samples if code_sha256(sample['code']) not in done_hashes]
+            print(f"Resuming from {checkpoint.path}: {len(code_files) - len(samples)} files already analyzed")
+
+        if batch_runner:
+            for result in batch_runner.run(code_samples=samples, analysis_type='all'):
+                record_result({'name': result['sample_name'], 'code': result['code']}, result)
+        else:
+            analyzer.batch_analyze(code_samples=samples, analysis_type='all', chunked=args.chunked,
+                                   on_result=record_result)
+
+    # Both reports stream from the checkpoint, one file at a time
     output_json = os.path.join(project_root, 'phase_2', 'repo_analysis_results.json')
-    with open(output_json, 'w', encoding='utf-8') as f:
-        json.dump(results, f, indent=2, ensure_ascii=False)
-
     report_txt = os.path.join(project_root, 'phase_2', 'repo_analysis_report.txt')
-    with open(report_txt, 'w', encoding='utf-8') as f:
-        for file_result in results:
-            report = analyzer.generate_report(file_result)
-            f.write(report + "\n\n" + "-"*70 + "\n\n")
+    with open(output_json, 'w', encoding='utf-8') as json_file, open(report_txt, 'w', encoding='utf-8') as text_file:
+        json_file.write("[")
+        for i, analysis in enumerate(current_results(checkpoint, all_samples, failed)):
+            json_file.write(("," if i else "") + "\n" + json.dumps(analysis, indent=2, ensure_ascii=False))
+            report = analyzer.generate_report(analysis)
+            text_file.write(report + "\n\n" + "-"*70 + "\n\n")
+        json_file.write("\n]\n")
 
     extractor.cleanup()
 
+    if failed:
+        print(f"{len(failed)} files failed and will be retried on --resume")
+
     print(f"Analysis complete. Results saved to phase_2/")
 
 
@@ -0,0 +1,281 @@
+"""
+Offline batch mode for full-repository scans.
+Writes every LLM request to a JSONL file, submits it as one provider batch job,
+polls until it finishes and ingests the output back into the normal results format.
+The OpenAI client honours OPENAI_BASE_URL, so the same flow runs against a local stand-in server.
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from phase_2.rag_analyzer import RAGAnalyzer
+from phase_1.metrics import metrics_scope
+
+logger = logging.getLogger(__name__)
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+PROMPT_RENDERERS = {
+    'bug_analysis': 'render_bug_detection_prompt',
+    'optimization_analysis': 'render_optimization_prompt',
+    'security_analysis': 'render_security_scoring_prompt',
+    'combined': 'render_combined_analysis_prompt',
+}
+
+
+class BatchAnalysisRunner:
+    def __init__(self, analyzer: RAGAnalyzer, work_dir: str = "phase_2/batch_jobs",
+                 poll_interval: float = 30.0, completion_window: str = "24h"):
+        self.analyzer = analyzer
+        self.llm_analyzer = analyzer.llm_analyzer
+        self.client = analyzer.llm_analyzer.client
+        self.work_dir = work_dir
+        self.poll_interval = poll_interval
+        self.completion_window = completion_window
+
+        os.makedirs(work_dir, exist_ok=True)
+        self.requests_path = os.path.join(work_dir, 'batch_requests.jsonl')
+        self.manifest_path = os.path.join(work_dir, 'batch_manifest.json')
+        self.output_path = os.path.join(work_dir, 'batch_output.jsonl')
+
+    def prepare(self, code_samples: List[Dict], analysis_type: str = "all") -> Dict:
+        """Retrieve context for every sample and write one request line per LLM call"""
+        combined = self.analyzer.combined_analysis and analysis_type == 'all'
+        result_keys = ['combined'] if combined else [key for key, _ in self.analyzer.requested_sections(analysis_type)]
+
+        samples = []
+        pending = 0
+
+        with open(self.requests_path, 'w', encoding='utf-8') as f:
+            for i, sample in enumerate(code_samples, 1):
+                entry = {
+                    'sample_name': sample.get('name', f"sample_{i}"),
+                    'timestamp': datetime.now().isoformat(),
+                    'code': sample['code'],
+                    'analysis_type': analysis_type,
+                    'cached': {},
+                    'cache_keys': {}
+                }
+
+                if self.analyzer.triage is not None:
+                    entry['triage'] = self.analyzer.triage.classify(sample['code'])
+                    if not entry['triage']['escalated']:
+                        samples.append(entry)
+                        continue
+
+                try:
+                    rag_context = self.analyzer.rag_core.build_rag_context(
+                        query_code=sample['code'],
+                        analysis_type=analysis_type,
+                        exclude_file_path=sample.get('name')
+                    )
+                except Exception as e:
+                    entry['error'] = f'Analysis failed: {str(e)}'
+                    samples.append(entry)
+                    continue
+
+                entry['retrieved_patterns_count'] = rag_context['num_patterns']
+                entry['retrieved_patterns'] = rag_context['retrieved_patterns']
+
+                for result_key in result_keys:
+                    render = getattr(self.llm_analyzer.prompt_templates, PROMPT_RENDERERS[result_key])
+                    prompt = render(query_code=sample['code'], context=rag_context['formatted_context'])
+
+                    # Files whose responses are already cached never reach the batch
+                    if self.llm_analyzer.cache is not None:
+                        cache_key = self.llm_analyzer._cache_key(prompt['system'], prompt['user'], "json_object")
+                        cached = self.llm_analyzer.cache.get(cache_key)
+                        if cached is not None:
+                            entry['cached'][result_key] = cached
+                            continue
+                        entry['cache_keys'][result_key] = cache_key
+
+                    f.write(json.dumps({
+                        'custom_id': f"{len(samples)}:{result_key}",
+                        'method': 'POST',
+                        'url': BATCH_ENDPOINT,
+                        'body': self.llm_analyzer.build_request(prompt['system'], prompt['user'], section=result_key)
+                    }, ensure_ascii=False) + "\n")
+                    pending += 1
+
+                samples.append(entry)
+
+        manifest = {
+            'created_at': datetime.now().isoformat(),
+            'analysis_type': analysis_type,
+            'result_keys': result_keys,
+            'pending_requests': pending,
+            'batch_id': None,
+            'samples': samples
+        }
+        self._save_manifest(manifest)
+
+        print(f"Prepared {pending} batch requests for {len(samples)} files -> {self.requests_path}")
+        return manifest
+
+    def submit(self, manifest: Dict) -> str:
+        with open(self.requests_path, 'rb') as f:
+            input_file = self.client.files.create(file=f, purpose="batch")
+
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=self.completion_window,
+            metadata={'description': 'NeuraShield scheduled scan'}
+        )
+
+        manifest['batch_id'] = batch.id
+        self._save_manifest(manifest)
+        print(f"Submitted batch {batch.id} ({manifest['pending_requests']} requests)")
+        return batch.id
+
+    def wait(self, batch_id: str, timeout: Optional[float] = None):
+        started = time.monotonic()
+        while True:
+            batch = self.client.batches.retrieve(batch_id)
+            counts = getattr(batch, 'request_counts', None)
+            if counts is not None:
+                print(f"Batch {batch_id}: {batch.status} ({counts.completed}/{counts.total} done, {counts.failed} failed)")
+            else:
+                print(f"Batch {batch_id}: {batch.status}")
+
+            if batch.status in TERMINAL_STATUSES:
+                return batch
+
+            if timeout is not None and time.monotonic() - started > timeout:
+                raise TimeoutError(f"Batch {batch_id} still {batch.status} after {timeout}s")
+
+            time.sleep(self.poll_interval)
+
+    def _download_responses(self, batch) -> Dict[str, Dict]:
+        responses = {}
+
+        for file_id in (getattr(batch, 'output_file_id', None), getattr(batch, 'error_file_id', None)):
+            if not file_id:
+                continue
+            text = self.client.files.content(file_id).text
+            if file_id == batch.output_file_id:
+                with open(self.output_path, 'w', encoding='utf-8') as f:
+                    f.write(text)
+
+            for line in text.splitlines():
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                responses[record['custom_id']] = record
+
+        return responses
+
+    def _parse_record(self, record: Optional[Dict], section: Optional[str] = None) -> Dict:
+        if record is None:
+            return {"error": True, "message": "No response returned by batch job", "error_type": "LLM_ERROR"}
+
+        if record.get('error'):
+            return {"error": True, "message": str(record['error']), "error_type": "LLM_ERROR"}
+
+        response = record.get('response') or {}
+        if response.get('status_code') != 200:
+            return {"error": True, "message": f"HTTP {response.get('status_code')}", "error_type": "LLM_ERROR"}
+
+        metrics = self.llm_analyzer.metrics
+        if metrics is not None:
+            # A batch request has no latency of its own; 'batch' records stay out of the percentiles
+            metrics.record('batch', response['body'].get('model') or self.llm_analyzer.model, 0.0, stage=section,
+                           **self.llm_analyzer.usage_counts(response['body'].get('usage')))
+        content = response['body']['choices'][0]['message']['content']
+        result = self.llm_analyzer._parse_response_safe(content)
+        if not result or not isinstance(result, dict):
+            return {"error": True, "message": "Could not parse response", "error_type": "LLM_ERROR"}
+        return result
+
+    def ingest(self, manifest: Dict, batch=None) -> List[Dict]:
+        """Rebuild batch_analyze-style results from the batch output and any cached responses"""
+        responses = self._download_responses(batch) if batch is not None else {}
+        results = []
+
+        for index, entry in enumerate(manifest['samples']):
+            analysis = {
+                'timestamp': entry['timestamp'],
+                'code': entry['code'],
+                'analysis_type': entry['analysis_type'],
+            }
+
+            if entry.get('triage') and not entry['triage']['escalated']:
+                analysis = self.analyzer._triaged_clean_result(entry['code'], entry['analysis_type'], entry['triage'])
+                analysis['sample_name'] = entry['sample_name']
+                results.append(analysis)
+                continue
+
+            if entry.get('error'):
+                analysis['error'] = entry['error']
+                analysis['sample_name'] = entry['sample_name']
+                results.append(analysis)
+                continue
+
+            analysis['retrieved_patterns_count'] = entry['retrieved_patterns_count']
+            analysis['retrieved_patterns'] = entry['retrieved_patterns']
+            if entry.get('triage'):
+                analysis['triage'] = entry['triage']
+
+            for result_key in manifest['result_keys']:
+                if result_key in entry['cached']:
+                    raw = entry['cached'][result_key]
+                else:
+                    with metrics_scope(file=entry['sample_name']):
+                        raw = self._parse_record(responses.get(f"{index}:{result_key}"), section=result_key)
+                    cache_key = entry['cache_keys'].get(result_key)
+                    if cache_key and not raw.get("error"):
+                        self.llm_analyzer.cache.set(cache_key, raw)
+
+                if result_key == 'combined':
+                    analysis.update(self.llm_analyzer.split_combined_result(raw))
+                else:
+                    analysis[result_key] = self.llm_analyzer.finalize_section(result_key, raw)
+
+            analysis['sample_name'] = entry['sample_name']
+            results.append(analysis)
+
+        return results
+
+    def run(self, code_samples: List[Dict], analysis_type: str = "all",
+            timeout: Optional[float] = None) -> List[Dict]:
+        manifest = self.prepare(code_samples, analysis_type=analysis_type)
+
+        cascade = self.analyzer.cascade_summary()
+        if cascade:
+            print(f"Cascade: {cascade['escalated']} escalated to {self.llm_analyzer.model}, "
+                  f"{cascade['skipped']} skipped as clean")
+
+        if manifest['pending_requests'] == 0:
+            print("All responses served from cache, no batch job needed")
+            return self.ingest(manifest)
+
+        batch_id = self.submit(manifest)
+        batch = self.wait(batch_id, timeout=timeout)
+        if batch.status != "completed":
+            logger.error(f"Batch {batch_id} finished with status {batch.status}")
+
+        return self.ingest(manifest, batch)
+
+    def resume(self, timeout: Optional[float] = None) -> List[Dict]:
+        """Pick up a previously submitted batch from the manifest in work_dir"""
+        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+
+        if not manifest.get('batch_id'):
+            raise RuntimeError(f"No submitted batch recorded in {self.manifest_path}")
+
+        batch = self.wait(manifest['batch_id'], timeout=timeout)
+        return self.ingest(manifest, batch)
+
+    def _save_manifest(self, manifest: Dict):
+        with open(self.manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
@@ -0,0 +1,100 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from typing import Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def code_sha256(code: str) -> str:
+    return hashlib.sha256(code.encode('utf-8')).hexdigest()
+
+
+class ScanCheckpoint:
+    """
+    Append-only JSONL record of finished files. Every completed analysis is
+    flushed to disk immediately, so a crashed or pre-empted scan can resume
+    and skip files whose content hash is already recorded.
+    """
+
+    def __init__(self, path: str, resume: bool = False):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if not resume:
+            # A fresh scan must not pick up records from an earlier run
+            open(path, 'w', encoding='utf-8').close()
+        else:
+            self._terminate_torn_line()
+
+    def _terminate_torn_line(self):
+        """Start appends on a fresh line if the previous run died mid-write"""
+        try:
+            with open(self.path, 'rb+') as f:
+                f.seek(0, os.SEEK_END)
+                if f.tell() == 0:
+                    return
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    f.write(b'\n')
+        except FileNotFoundError:
+            pass
+
+    def __iter__(self) -> Iterator[Dict]:
+        """Stream records one line at a time; a torn last line from a crash is skipped"""
+        try:
+            f = open(self.path, 'r', encoding='utf-8')
+        except FileNotFoundError:
+            return
+        with f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    logger.warning(f"Ignoring unreadable checkpoint line {line_no} in {self.path}")
+
+    def completed_hashes(self) -> Dict[str, str]:
+        """content hash -> path of every file already recorded"""
+        return {record['sha256']: record['path'] for record in self if record.get('sha256')}
+
+    def append(self, path: str, sha256: str, analysis: Dict, extra: Optional[Dict] = None):
+        record = {'path': path, 'sha256': sha256, 'analysis': analysis}
+        record.update(extra or {})
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+
+def current_results(checkpoint: ScanCheckpoint, samples: List[Dict],
+                    failed: Optional[Dict[str, Dict]] = None) -> Iterator[Dict]:
+    """
+    Stream the checkpoint's analyses of the current files only: records of deleted
+    files and of earlier versions of edited files are dropped. failed maps names to
+    this run's errored analyses, which never reach the checkpoint; they follow last.
+    """
+    by_hash = {}
+    for sample in samples:
+        by_hash.setdefault(code_sha256(sample['code']), []).append(sample['name'])
+
+    seen = set()
+    for record in checkpoint:
+        # Files with identical content share one recorded analysis
+        for name in by_hash.get(record.get('sha256'), []):
+            if name not in seen:
+                seen.add(name)
+                yield dict(record['analysis'], sample_name=name)
+
+    for sample in samples:
+        if failed and sample['name'] in failed and sample['name'] not in seen:
+            yield dict(failed[sample['name']], sample_name=sample['name'])
@@ -0,0 +1,248 @@
+"""
+Single-pass, incremental JSON parser for LLM responses.
+Scans each character once, tolerates prose or code fences around the object,
+trailing or missing commas, unescaped quotes inside strings, unterminated
+strings and truncated output, and returns the largest valid prefix object.
+Text can be fed in pieces as it streams in; on_value reports each completed value.
+"""
+
+import re
+import json
+from typing import Any, Callable, List, Optional, Tuple
+
+STRING_RUN = re.compile(r'[^"\\]+')
+WHITESPACE = re.compile(r'\s*')
+NUMBER = re.compile(r'-?(?:\d+)(?:\.\d*)?(?:[eE][-+]?\d*)?')
+WORD = re.compile(r'[A-Za-z_]+')
+
+LITERALS = {'true': True, 'false': False, 'null': None, 'True': True, 'False': False, 'None': None}
+ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f', '/': '/', '\\': '\\', '"': '"'}
+
+# After a closing quote, these are the characters that may legitimately follow.
+# Anything else means the quote was an unescaped one inside the string.
+KEY_FOLLOWERS = ':,}'
+VALUE_FOLLOWERS = ',}]"'
+
+
+class RecoveringJSONParser:
+    def __init__(self, on_value: Optional[Callable[[Tuple, Any], None]] = None):
+        # on_value(path, value) fires when a value is complete, path being the keys/indices to it
+        self.on_value = on_value
+        self.root: Any = None
+        self.done = False
+        # Frames: [container, pending key (objects only), path]
+        self._stack: List[list] = []
+        self._pending = ''
+        self._string: Optional[List[str]] = None
+        self._string_is_key = False
+
+    def feed(self, text: str):
+        if self.done:
+            return
+        if self._pending:
+            text = self._pending + text
+            self._pending = ''
+        self._scan(text, final=False)
+
+    def finish(self) -> Any:
+        """Flush partial tokens, close every open string and container, return the root"""
+        if not self.done and self._pending:
+            text, self._pending = self._pending, ''
+            self._scan(text, final=True)
+
+        if self._string is not None:
+            # Unterminated string at the end of a truncated response
+            value = ''.join(self._string)
+            self._string = None
+            if not self._string_is_key:
+                self._add_value(value)
+
+        while self._stack:
+            self._close()
+        self.done = True
+        return self.root
+
+    # --- building -------------------------------------------------------
+
+    def _add_value(self, value: Any, is_container: bool = False):
+        if not self._stack:
+            if self.root is not None:
+                return
+            self.root = value
+            if is_container:
+                self._stack.append([value, None, ()])
+            else:
+                self.done = True
+            return
+
+        frame = self._stack[-1]
+        container = frame[0]
+        if isinstance(container, dict):
+            if frame[1] is None:
+                # A value where a key belongs: the model dropped the key, nothing to attach to
+                if is_container:
+                    self._stack.append([value, None, frame[2] + ('?',)])
+                return
+            path = frame[2] + (frame[1],)
+            container[frame[1]] = value
+            frame[1] = None
+        else:
+            path = frame[2] + (len(container),)
+            container.append(value)
+
+        if is_container:
+            self._stack.append([value, None, path])
+        elif self.on_value is not None and '?' not in path:
+            self.on_value(path, value)
+
+    def _close(self):
+        container, _, path = self._stack.pop()
+        if self.on_value is not None and '?' not in path:
+            self.on_value(path, container)
+        if not self._stack:
+            self.done = True
+
+    def _in_object_expecting_key(self) -> bool:
+        return bool(self._stack) and isinstance(self._stack[-1][0], dict) and self._stack[-1][1] is None
+
+    # --- scanning -------------------------------------------------------
+
+    def _scan(self, text: str, final: bool):
+        i = 0
+        n = len(text)
+
+        while i < n and not self.done:
+            if self._string is not None:
+                i = self._scan_string(text, i, final)
+                if i < 0:
+                    return
+                continue
+
+            char = text[i]
+            if char.isspace():
+                i = WHITESPACE.match(text, i).end()
+                continue
+
+            if self.root is None and not self._stack and char not in '{[':
+                # Prose or a ``` fence before the JSON starts
+                i += 1
+                continue
+
+            if char == '{':
+                self._add_value({}, is_container=True)
+                i += 1
+            elif char == '[':
+                self._add_value([], is_container=True)
+                i += 1
+            elif char in '}]':
+                if self._stack:
+                    self._close()
+                i += 1
+            elif char == ',':
+                if self._stack and isinstance(self._stack[-1][0], dict):
+                    # "key": , -> the key never got a value
+                    self._stack[-1][1] = None
+                i += 1
+            elif char == ':':
+                i += 1
+            elif char == '"':
+                self._string = []
+                self._string_is_key = self._in_object_expecting_key()
+                i += 1
+            elif char == '-' or char.isdigit():
+                match = NUMBER.match(text, i)
+                if match is None:
+                    if i + 1 == n and not final:
+                        # A lone '-' at the end of a chunk: the digits are still to come
+                        self._pending = text[i:]
+                        return
+                    i += 1
+                    continue
+                if match.end() == n and not final:
+                    self._pending = text[i:]
+                    return
+                token = match.group()
+                i = max(match.end(), i + 1)
+                try:
+                    number = int(token) if token.lstrip('-').isdigit() else float(token.rstrip('eE+-'))
+                except ValueError:
+                    continue
+                if not self._in_object_expecting_key():
+                    self._add_value(number)
+            elif char.isalpha() or char == '_':
+                match = WORD.match(text, i)
+                if match.end() == n and not final:
+                    self._pending = text[i:]
+                    return
+                i = match.end()
+                word = match.group()
+                if word in LITERALS and not self._in_object_expecting_key():
+                    self._add_value(LITERALS[word])
+            else:
+                i += 1
+
+    def _scan_string(self, text: str, i: int, final: bool) -> int:
+        """Consume string content from i; returns the next index, or -1 when more input is needed"""
+        n = len(text)
+        while i < n:
+            match = STRING_RUN.match(text, i)
+            if match:
+                self._string.append(match.group())
+                i = match.end()
+                continue
+
+            char = text[i]
+            if char == '\\':
+                if i + 1 >= n:
+                    if final:
+                        return n
+                    self._pending = text[i:]
+                    return -1
+                escape = text[i + 1]
+                if escape == 'u':
+                    hex_digits = text[i + 2:i + 6]
+                    if len(hex_digits) < 4 and not final:
+                        self._pending = text[i:]
+                        return -1
+                    try:
+                        self._string.append(chr(int(hex_digits, 16)))
+                        i += 6
+                    except ValueError:
+                        self._string.append(escape)
+                        i += 2
+                else:
+                    self._string.append(ESCAPES.get(escape, escape))
+                    i += 2
+                continue
+
+            # Closing quote, unless what follows shows it was an unescaped quote inside the text
+            after = WHITESPACE.match(text, i + 1).end()
+            if after == n and not final:
+                self._pending = text[i:]
+                return -1
+            followers = KEY_FOLLOWERS if self._string_is_key else VALUE_FOLLOWERS
+            if after < n and text[after] not in followers:
+                self._string.append('"')
+                i += 1
+                continue
+
+            value = ''.join(self._string)
+            self._string = None
+            if self._string_is_key:
+                self._stack[-1][1] = value
+            else:
+                self._add_value(value)
+            return i + 1
+        return n
+
+
+def recover_json(text: str) -> Any:
+    """json.loads when the response is valid, otherwise the largest recoverable prefix (or None)"""
+    try:
+        return json.loads(text, strict=False)
+    except ValueError:
+        pass
+
+    parser = RecoveringJSONParser()
+    parser.feed(text)
+    return parser.finish()
@@ -6,10 +6,12 @@ Handles severely malformed JSON responses
 import os
 import sys
 from openai import OpenAI
-from typing import Dict, Optional
+from typing import Any, Callable, Dict, Optional, Tuple
 import json
 import logging
-import re
+import time
+import hashlib
+import threading
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -17,184 +19,279 @@ logger = logging.getLogger(__name__)
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from phase_2.prompt_templates import PromptTemplates
+from phase_2.disk_cache import DiskCache
+from phase_2.json_recovery import recover_json, RecoveringJSONParser
+from phase_2.retry_policy import RetryPolicy
+from phase_1.metrics import MetricsCollector, request_cost
+from phase_1.tracing import span
+from phase_1.cassette import Cassette, active_cassette
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+# NEURASHIELD_CACHE_DIR relocates all caches, e.g. to a directory CI persists between runs
+CACHE_ROOT = os.getenv("NEURASHIELD_CACHE_DIR", os.path.join(PROJECT_ROOT, '.neurashield_cache'))
+
+# Fields a gate (check_critical.py) decides on; published as soon as they stream in
+GATING_FIELDS = {
+    'bug_analysis': ('has_bugs', 'overall_risk'),
+    'security_analysis': ('overall_security_score', 'overall_severity'),
+}
 
 
 class LLMAnalyzer:
     def __init__(self, model: str = "gpt-4o", temperature: float = 0.3,
-                 max_tokens: int = 4000, api_key: Optional[str] = None):
+                 max_tokens: int = 4000, api_key: Optional[str] = None,
+                 use_cache: Optional[bool] = None, cache_dir: Optional[str] = None,
+                 cache_ttl_seconds: float = 7 * 24 * 3600, cache_max_entries: int = 20000,
+                 request_timeout: Optional[float] = None, stream: bool = False,
+                 early_stop_fields: Optional[Dict[str, Tuple[str, ...]]] = None,
+                 field_listener: Optional[Callable[[str, str, Any], None]] = None,
+                 retry_policy: Optional[RetryPolicy] = None, structured_output: bool = False,
+                 metrics: Optional[MetricsCollector] = None, cassette: Optional[Cassette] = None):
         self.model = model
+        self.metrics = metrics
         self.temperature = temperature
         self.max_tokens = max_tokens
         api_key = api_key or os.getenv("OPENAI_API_KEY")
+        # Record responses to, or replay them from, an archive (default: NEURASHIELD_CASSETTE)
+        self.cassette = cassette or active_cassette()
+        replaying = self.cassette is not None and self.cassette.mode == 'replay'
         
-        if not api_key:
+        if not api_key and not replaying:
             raise ValueError("OpenAI API key required")
         
-        self.client = OpenAI(api_key=api_key, timeout=None)
+        # The SDK's own retries are off: every attempt goes through retry_policy, which
+        # gives each one a timeout scaled to max_tokens (request_timeout caps it)
+        self.client = OpenAI(api_key=api_key, max_retries=0) if api_key else None
+        if self.cassette is not None:
+            self.client = self.cassette.wrap(self.client)
+        self.retry_policy = retry_policy or RetryPolicy(max_timeout=request_timeout or 180.0)
+        # Set by cancel(); stops further attempts once a run's deadline has passed
+        self.cancelled = threading.Event()
+        # time.monotonic() instant a run must finish by; caps every attempt's timeout
+        self.deadline_at: Optional[float] = None
+
+        # Streaming parses JSON as tokens arrive and calls field_listener(section, field, value)
+        # for GATING_FIELDS; sections run in parallel, so the listener must be thread-safe.
+        # With early_stop_fields, generation stops once those fields are complete.
+        self.stream = stream or early_stop_fields is not None
+        self.early_stop_fields = early_stop_fields
+        self.field_listener = field_listener
         self.prompt_templates = PromptTemplates()
+        # Constrain responses to the section's JSON schema instead of plain json_object mode
+        self.structured_output = structured_output
 
-    def _sanitize_json(self, content: str) -> str:
-        """
-        Ultra-aggressive JSON sanitization for severely malformed responses
-        """
-        try:
-            # Remove everything before first { and after last }
-            start = content.find('{')
-            end = content.rfind('}') + 1
-            
-            if start >= 0 and end > start:
-                content = content[start:end]
-            
-            # Remove trailing commas
-            content = re.sub(r',(\s*[}\]])', r'\1', content)
-            
-            # Fix unclosed strings - find quotes not followed by comma/colon/bracket
-            lines = content.split('\n')
-            fixed_lines = []
-            
-            for line in lines:
-                # Count quotes - if odd, this line has unclosed string
-                quote_count = line.count('"') - line.count('\\"')
-                if quote_count % 2 == 1:
-                    # Add closing quote before any problematic character
-                    line = re.sub(r'(["\w])\n', r'\1"', line)
-                    line = re.sub(r'(["\w])(\s*[},\]\)])', r'\1"\2', line)
-                fixed_lines.append(line)
-            
-            content = '\n'.join(fixed_lines)
-            
-            # Remove any remaining invalid characters in strings
-            content = re.sub(r'": "[^"]*$', '": ""', content, flags=re.MULTILINE)
-            
-            return content
-        except:
-            return content
+        # NEURASHIELD_LLM_CACHE=0 bypasses the response cache without code changes.
+        # Off by default under a cassette: cache hits would never reach the recording.
+        if use_cache is None:
+            use_cache = self.cassette is None and os.getenv("NEURASHIELD_LLM_CACHE", "1") != "0"
+        self.cache = None
+        if use_cache:
+            self.cache = DiskCache(
+                directory=cache_dir or os.path.join(CACHE_ROOT, 'llm'),
+                ttl_seconds=cache_ttl_seconds,
+                max_entries=cache_max_entries
+            )
+
+    def _cache_key(self, system_prompt: str, user_prompt: str, response_format: str) -> str:
+        return DiskCache.make_key(
+            self.model,
+            self.temperature,
+            self.max_tokens,
+            response_format,
+            self.structured_output,
+            hashlib.sha256(system_prompt.encode('utf-8')).hexdigest(),
+            hashlib.sha256(user_prompt.encode('utf-8')).hexdigest(),
+            self.prompt_templates.TEMPLATE_VERSION
+        )
 
     def _parse_response_safe(self, content: str) -> Dict:
-        """
-        Try multiple parsing strategies
-        """
-        strategies = [
-            # Strategy 1: Direct parse
-            lambda c: json.loads(c),
-            # Strategy 2: Sanitized parse
-            lambda c: json.loads(self._sanitize_json(c)),
-            # Strategy 3: Extract and clean
-            lambda c: json.loads(self._extract_valid_json(c)),
-        ]
-        
-        for i, strategy in enumerate(strategies):
-            try:
-                logger.info(f"Trying parse strategy {i + 1}")
-                result = strategy(content)
-                logger.info(f"✓ Strategy {i + 1} succeeded")
-                return result
-            except Exception as e:
-                logger.warning(f"Strategy {i + 1} failed: {str(e)}")
-                continue
-        
-        # All strategies failed - return empty structure
-        logger.error("All parse strategies failed")
+        """json.loads fast path, then one recovering pass over malformed or truncated output"""
+        try:
+            return json.loads(content, strict=False)
+        except (TypeError, ValueError):
+            pass
+
+        result = recover_json(content or '')
+        if isinstance(result, (dict, list)):
+            logger.debug("Recovered malformed JSON response")
+            return result
+
+        logger.warning("Response contained no recoverable JSON")
         return {}
 
-    def _extract_valid_json(self, content: str) -> str:
-        """
-        Extract only valid JSON portions
-        """
+    def build_request(self, system_prompt: str, user_prompt: str,
+                      response_format: str = "json_object", section: Optional[str] = None) -> Dict:
+        """Chat completion request body, shared by live calls and batch jobs"""
+        request = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+        }
+        if response_format == "json_object":
+            schema = self.prompt_templates.response_schema(section) if self.structured_output else None
+            if schema is not None:
+                request["response_format"] = {"type": "json_schema", "json_schema": schema}
+            else:
+                request["response_format"] = {"type": response_format}
+        return request
+
+    @staticmethod
+    def usage_counts(usage) -> Dict:
+        """Token counts of a response's usage (SDK object or batch-output dict); cached_tokens is the reused prompt prefix"""
+        if usage is None:
+            return {}
+        if not isinstance(usage, dict):
+            usage = usage.model_dump() if hasattr(usage, 'model_dump') else vars(usage)
+
+        details = usage.get('prompt_tokens_details') or {}
+        if not isinstance(details, dict):
+            details = vars(details)
+        return {
+            'prompt_tokens': usage.get('prompt_tokens') or 0,
+            'cached_tokens': details.get('cached_tokens') or 0,
+            'completion_tokens': usage.get('completion_tokens') or 0,
+        }
+
+    def _record_metrics(self, started: float, section: Optional[str], counts: Optional[Dict] = None,
+                        attempt_stats: Optional[Dict] = None, cache_hit: bool = False, error: Optional[str] = None):
+        if self.metrics is None:
+            return
+        attempt_stats = attempt_stats or {}
+        self.metrics.record('llm', self.model, time.perf_counter() - started,
+                            retries=attempt_stats.get('retries', 0), hedges=attempt_stats.get('hedges', 0),
+                            cache_hit=cache_hit, error=error, stage=section, **(counts or {}))
+
+    def _watched_paths(self, section: Optional[str], fields: Dict[str, Tuple[str, ...]]) -> Dict[tuple, tuple]:
+        """JSON paths of the given fields in this call's response -> (section, field)"""
+        if section == 'combined':
+            return {(name, field): (name, field) for name, names in fields.items() for field in names}
+        return {(field,): (section, field) for field in fields.get(section, ())}
+
+    def _stream_json(self, request: Dict, section: Optional[str],
+                     timeout: Optional[float] = None) -> Tuple[Any, bool, Dict]:
+        """Stream a completion through the recovering parser; returns (result, stopped_early, usage counts)"""
+        watched = self._watched_paths(section, GATING_FIELDS)
+        required = set(self._watched_paths(section, self.early_stop_fields or {}))
+        complete = set()
+
+        def on_value(path, value):
+            if path in watched:
+                complete.add(path)
+                if self.field_listener is not None:
+                    self.field_listener(*watched[path], value)
+            elif path in required:
+                complete.add(path)
+
+        parser = RecoveringJSONParser(on_value=on_value)
+        stream = self.client.chat.completions.create(
+            **request, stream=True, stream_options={"include_usage": True}, timeout=timeout
+        )
+        stopped_early = False
+        counts = {}
         try:
-            start = content.find('{')
-            if start < 0:
-                return '{}'
-            
-            depth = 0
-            in_string = False
-            escape = False
-            
-            for i in range(start, len(content)):
-                char = content[i]
-                
-                if escape:
-                    escape = False
-                    continue
-                
-                if char == '\\':
-                    escape = True
+            for chunk in stream:
+                if getattr(chunk, 'usage', None):
+                    counts = self.usage_counts(chunk.usage)
+                if self.cancelled.is_set():
+                    break
+                # The usage chunk comes last, after the closing brace: keep reading until
+                # it arrives, or the call's tokens and cost are never recorded
+                if parser.done or not chunk.choices:
                     continue
-                
-                if char == '"' and not escape:
-                    in_string = not in_string
-                    continue
-                
-                if not in_string:
-                    if char == '{':
-                        depth += 1
-                    elif char == '}':
-                        depth -= 1
-                        if depth == 0:
-                            return content[start:i+1]
-            
-            return content[start:]
-        except:
-            return '{}'
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parser.feed(delta)
+                if required and required <= complete:
+                    # Only an early stop abandons the stream, usage and all
+                    stopped_early = True
+                    break
+        finally:
+            # Closing the response stops the server generating the remaining tokens
+            stream.close()
+
+        return parser.finish(), stopped_early, counts
 
     def _call_llm(self, system_prompt: str, user_prompt: str,
-                  response_format: str = "json_object", max_retries: int = 3) -> Dict:
+                  response_format: str = "json_object", max_retries: Optional[int] = None,
+                  section: Optional[str] = None) -> Dict:
         """
-        Call LLM with ultra-robust error handling
+        Call the LLM through retry_policy; max_retries overrides its attempt count.
+        section names the analysis the response belongs to, for streamed field callbacks
+        and metrics attribution.
         """
-        last_error = None
-        
-        for attempt in range(max_retries):
-            try:
-                logger.info(f"LLM Call Attempt {attempt + 1}/{max_retries}")
-                
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt}
-                    ],
-                    temperature=self.temperature,
-                    max_tokens=self.max_tokens,
-                    response_format={"type": response_format} if response_format == "json_object" else None
-                )
-                
-                content = response.choices[0].message.content
-                usage = response.usage
-                
-                logger.info(f"✓ API Call Successful - Tokens: {usage.total_tokens}")
-                
-                if response_format == "json_object":
-                    result = self._parse_response_safe(content)
-                    if result and not isinstance(result, dict):
-                        result = {"error": True, "message": "Invalid response format"}
-                    if result:
-                        return result
-                    else:
-                        last_error = "Could not parse response"
-                        if attempt < max_retries - 1:
-                            logger.info("Retrying...")
-                            continue
-                
-                return {"response": content}
-            
-            except Exception as e:
-                error_msg = str(e)
-                logger.error(f"Error on attempt {attempt + 1}: {error_msg}")
-                last_error = error_msg
-                
-                if attempt < max_retries - 1:
-                    import time
-                    time.sleep(2)
-                    logger.info("Retrying...")
-                    continue
-        
-        logger.error(f"All {max_retries} attempts failed")
-        return {
-            "error": True,
-            "message": last_error or "Analysis failed after multiple attempts",
-            "error_type": "LLM_ERROR"
-        }
+        started = time.perf_counter()
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self._cache_key(system_prompt, user_prompt, response_format)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                logger.info("✓ LLM response served from cache")
+                self._record_metrics(started, section, cache_hit=True)
+                return cached
+
+        request = self.build_request(system_prompt, user_prompt, response_format, section)
+        streaming = self.stream and response_format == "json_object"
+
+        attempts = []
+        attempt_stats = {}
+
+        def attempt(timeout: float):
+            attempts.append(timeout)
+            # Retries and hedged duplicates each get a span, on the thread that ran them
+            with span('llm_attempt', 'llm', section=section, attempt=len(attempts), timeout=timeout):
+                if streaming:
+                    return self._stream_json(request, section, timeout)
+                return self.client.chat.completions.create(**request, timeout=timeout)
+
+        try:
+            with span('llm_call', 'llm', section=section, model=self.model):
+                # Hedged duplicates would fire the streamed field callbacks twice
+                outcome = self.retry_policy.run(attempt, self.max_tokens, cancelled=self.cancelled,
+                                                max_attempts=max_retries, hedge=not streaming,
+                                                stats=attempt_stats, deadline_at=self.deadline_at)
+        except Exception as e:
+            message = "Cancelled" if self.cancelled.is_set() else str(e)
+            if message != "Cancelled":
+                logger.error(f"LLM call failed: {message}")
+            self._record_metrics(started, section, attempt_stats=attempt_stats, error=message)
+            return {"error": True, "message": message, "error_type": "LLM_ERROR"}
+
+        if streaming:
+            result, stopped_early, counts = outcome
+            self._record_metrics(started, section, counts, attempt_stats)
+        else:
+            content = outcome.choices[0].message.content
+            counts = self.usage_counts(outcome.usage)
+            self._record_metrics(started, section, counts, attempt_stats)
+            logger.info(f"✓ API Call Successful - Tokens: {outcome.usage.total_tokens} "
+                        f"(cached prompt tokens: {counts.get('cached_tokens', 0)})")
+
+            if response_format != "json_object":
+                result = {"response": content}
+                if cache_key:
+                    self.cache.set(cache_key, result)
+                return result
+
+            # The recovering parser salvages almost any reply, so an identical re-send
+            # would rarely do better; an unparseable reply is reported, not retried
+            result = self._parse_response_safe(content)
+            stopped_early = False
+            if result and not isinstance(result, dict):
+                return {"error": True, "message": "Invalid response format", "error_type": "LLM_ERROR"}
+
+        if not isinstance(result, dict) or not result:
+            return {"error": True, "message": "Could not parse response", "error_type": "LLM_ERROR"}
+
+        if stopped_early:
+            # Partial by design: never cache it in place of the full answer
+            result['stopped_early'] = True
+        elif cache_key and not result.get("error"):
+            self.cache.set(cache_key, result)
+        return result
 
     def analyze_for_bugs(self, query_code: str, retrieved_context: str) -> Dict:
         """Analyze code for bugs"""
@@ -213,7 +310,8 @@ class LLMAnalyzer:
             result = self._call_llm(
                 system_prompt=prompt['system'],
                 user_prompt=prompt['user'],
-                response_format="json_object"
+                response_format="json_object",
+                section="bug_analysis"
             )
             
             if result.get("error"):
@@ -245,7 +343,8 @@ class LLMAnalyzer:
             result = self._call_llm(
                 system_prompt=prompt['system'],
                 user_prompt=prompt['user'],
-                response_format="json_object"
+                response_format="json_object",
+                section="optimization_analysis"
             )
             
             if result.get("error"):
@@ -277,19 +376,14 @@ class LLMAnalyzer:
             result = self._call_llm(
                 system_prompt=prompt['system'],
                 user_prompt=prompt['user'],
-                response_format="json_object"
+                response_format="json_object",
+                section="security_analysis"
             )
             
             # CRITICAL: If security analysis fails, return valid fallback
             if result.get("error") or not result.get('overall_security_score'):
                 logger.warning(f"Security analysis had issues: {result.get('message')}")
-                return {
-                    "overall_security_score": 5.0,
-                    "overall_severity": "UNKNOWN",
-                    "vulnerabilities": [],
-                    "risk_summary": "Security analysis encountered parsing issues",
-                    "immediate_actions": []
-                }
+                return self._security_fallback(5.0, "Security analysis encountered parsing issues")
             
             score = result.get('overall_security_score', 0)
             logger.info(f"✓ Security Analysis Complete - Score: {score}/10")
@@ -299,19 +393,94 @@ class LLMAnalyzer:
         except Exception as e:
             logger.error(f"Security analysis error: {str(e)}")
             # Return valid fallback on exception
+            return self._security_fallback(0, f"Analysis error: {str(e)}")
+
+    @staticmethod
+    def _security_fallback(score: float, risk_summary: str) -> Dict:
+        """Valid security result used when the model output is unusable"""
+        return {
+            "overall_security_score": score,
+            "overall_severity": "UNKNOWN",
+            "vulnerabilities": [],
+            "risk_summary": risk_summary,
+            "immediate_actions": []
+        }
+
+    def analyze_all(self, query_code: str, retrieved_context: str) -> Dict:
+        """Bugs, optimization and security in one LLM call, split into the usual sections"""
+        try:
+            logger.info("Starting combined analysis...")
+
+            try:
+                prompt = self.prompt_templates.render_combined_analysis_prompt(
+                    query_code=query_code,
+                    context=retrieved_context
+                )
+            except Exception as e:
+                logger.error(f"Prompt rendering error: {str(e)}")
+                error = {"error": True, "message": str(e)}
+                return {
+                    'bug_analysis': error,
+                    'optimization_analysis': error,
+                    'security_analysis': self._security_fallback(0, f"Analysis error: {str(e)}")
+                }
+
+            result = self._call_llm(
+                system_prompt=prompt['system'],
+                user_prompt=prompt['user'],
+                response_format="json_object",
+                section="combined"
+            )
+
+            sections = self.split_combined_result(result)
+
+            logger.info(f"✓ Combined Analysis Complete - "
+                        f"Bugs: {len(sections['bug_analysis'].get('bugs_found', []))}, "
+                        f"Options: {len(sections['optimization_analysis'].get('optimizations', []))}, "
+                        f"Score: {sections['security_analysis'].get('overall_security_score')}/10")
+
+            return sections
+
+        except Exception as e:
+            logger.error(f"Combined analysis error: {str(e)}")
+            error = {"error": True, "message": str(e)}
+            return {
+                'bug_analysis': error,
+                'optimization_analysis': error,
+                'security_analysis': self._security_fallback(0, f"Analysis error: {str(e)}")
+            }
+
+    def split_combined_result(self, result: Dict) -> Dict:
+        """Split a combined-template response into the three per-section results"""
+        if result.get("error"):
             return {
-                "overall_security_score": 0,
-                "overall_severity": "UNKNOWN",
-                "vulnerabilities": [],
-                "risk_summary": f"Analysis error: {str(e)}",
-                "immediate_actions": []
+                'bug_analysis': result,
+                'optimization_analysis': result,
+                'security_analysis': self._security_fallback(5.0, "Security analysis encountered parsing issues")
             }
 
+        return {
+            key: self.finalize_section(key, result.get(key))
+            for key in ('bug_analysis', 'optimization_analysis', 'security_analysis')
+        }
+
+    def finalize_section(self, result_key: str, result) -> Dict:
+        """Apply the same fallbacks as the analyze_* methods to a raw section result"""
+        if result_key == 'security_analysis':
+            if not isinstance(result, dict) or result.get("error") or not result.get('overall_security_score'):
+                logger.warning("Security analysis returned no usable result")
+                return self._security_fallback(5.0, "Security analysis encountered parsing issues")
+            return result
+
+        if not isinstance(result, dict):
+            return {"error": True, "message": f"Missing {result_key} section"}
+        return result
+
     def estimate_cost(self, prompt_tokens: int, completion_tokens: int) -> Dict:
         """Estimate API cost"""
         try:
-            input_cost = (prompt_tokens / 1_000_000) * 2.50
-            output_cost = (completion_tokens / 1_000_000) * 10.0
+            input_cost = request_cost(self.model, prompt_tokens)
+            output_cost = request_cost(self.model, 0, completion_tokens)
             total_cost = input_cost + output_cost
             
             return {
@@ -1,6 +1,6 @@
 import os
 import sys
-from typing import Dict
+from typing import Dict, Optional
 from jinja2 import Template
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -10,8 +10,87 @@ from phase_1.embedding_generator import EmbeddingGenerator
 from phase_1.vector_store import ChromaVectorStore
 
 
+def _strict_object(properties: Dict) -> Dict:
+    """Object schema in the form strict structured output requires: every key required, no extras"""
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False
+    }
+
+
+def _array_of(item: Dict) -> Dict:
+    return {"type": "array", "items": item}
+
+
+STRING = {"type": "string"}
+NUMBER = {"type": "number"}
+
+# Gating fields (llm_analyzer.GATING_FIELDS) come first in every schema and template:
+# a streamed response can only stop early once they are complete.
+BUG_SCHEMA = _strict_object({
+    "has_bugs": {"type": "boolean"},
+    "overall_risk": {"type": "string", "enum": ["low", "medium", "high"]},
+    "bugs_found": _array_of(_strict_object({
+        "type": STRING,
+        "line": STRING,
+        "description": STRING,
+        "severity": {"type": "string", "enum": ["low", "medium", "high"]},
+        "cwe_id": STRING
+    }))
+})
+
+OPTIMIZATION_SCHEMA = _strict_object({
+    "current_complexity": _strict_object({
+        "time": STRING,
+        "space": STRING,
+        "bottlenecks": _array_of(STRING)
+    }),
+    "optimizations": _array_of(_strict_object({
+        "type": STRING,
+        "description": STRING,
+        "improvement": STRING
+    })),
+    "estimated_speedup": STRING
+})
+
+SECURITY_SCHEMA = _strict_object({
+    "overall_security_score": NUMBER,
+    "overall_severity": STRING,
+    "vulnerabilities": _array_of(_strict_object({
+        "type": STRING,
+        "cvss_score": NUMBER,
+        "severity": STRING,
+        "description": STRING,
+        "remediation": STRING
+    })),
+    "risk_summary": STRING,
+    "immediate_actions": _array_of(STRING)
+})
+
+COMBINED_SCHEMA = _strict_object({
+    "bug_analysis": BUG_SCHEMA,
+    "security_analysis": SECURITY_SCHEMA,
+    "optimization_analysis": OPTIMIZATION_SCHEMA
+})
+
+TRIAGE_SCHEMA = _strict_object({
+    "suspicion_score": NUMBER,
+    "reason": STRING
+})
+
+
 class PromptTemplates:
-    
+    # Bump whenever a template changes so cached LLM responses are not reused
+    TEMPLATE_VERSION = "3"
+
+    # Templates keep every static part (task, output format) ahead of the variable
+    # knowledge-base context and code, so consecutive requests of one section share an
+    # identical prefix. The provider only caches prefixes of 1024+ tokens, and these
+    # static parts are a few hundred, so cached_tokens stays 0 until a section's
+    # static instructions grow past that; the ordering costs nothing meanwhile.
+
     BUG_DETECTION_SYSTEM = """You are an expert software security analyst specializing in vulnerability detection and bug identification. You have deep knowledge of:
 - OWASP Top 10 vulnerabilities
 - Common coding mistakes and anti-patterns
@@ -20,19 +99,14 @@ class PromptTemplates:
 
 Use systematic Chain-of-Thought reasoning to analyze code thoroughly."""
 
-    BUG_DETECTION_TEMPLATE = Template("""Analyze the following code for potential bugs and vulnerabilities using a step-by-step Chain-of-Thought approach.
-
-# CODE TO ANALYZE
-{{ query_code }}
-
-# SIMILAR BUG PATTERNS FROM KNOWLEDGE BASE
-{{ retrieved_context }}
+    BUG_DETECTION_TEMPLATE = Template("""Analyze the code under CODE TO ANALYZE for potential bugs and vulnerabilities using a step-by-step Chain-of-Thought approach.
 
 # OUTPUT FORMAT
 Respond ONLY with valid JSON (no markdown, no extra text):
 
 {
   "has_bugs": true/false,
+  "overall_risk": "low/medium/high",
   "bugs_found": [
     {
       "type": "vulnerability type",
@@ -41,9 +115,14 @@ Respond ONLY with valid JSON (no markdown, no extra text):
       "severity": "low/medium/high",
       "cwe_id": "CWE-XXX"
     }
-  ],
-  "overall_risk": "low/medium/high"
-}""")
+  ]
+}
+
+# SIMILAR BUG PATTERNS FROM KNOWLEDGE BASE
+{{ retrieved_context }}
+
+# CODE TO ANALYZE
+{{ query_code }}""")
 
     OPTIMIZATION_SYSTEM = """You are a performance optimization expert with deep knowledge of:
 - Algorithm complexity analysis (Big O notation)
@@ -53,13 +132,7 @@ Respond ONLY with valid JSON (no markdown, no extra text):
 
 Use systematic reasoning to identify optimization opportunities."""
 
-    OPTIMIZATION_TEMPLATE = Template("""Analyze the following code for optimization opportunities.
-
-# CODE TO ANALYZE
-{{ query_code }}
-
-# OPTIMIZATION EXAMPLES FROM KNOWLEDGE BASE
-{{ retrieved_context }}
+    OPTIMIZATION_TEMPLATE = Template("""Analyze the code under CODE TO ANALYZE for optimization opportunities.
 
 # OUTPUT FORMAT
 Respond ONLY with valid JSON (no markdown, no extra text):
@@ -78,17 +151,17 @@ Respond ONLY with valid JSON (no markdown, no extra text):
     }
   ],
   "estimated_speedup": "2x or percentage"
-}""")
+}
 
-    SECURITY_SCORING_SYSTEM = """You are a cybersecurity expert specializing in CVSS assessments."""
-
-    SECURITY_SCORING_TEMPLATE = Template("""Assess security vulnerabilities in this code.
+# OPTIMIZATION EXAMPLES FROM KNOWLEDGE BASE
+{{ retrieved_context }}
 
 # CODE TO ANALYZE
-{{ query_code }}
+{{ query_code }}""")
 
-# KNOWN VULNERABILITY PATTERNS
-{{ retrieved_context }}
+    SECURITY_SCORING_SYSTEM = """You are a cybersecurity expert specializing in CVSS assessments."""
+
+    SECURITY_SCORING_TEMPLATE = Template("""Assess security vulnerabilities in the code under CODE TO ANALYZE.
 
 # OUTPUT FORMAT
 Respond ONLY with valid JSON (no markdown, no extra text):
@@ -107,7 +180,110 @@ Respond ONLY with valid JSON (no markdown, no extra text):
   ],
   "risk_summary": "executive summary",
   "immediate_actions": ["list of fixes"]
-}""")
+}
+
+# KNOWN VULNERABILITY PATTERNS
+{{ retrieved_context }}
+
+# CODE TO ANALYZE
+{{ query_code }}""")
+
+    COMBINED_ANALYSIS_SYSTEM = """You are an expert software security analyst and performance engineer. You have deep knowledge of:
+- OWASP Top 10 vulnerabilities and CVSS v3.1 assessments
+- Common coding mistakes and anti-patterns
+- Algorithm complexity analysis (Big O notation)
+- Python performance best practices
+
+Use systematic Chain-of-Thought reasoning to analyze code thoroughly."""
+
+    COMBINED_ANALYSIS_TEMPLATE = Template("""Analyze the code under CODE TO ANALYZE for bugs and vulnerabilities, security risk and optimization opportunities in a single pass.
+
+# OUTPUT FORMAT
+Respond ONLY with valid JSON (no markdown, no extra text):
+
+{
+  "bug_analysis": {
+    "has_bugs": true/false,
+    "overall_risk": "low/medium/high",
+    "bugs_found": [
+      {
+        "type": "vulnerability type",
+        "line": "line number or general",
+        "description": "detailed description",
+        "severity": "low/medium/high",
+        "cwe_id": "CWE-XXX"
+      }
+    ]
+  },
+  "security_analysis": {
+    "overall_security_score": 7.5,
+    "overall_severity": "HIGH",
+    "vulnerabilities": [
+      {
+        "type": "vulnerability type",
+        "cvss_score": 7.5,
+        "severity": "HIGH",
+        "description": "detailed description",
+        "remediation": "how to fix"
+      }
+    ],
+    "risk_summary": "executive summary",
+    "immediate_actions": ["list of fixes"]
+  },
+  "optimization_analysis": {
+    "current_complexity": {
+      "time": "O(n) or other notation",
+      "space": "O(n) or other notation",
+      "bottlenecks": ["list of issues"]
+    },
+    "optimizations": [
+      {
+        "type": "algorithmic/syntactic",
+        "description": "what to improve",
+        "improvement": "expected gain"
+      }
+    ],
+    "estimated_speedup": "2x or percentage"
+  }
+}
+
+# SIMILAR PATTERNS FROM KNOWLEDGE BASE
+{{ retrieved_context }}
+
+# CODE TO ANALYZE
+{{ query_code }}""")
+
+    TRIAGE_SYSTEM = """You are a fast code triage assistant. You decide whether code needs an in-depth security and bug review. Boilerplate, configuration and trivial glue code do not."""
+
+    TRIAGE_TEMPLATE = Template("""Classify whether the code under CODE TO CLASSIFY needs an in-depth review for bugs and vulnerabilities.
+
+# OUTPUT FORMAT
+Respond ONLY with valid JSON (no markdown, no extra text):
+
+{
+  "suspicion_score": 0.0 to 1.0,
+  "reason": "one short sentence"
+}
+
+# CODE TO CLASSIFY
+{{ query_code }}""")
+
+    # section -> JSON schema for structured output (response_format json_schema)
+    RESPONSE_SCHEMAS = {
+        'bug_analysis': BUG_SCHEMA,
+        'optimization_analysis': OPTIMIZATION_SCHEMA,
+        'security_analysis': SECURITY_SCHEMA,
+        'combined': COMBINED_SCHEMA,
+        'triage': TRIAGE_SCHEMA,
+    }
+
+    @classmethod
+    def response_schema(cls, section: Optional[str]) -> Optional[Dict]:
+        """The json_schema response_format entry for a section, or None if it has no schema"""
+        schema = cls.RESPONSE_SCHEMAS.get(section)
+        if schema is None:
+            return None
+        return {"name": section, "schema": schema, "strict": True}
 
     @classmethod
     def render_bug_detection_prompt(cls, query_code: str, context: str) -> Dict:
@@ -139,6 +315,23 @@ Respond ONLY with valid JSON (no markdown, no extra text):
             )
         }
 
+    @classmethod
+    def render_combined_analysis_prompt(cls, query_code: str, context: str) -> Dict:
+        return {
+            'system': cls.COMBINED_ANALYSIS_SYSTEM,
+            'user': cls.COMBINED_ANALYSIS_TEMPLATE.render(
+                query_code=query_code,
+                retrieved_context=context
+            )
+        }
+
+    @classmethod
+    def render_triage_prompt(cls, query_code: str) -> Dict:
+        return {
+            'system': cls.TRIAGE_SYSTEM,
+            'user': cls.TRIAGE_TEMPLATE.render(query_code=query_code)
+        }
+
 
 if __name__ == "__main__":
     if not os.getenv("OPENAI_API_KEY"):
@@ -168,5 +361,6 @@ if __name__ == "__main__":
     bug_prompt = templates.render_bug_detection_prompt(test_code, rag_context['formatted_context'])
     opt_prompt = templates.render_optimization_prompt(test_code, rag_context['formatted_context'])
     sec_prompt = templates.render_security_scoring_prompt(test_code, rag_context['formatted_context'])
+    combined_prompt = templates.render_combined_analysis_prompt(test_code, rag_context['formatted_context'])
 
     print(f"Prompts generated successfully")
\ No newline at end of file
@@ -1,103 +1,500 @@
 import os
 import sys
-from typing import Dict, Optional, List
+from typing import Callable, Dict, Optional, List
+import re
 import json
+import time
+import threading
+import contextvars
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from phase_2.rag_core import RAGCore
-from phase_2.llm_analyzer import LLMAnalyzer
+from phase_2.llm_analyzer import LLMAnalyzer, CACHE_ROOT
+from phase_2.retrieval_cache import RetrievalCache
+from phase_2.retry_policy import RetryPolicy
+from phase_2.triage import TriageClassifier
+from phase_1.metrics import MetricsCollector, metrics_scope
+from phase_1.tracing import span
+from phase_1.cassette import Cassette, active_cassette
 from phase_1.vector_store import ChromaVectorStore
 from phase_1.embedding_generator import EmbeddingGenerator
+from phase_1.code_chunker import CodeChunker
+
+RISK_RANK = {'unknown': 0, 'none': 0, 'low': 1, 'medium': 2, 'high': 3, 'critical': 4}
+LINE_REFERENCE = re.compile(r'^\s*(lines?\s*)?\d+(\s*[-–,]\s*\d+)*\s*$', re.IGNORECASE)
 
 
 class RAGAnalyzer:
+    # analysis_type -> (result key, LLMAnalyzer method)
+    ANALYSIS_SECTIONS = {
+        'bugs': ('bug_analysis', 'analyze_for_bugs'),
+        'optimization': ('optimization_analysis', 'analyze_for_optimization'),
+        'security': ('security_analysis', 'calculate_security_score'),
+    }
+
     def __init__(self, vector_store: ChromaVectorStore, embedding_generator: EmbeddingGenerator,
-                 llm_model: str = "gpt-4o", top_k: int = 5):
+                 llm_model: str = "gpt-4o", top_k: int = 5, llm_timeout: Optional[float] = 300,
+                 combined_analysis: bool = False, use_llm_cache: Optional[bool] = None,
+                 cascade: bool = False, triage_model: Optional[str] = None,
+                 escalation_threshold: float = 0.35, static_prefilter: bool = False,
+                 context_token_budget: Optional[int] = None, use_retrieval_cache: Optional[bool] = None,
+                 retrieval_mode: str = "hybrid", llm_request_timeout: Optional[float] = None,
+                 stream_llm: bool = False, early_stop_fields: Optional[Dict] = None,
+                 field_listener: Optional[Callable] = None, llm_retry_policy: Optional[RetryPolicy] = None,
+                 structured_output: bool = False, metrics: Optional[MetricsCollector] = None,
+                 cassette: Optional[Cassette] = None):
+        # Recording or replaying OpenAI calls; the caches default off so every call reaches it
+        cassette = cassette or active_cassette()
+        # NEURASHIELD_RETRIEVAL_CACHE=0 re-embeds and re-queries every time
+        if use_retrieval_cache is None:
+            use_retrieval_cache = cassette is None and os.getenv("NEURASHIELD_RETRIEVAL_CACHE", "1") != "0"
+
         self.rag_core = RAGCore(
             vector_store=vector_store,
             embedding_generator=embedding_generator,
-            top_k=top_k
+            top_k=top_k,
+            context_token_budget=context_token_budget,
+            retrieval_cache=RetrievalCache(os.path.join(CACHE_ROOT, 'retrieval')) if use_retrieval_cache else None,
+            retrieval_mode=retrieval_mode
         )
-        self.llm_analyzer = LLMAnalyzer(model=llm_model)
-
-    def analyze_code(self, code: str, analysis_type: str = "all", top_k: Optional[int] = None) -> Dict:
-        max_retries = 2
-        last_error = None
-        for attempt in range(max_retries):
-            try:
-                timestamp = datetime.now().isoformat()
-
-                rag_context = self.rag_core.build_rag_context(
+        self.llm_analyzer = LLMAnalyzer(model=llm_model, use_cache=use_llm_cache,
+                                        request_timeout=llm_request_timeout, stream=stream_llm,
+                                        early_stop_fields=early_stop_fields, field_listener=field_listener,
+                                        retry_policy=llm_retry_policy, structured_output=structured_output,
+                                        metrics=metrics, cassette=cassette)
+        # Shared with the embedding generator and triage model so one run has one ledger
+        self.metrics = metrics
+        self.llm_timeout = llm_timeout
+        # One LLM call per file for analysis_type="all" instead of three
+        self.combined_analysis = combined_analysis
+
+        # Model cascade: only files the triage pass flags reach llm_model.
+        # static_prefilter alone skips just the code the rule engine proves uninteresting.
+        self.triage = None
+        if cascade:
+            self.triage = TriageClassifier(
+                triage_model=triage_model,
+                escalation_threshold=escalation_threshold,
+                metrics=metrics,
+                cassette=cassette
+            )
+        elif static_prefilter:
+            self.triage = TriageClassifier(escalation_threshold=0.0)
+
+        self._chunker = None
+        self._chunker_lock = threading.Lock()
+
+    def requested_sections(self, analysis_type: str) -> List[tuple]:
+        return [
+            section for name, section in self.ANALYSIS_SECTIONS.items()
+            if analysis_type in (name, 'all')
+        ]
+
+    def _section_failure(self, result_key: str, message: str) -> Dict:
+        if result_key == 'security_analysis':
+            return self.llm_analyzer._security_fallback(0, f"Analysis error: {message}")
+        return {"error": True, "message": message}
+
+    def _run_llm_sections(self, code: str, formatted_context: str, analysis_type: str) -> Dict:
+        """Run the requested LLM analyses concurrently, isolating failures per section"""
+        sections = self.requested_sections(analysis_type)
+        if not sections:
+            return {}
+
+        if self.combined_analysis and analysis_type == 'all':
+            return self._run_combined_analysis(code, formatted_context)
+
+        executor = ThreadPoolExecutor(max_workers=len(sections))
+        try:
+            # Each section runs in a copy of this context so metrics keep the file label
+            futures = {
+                result_key: executor.submit(
+                    contextvars.copy_context().run,
+                    getattr(self.llm_analyzer, method_name),
                     query_code=code,
-                    analysis_type=analysis_type,
-                    top_k=top_k
+                    retrieved_context=formatted_context
                 )
-
-                results = {
-                    'timestamp': timestamp,
-                    'code': code,
-                    'analysis_type': analysis_type,
-                    'retrieved_patterns_count': rag_context['num_patterns'],
-                    'retrieved_patterns': rag_context['retrieved_patterns']
-                }
-
-                if analysis_type in ['bugs', 'all']:
-                    bug_analysis = self.llm_analyzer.analyze_for_bugs(
-                        query_code=code,
-                        retrieved_context=rag_context['formatted_context']
-                    )
-                    results['bug_analysis'] = bug_analysis
-
-                if analysis_type in ['optimization', 'all']:
-                    optimization_analysis = self.llm_analyzer.analyze_for_optimization(
-                        query_code=code,
-                        retrieved_context=rag_context['formatted_context']
+                for result_key, method_name in sections
+            }
+
+            deadline = time.monotonic() + self.llm_timeout if self.llm_timeout else None
+            section_results = {}
+            for result_key, future in futures.items():
+                remaining = max(deadline - time.monotonic(), 0) if deadline else None
+                try:
+                    section_results[result_key] = future.result(timeout=remaining)
+                except TimeoutError:
+                    future.cancel()
+                    section_results[result_key] = self._section_failure(
+                        result_key, f"Timed out after {self.llm_timeout}s"
                     )
-                    results['optimization_analysis'] = optimization_analysis
+                except Exception as e:
+                    section_results[result_key] = self._section_failure(result_key, str(e))
+            return section_results
+        finally:
+            # Don't block on a hung request; its result is already discarded
+            executor.shutdown(wait=False)
+
+    def _run_combined_analysis(self, code: str, formatted_context: str) -> Dict:
+        executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            future = executor.submit(
+                contextvars.copy_context().run,
+                self.llm_analyzer.analyze_all,
+                query_code=code,
+                retrieved_context=formatted_context
+            )
+            return future.result(timeout=self.llm_timeout)
+        except TimeoutError:
+            message = f"Timed out after {self.llm_timeout}s"
+        except Exception as e:
+            message = str(e)
+        finally:
+            executor.shutdown(wait=False)
 
-                if analysis_type in ['security', 'all']:
-                    security_analysis = self.llm_analyzer.calculate_security_score(
-                        query_code=code,
-                        retrieved_context=rag_context['formatted_context']
-                    )
-                    results['security_analysis'] = security_analysis
-
-                return results
-            except TimeoutError as e:
-                last_error = e
-                if attempt < max_retries - 1:
-                    print(f"⚠️ Timeout on attempt {attempt + 1}, retrying...")
-                    continue
-            except Exception as e:
-                return {
-                    'error': f'Analysis failed: {str(e)}',
-                    'timestamp': datetime.now().isoformat()
-                }
-        
         return {
-            'error': f'Analysis timed out after {max_retries} attempts',
-            'timestamp': datetime.now().isoformat()
+            result_key: self._section_failure(result_key, message)
+            for result_key, _ in self.ANALYSIS_SECTIONS.values()
         }
 
-    def batch_analyze(self, code_samples: List[Dict], analysis_type: str = "all") -> List[Dict]:
+    def _triaged_clean_result(self, code: str, analysis_type: str, triage: Dict) -> Dict:
+        summary = (f"Triage classified code as clean "
+                   f"(score {triage['suspicion_score']} < {triage['threshold']}); deep analysis skipped")
+        clean_sections = {
+            'bug_analysis': {'has_bugs': False, 'bugs_found': [], 'overall_risk': 'low'},
+            'optimization_analysis': {'current_complexity': {}, 'optimizations': [], 'estimated_speedup': 'N/A'},
+            'security_analysis': {
+                "overall_security_score": 0.0,
+                "overall_severity": "NONE",
+                "vulnerabilities": [],
+                "risk_summary": summary,
+                "immediate_actions": []
+            },
+        }
+
+        results = {
+            'timestamp': datetime.now().isoformat(),
+            'code': code,
+            'analysis_type': analysis_type,
+            'retrieved_patterns_count': 0,
+            'retrieved_patterns': [],
+            'triage': triage
+        }
+        for result_key, _ in self.requested_sections(analysis_type):
+            results[result_key] = clean_sections[result_key]
+        return results
+
+    def cascade_summary(self) -> Optional[Dict]:
+        if self.triage is None:
+            return None
+        return dict(self.triage.stats)
+
+    def cancel(self):
+        """Stop making LLM calls; analyses still running return errors instead of waiting"""
+        self.llm_analyzer.cancelled.set()
+
+    def set_deadline(self, deadline_at: Optional[float]):
+        """No LLM request runs past deadline_at (a time.monotonic() instant)"""
+        self.llm_analyzer.deadline_at = deadline_at
+
+    def analyze_code(self, code: str, analysis_type: str = "all", top_k: Optional[int] = None,
+                     file_path: Optional[str] = None) -> Dict:
+        with metrics_scope(file=file_path), span('analyze_code', file=file_path):
+            return self._analyze_code(code, analysis_type, top_k, file_path)
+
+    def _analyze_code(self, code: str, analysis_type: str, top_k: Optional[int],
+                      file_path: Optional[str]) -> Dict:
+        if self.llm_analyzer.cancelled.is_set():
+            return {
+                'error': 'Analysis cancelled',
+                'timestamp': datetime.now().isoformat()
+            }
+
+        triage = None
+        if self.triage is not None:
+            with span('triage'):
+                triage = self.triage.classify(code)
+            if not triage['escalated']:
+                return self._triaged_clean_result(code, analysis_type, triage)
+
+        # Retries, timeouts and the overall deadline live in the LLMAnalyzer's RetryPolicy
+        try:
+            timestamp = datetime.now().isoformat()
+
+            with metrics_scope(stage='retrieve'), span('retrieve', mode=self.rag_core.retrieval_mode):
+                rag_context = self.rag_core.build_rag_context(
+                    query_code=code,
+                    analysis_type=analysis_type,
+                    top_k=top_k,
+                    exclude_file_path=file_path
+                )
+
+            results = {
+                'timestamp': timestamp,
+                'code': code,
+                'analysis_type': analysis_type,
+                'retrieved_patterns_count': rag_context['num_patterns'],
+                'retrieved_patterns': rag_context['retrieved_patterns']
+            }
+            if 'context_tokens' in rag_context:
+                results['context_tokens'] = rag_context['context_tokens']
+            if triage is not None:
+                results['triage'] = triage
+
+            results.update(self._run_llm_sections(
+                code=code,
+                formatted_context=rag_context['formatted_context'],
+                analysis_type=analysis_type
+            ))
+
+            return results
+        except Exception as e:
+            return {
+                'error': f'Analysis failed: {str(e)}',
+                'timestamp': datetime.now().isoformat()
+            }
+
+    def batch_analyze(self, code_samples: List[Dict], analysis_type: str = "all",
+                      chunked: bool = False, on_result: Optional[Callable[[Dict, Dict], None]] = None) -> List[Dict]:
+        """on_result(sample, analysis) runs as each sample finishes, e.g. to checkpoint it"""
         results = []
         for i, sample in enumerate(code_samples, 1):
-            analysis = self.analyze_code(code=sample['code'], analysis_type=analysis_type)
+            if chunked:
+                analysis = self.analyze_code_chunked(
+                    code=sample['code'],
+                    file_path=sample.get('name', f"sample_{i}"),
+                    analysis_type=analysis_type
+                )
+            else:
+                analysis = self.analyze_code(
+                    code=sample['code'],
+                    analysis_type=analysis_type,
+                    file_path=sample.get('name')
+                )
             analysis['sample_name'] = sample.get('name', f"sample_{i}")
             results.append(analysis)
+            if on_result is not None:
+                on_result(sample, analysis)
+
+        cascade = self.cascade_summary()
+        if cascade:
+            print(f"Cascade: {cascade['escalated']} escalated to {self.llm_analyzer.model}, "
+                  f"{cascade['skipped']} skipped as clean")
         return results
 
+    def select_analysis_chunks(self, code: str, file_path: str, max_chunk_tokens: int = 1500) -> List[Dict]:
+        """Non-overlapping function/class chunks plus the module-level remainder"""
+        if self._chunker is None:
+            with self._chunker_lock:
+                if self._chunker is None:
+                    self._chunker = CodeChunker()
+
+        candidates = self._chunker.chunk_by_function(code, file_path, max_tokens=max_chunk_tokens)
+        for chunk in candidates:
+            chunk.setdefault('line_start', 1)
+            chunk.setdefault('line_end', chunk['line_start'] + chunk['code'].count('\n'))
+
+        # chunk_by_function reports methods and nested functions alongside their class;
+        # keep only the outermost chunk for each region
+        selected = []
+        for chunk in sorted(candidates, key=lambda c: (c['line_start'], -c['line_end'])):
+            if any(kept['line_start'] <= chunk['line_start'] and chunk['line_end'] <= kept['line_end']
+                   for kept in selected):
+                continue
+            selected.append(chunk)
+
+        lines = code.splitlines()
+        covered = set()
+        for chunk in selected:
+            covered.update(range(chunk['line_start'], chunk['line_end'] + 1))
+
+        # Imports, globals and top-level statements, blanked elsewhere so line numbers stay true
+        remainder = [line if i not in covered else '' for i, line in enumerate(lines, 1)]
+        if any(line.strip() for line in remainder):
+            selected.append({
+                'code': '\n'.join(remainder).rstrip(),
+                'type': 'module_remainder',
+                'name': f"{file_path}:<module>",
+                'file_path': file_path,
+                'line_start': 1,
+                'line_end': len(lines)
+            })
+
+        return selected
+
+    @staticmethod
+    def _shift_line(value, offset: int):
+        if offset == 0:
+            return value
+        if isinstance(value, int):
+            return value + offset
+        if isinstance(value, str) and LINE_REFERENCE.match(value):
+            return re.sub(r'\d+', lambda m: str(int(m.group()) + offset), value)
+        return value
+
+    def _shift_items(self, items: List, chunk: Dict) -> List[Dict]:
+        offset = chunk['line_start'] - 1 if chunk['type'] != 'module_remainder' else 0
+        shifted = []
+        for item in items or []:
+            if not isinstance(item, dict):
+                continue
+            item = dict(item)
+            if 'line' in item:
+                item['line'] = self._shift_line(item['line'], offset)
+            item['chunk'] = chunk['name']
+            shifted.append(item)
+        return shifted
+
+    def merge_chunk_results(self, code: str, analysis_type: str,
+                            chunk_results: List[tuple]) -> Dict:
+        """Merge (chunk, analysis) pairs back into one file-level result"""
+        merged = {
+            'timestamp': datetime.now().isoformat(),
+            'code': code,
+            'analysis_type': analysis_type,
+            'retrieved_patterns_count': 0,
+            'retrieved_patterns': [],
+            'chunks': []
+        }
+        seen_patterns = set()
+        bug_parts, opt_parts, sec_parts = [], [], []
+
+        for chunk, analysis in chunk_results:
+            summary = {
+                'name': chunk['name'],
+                'type': chunk['type'],
+                'line_start': chunk['line_start'],
+                'line_end': chunk['line_end']
+            }
+            if analysis.get('error'):
+                summary['error'] = analysis['error']
+            if 'triage' in analysis:
+                summary['triage'] = analysis['triage']
+            merged['chunks'].append(summary)
+
+            for pattern in analysis.get('retrieved_patterns', []):
+                if pattern.get('id') not in seen_patterns:
+                    seen_patterns.add(pattern.get('id'))
+                    merged['retrieved_patterns'].append(pattern)
+
+            if 'bug_analysis' in analysis and not analysis['bug_analysis'].get('error'):
+                bug_parts.append((chunk, analysis['bug_analysis']))
+            if 'optimization_analysis' in analysis and not analysis['optimization_analysis'].get('error'):
+                opt_parts.append((chunk, analysis['optimization_analysis']))
+            if 'security_analysis' in analysis:
+                sec_parts.append((chunk, analysis['security_analysis']))
+
+        merged['retrieved_patterns_count'] = len(merged['retrieved_patterns'])
+        sections = dict(self.requested_sections(analysis_type))
+
+        if 'bug_analysis' in sections:
+            if bug_parts:
+                bugs = [bug for chunk, part in bug_parts for bug in self._shift_items(part.get('bugs_found'), chunk)]
+                risks = [str(part.get('overall_risk', 'low')).lower() for _, part in bug_parts]
+                merged['bug_analysis'] = {
+                    'has_bugs': bool(bugs) or any(part.get('has_bugs') for _, part in bug_parts),
+                    'bugs_found': bugs,
+                    'overall_risk': max(risks, key=lambda r: RISK_RANK.get(r, 0))
+                }
+            else:
+                merged['bug_analysis'] = self._section_failure('bug_analysis', 'All chunk analyses failed')
+
+        if 'optimization_analysis' in sections:
+            if opt_parts:
+                largest_chunk, largest = max(opt_parts, key=lambda p: p[0]['line_end'] - p[0]['line_start'])
+                busiest = max(opt_parts, key=lambda p: len(p[1].get('optimizations') or []))[1]
+                complexity = dict(largest.get('current_complexity') or {})
+                complexity['bottlenecks'] = [
+                    b for _, part in opt_parts
+                    for b in (part.get('current_complexity') or {}).get('bottlenecks', [])
+                ]
+                merged['optimization_analysis'] = {
+                    'current_complexity': complexity,
+                    'optimizations': [opt for chunk, part in opt_parts
+                                      for opt in self._shift_items(part.get('optimizations'), chunk)],
+                    'estimated_speedup': busiest.get('estimated_speedup', 'N/A')
+                }
+            else:
+                merged['optimization_analysis'] = self._section_failure('optimization_analysis',
+                                                                        'All chunk analyses failed')
+
+        if 'security_analysis' in sections:
+            scored = [(chunk, part) for chunk, part in sec_parts
+                      if str(part.get('overall_severity', 'UNKNOWN')).upper() != 'UNKNOWN']
+            if scored:
+                worst = max(scored, key=lambda p: float(p[1].get('overall_security_score') or 0))[1]
+                vulnerabilities = [v for chunk, part in scored
+                                   for v in self._shift_items(part.get('vulnerabilities'), chunk)]
+                summaries = [f"{chunk['name']}: {part['risk_summary']}" for chunk, part in scored
+                             if part.get('vulnerabilities') and part.get('risk_summary')]
+                actions = []
+                for _, part in scored:
+                    for action in part.get('immediate_actions') or []:
+                        if action not in actions:
+                            actions.append(action)
+                merged['security_analysis'] = {
+                    'overall_security_score': worst.get('overall_security_score'),
+                    'overall_severity': max((str(p.get('overall_severity')).upper() for _, p in scored),
+                                            key=lambda s: RISK_RANK.get(s.lower(), 0)),
+                    'vulnerabilities': vulnerabilities,
+                    'risk_summary': ' | '.join(summaries) or worst.get('risk_summary', ''),
+                    'immediate_actions': actions
+                }
+            elif sec_parts:
+                merged['security_analysis'] = sec_parts[0][1]
+            else:
+                merged['security_analysis'] = self._section_failure('security_analysis', 'All chunk analyses failed')
+
+        return merged
+
+    def analyze_chunks(self, code: str, chunks: List[Dict], analysis_type: str = "all",
+                       max_workers: int = 4, file_path: Optional[str] = None) -> Dict:
+        """Retrieve and analyze each chunk separately, in parallel, then merge per file"""
+        if not chunks:
+            return self.analyze_code(code=code, analysis_type=analysis_type, file_path=file_path)
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as executor:
+            analyses = list(executor.map(
+                lambda chunk: self.analyze_code(
+                    code=chunk['code'],
+                    analysis_type=analysis_type,
+                    file_path=chunk.get('file_path', file_path)
+                ),
+                chunks
+            ))
+
+        return self.merge_chunk_results(code, analysis_type, list(zip(chunks, analyses)))
+
+    def analyze_code_chunked(self, code: str, file_path: str, analysis_type: str = "all",
+                             max_chunk_tokens: int = 1500, max_workers: int = 4) -> Dict:
+        chunks = self.select_analysis_chunks(code, file_path, max_chunk_tokens=max_chunk_tokens)
+        return self.analyze_chunks(code, chunks, analysis_type=analysis_type,
+                                   max_workers=max_workers, file_path=file_path)
+
     def generate_report(self, analysis_results: Dict) -> str:
         report_lines = []
         report_lines.append("="*70)
         report_lines.append("NEURASHIELD.AI - CODE ANALYSIS REPORT")
         report_lines.append("="*70)
         report_lines.append(f"Timestamp: {analysis_results['timestamp']}")
+        if analysis_results.get('error'):
+            # The whole file failed (retrieval error, cancellation): there are no sections to show
+            if 'sample_name' in analysis_results:
+                report_lines.append(f"File: {analysis_results['sample_name']}")
+            report_lines.append(f"✗ Error: {analysis_results['error']}")
+            return "\n".join(report_lines)
         report_lines.append(f"Analysis Type: {analysis_results['analysis_type']}")
         report_lines.append(f"Retrieved Patterns: {analysis_results['retrieved_patterns_count']}")
         report_lines.append(f"Code Length: {len(analysis_results['code'])} characters")
+        if 'triage' in analysis_results:
+            triage = analysis_results['triage']
+            path = 'escalated' if triage['escalated'] else 'skipped'
+            report_lines.append(f"Triage: {path} (score {triage['suspicion_score']}, {triage['source']})")
+            for finding in triage.get('static_findings', []):
+                report_lines.append(f"Static: line {finding['line']} {finding['title']} [{finding['severity']}]")
         report_lines.append("\n" + "-"*70)
 
         if 'bug_analysis' in analysis_results:
@@ -106,7 +503,7 @@ class RAGAnalyzer:
             report_lines.append("-"*70)
 
             if bug_data.get('error'):
-                report_lines.append(f"✗ Error: {bug_data['error']}")
+                report_lines.append(f"✗ Error: {bug_data.get('message', bug_data['error'])}")
             elif bug_data.get('has_bugs', False):
                 bugs = bug_data.get('bugs_found', [])
                 report_lines.append(f"⚠️  BUGS FOUND: {len(bugs)}")
@@ -137,7 +534,7 @@ class RAGAnalyzer:
             report_lines.append("-"*70)
 
             if opt_data.get('error'):
-                report_lines.append(f"✗ Error: {opt_data['error']}")
+                report_lines.append(f"✗ Error: {opt_data.get('message', opt_data['error'])}")
             else:
                 complexity = opt_data.get('current_complexity', {})
                 report_lines.append(f"Current Complexity:")
@@ -167,7 +564,7 @@ class RAGAnalyzer:
             report_lines.append("-"*70)
 
             if sec_data.get('error'):
-                report_lines.append(f"✗ Error: {sec_data['error']}")
+                report_lines.append(f"✗ Error: {sec_data.get('message', sec_data['error'])}")
             else:
                 score = sec_data.get('overall_security_score', 0)
                 severity = sec_data.get('overall_severity', 'Unknown')
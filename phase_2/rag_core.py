@@ -1,68 +1,254 @@
 import os
+import re
 import sys
+import hashlib
 from typing import List, Dict, Optional
 import json
+import tiktoken
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 phase1_db = os.path.join(project_root, 'phase_1', 'chroma_db')
 
 from phase_1.embedding_generator import EmbeddingGenerator
-from phase_1.vector_store import ChromaVectorStore
+from phase_1.vector_store import ChromaVectorStore, content_hash
+from phase_2.disk_cache import DiskCache
+from phase_2.retrieval_cache import RetrievalCache
+
+
+IDENTIFIER = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+RETRIEVAL_MODES = ('vector', 'hybrid', 'lexical')
+RRF_K = 60
 
 
 class RAGCore:
-    def __init__(self, vector_store: ChromaVectorStore, embedding_generator: EmbeddingGenerator, top_k: int = 5):
+    def __init__(self, vector_store: ChromaVectorStore, embedding_generator: EmbeddingGenerator, top_k: int = 5,
+                 context_token_budget: Optional[int] = None, min_similarity: float = 0.0,
+                 retrieval_cache: Optional[RetrievalCache] = None, retrieval_mode: str = "hybrid"):
+        if retrieval_mode not in RETRIEVAL_MODES:
+            raise ValueError(f"retrieval_mode must be one of {RETRIEVAL_MODES}, got {retrieval_mode!r}")
         self.vector_store = vector_store
         self.embedding_gen = embedding_generator
         self.top_k = top_k
+        # None keeps the unbounded format_context_for_prompt behaviour
+        self.context_token_budget = context_token_budget
+        self.min_similarity = min_similarity
+        self._encoding = None
+        self.retrieval_cache = retrieval_cache
+        # 'lexical' never touches embedding_generator, which may then be None
+        self.retrieval_mode = retrieval_mode
+
+    def count_tokens(self, text: str) -> int:
+        if self._encoding is None:
+            self._encoding = tiktoken.get_encoding("cl100k_base")
+        return len(self._encoding.encode(text))
 
     def retrieve_similar_patterns(self, query_code: str, top_k: Optional[int] = None,
-                                  filter_by_type: Optional[str] = None) -> List[Dict]:
+                                  filter_by_type: Optional[str] = None,
+                                  exclude_file_path: Optional[str] = None,
+                                  exclude_self: bool = True) -> List[Dict]:
         k = top_k or self.top_k
-        query_embedding = self.embedding_gen.generate_embedding(query_code)
+
+        cache_key = None
+        if self.retrieval_cache is not None:
+            cache_key = DiskCache.make_key(
+                'retrieval',
+                self.vector_store.collection_name,
+                self.vector_store.generation,
+                self.retrieval_mode,
+                self.embedding_gen.model if self.retrieval_mode != 'lexical' else None,
+                hashlib.sha256(query_code.encode('utf-8')).hexdigest(),
+                k,
+                filter_by_type,
+                exclude_file_path,
+                exclude_self
+            )
+            cached = self.retrieval_cache.get(cache_key)
+            if cached is not None:
+                return list(cached)
 
         metadata_filter = None
         if filter_by_type:
             metadata_filter = {'type': filter_by_type}
 
-        results = self.vector_store.search_similar_code(
-            query_embedding=query_embedding,
-            top_k=k,
-            filter_metadata=metadata_filter
-        )
+        # Skip the query's own code (same normalized content) and its same-file neighbours
+        search_kwargs = {
+            'filter_metadata': metadata_filter,
+            'exclude_file_path': exclude_file_path,
+            'exclude_content_hash': content_hash(query_code) if exclude_self else None
+        }
+        # Hybrid pulls a deeper list from each side so fusion has something to reorder
+        depth = k * 2 if self.retrieval_mode == 'hybrid' else k
+
+        rankings = []
+        if self.retrieval_mode != 'lexical':
+            query_embedding = self.embedding_gen.generate_embedding(query_code)
+            rankings.append(self.vector_store.search_similar_code(
+                query_embedding=query_embedding, top_k=depth, **search_kwargs
+            ))
+        if self.retrieval_mode != 'vector':
+            rankings.append(self.vector_store.search_lexical(query_code, top_k=depth, **search_kwargs))
+
+        results = rankings[0][:k] if len(rankings) == 1 else self.fuse_rankings(rankings, k)
+
+        if cache_key is not None:
+            self.retrieval_cache.set(cache_key, results)
         return results
 
+    @staticmethod
+    def fuse_rankings(rankings: List[List[Dict]], top_k: int, rrf_k: int = RRF_K) -> List[Dict]:
+        """
+        Reciprocal rank fusion: each list contributes 1 / (rrf_k + rank) per hit.
+        A chunk keeps the similarity_score of the first list that returned it,
+        so put the vector ranking first to keep cosine scores where available.
+        """
+        fused: Dict[str, Dict] = {}
+        for ranking in rankings:
+            for rank, hit in enumerate(ranking, 1):
+                entry = fused.get(hit['id'])
+                if entry is None:
+                    entry = fused[hit['id']] = dict(hit, rrf_score=0.0)
+                entry['rrf_score'] += 1.0 / (rrf_k + rank)
+
+        return sorted(fused.values(), key=lambda hit: hit['rrf_score'], reverse=True)[:top_k]
+
     def format_context_for_prompt(self, similar_patterns: List[Dict], include_metadata: bool = True) -> str:
         context_parts = []
 
         for i, pattern in enumerate(similar_patterns, 1):
-            similarity_score = pattern.get('similarity_score', 0)
-            context_part = f"### Similar Pattern {i} (Similarity: {similarity_score:.2%})\n"
-
-            if include_metadata:
-                metadata = pattern['metadata']
-                context_part += f"**File**: {metadata.get('file_path', 'unknown')}\n"
-                context_part += f"**Type**: {metadata.get('type', 'unknown')}\n"
-                context_part += f"**Name**: {metadata.get('name', 'unknown')}\n"
-                context_part += f"**Lines**: {metadata.get('line_start', 0)}-{metadata.get('line_end', 0)}\n"
-
-                if 'complexity_score' in metadata:
-                    context_part += f"**Complexity Score**: {metadata.get('complexity_score')}\n"
-
+            context_part = self._pattern_header(i, pattern, include_metadata)
             context_part += f"\n```{pattern['code']}```\n"
             context_parts.append(context_part)
 
         return "\n".join(context_parts)
 
+    def _pattern_header(self, index: int, pattern: Dict, include_metadata: bool) -> str:
+        header = f"### Similar Pattern {index} (Similarity: {pattern.get('similarity_score', 0):.2%})\n"
+        if include_metadata:
+            metadata = pattern['metadata']
+            header += f"**File**: {metadata.get('file_path', 'unknown')}\n"
+            header += f"**Type**: {metadata.get('type', 'unknown')}\n"
+            header += f"**Name**: {metadata.get('name', 'unknown')}\n"
+            header += f"**Lines**: {metadata.get('line_start', 0)}-{metadata.get('line_end', 0)}\n"
+            if 'complexity_score' in metadata:
+                header += f"**Complexity Score**: {metadata.get('complexity_score')}\n"
+        return header
+
+    def _trim_to_tokens(self, code: str, max_tokens: int) -> Optional[str]:
+        """Keep whole leading lines of code within max_tokens, noting how much was cut"""
+        if self.count_tokens(code) <= max_tokens:
+            return code
+
+        lines = code.splitlines()
+        kept, used = [], 0
+        marker_tokens = 12
+        for line in lines:
+            line_tokens = self.count_tokens(line + '\n')
+            if used + line_tokens + marker_tokens > max_tokens:
+                break
+            kept.append(line)
+            used += line_tokens
+
+        if not kept:
+            return None
+        kept.append(f"# ... {len(lines) - len(kept)} more lines truncated")
+        return '\n'.join(kept)
+
+    @staticmethod
+    def _identifier_set(code: str) -> set:
+        return set(IDENTIFIER.findall(code))
+
+    def pack_context(self, similar_patterns: List[Dict], token_budget: int,
+                     min_similarity: Optional[float] = None, mmr_lambda: float = 0.7,
+                     max_pattern_tokens: Optional[int] = None, min_pattern_tokens: int = 40,
+                     include_metadata: bool = True) -> Dict:
+        """
+        Fit retrieved patterns into a token budget: drop low-similarity vector hits, pick
+        the rest by MMR (relevance vs. identifier overlap with patterns already chosen) and
+        trim long bodies. Returns the formatted context and the tokens it uses.
+        """
+        threshold = self.min_similarity if min_similarity is None else min_similarity
+        per_pattern_cap = max_pattern_tokens or max(token_budget // 2, min_pattern_tokens)
+
+        # Fused hits are ranked by their RRF score, rescaled to [0, 1]: cosine and
+        # best-hit-normalised BM25 are not on one scale, and the fused order is the ranking
+        best_rrf = max((pattern.get('rrf_score', 0) for pattern in similar_patterns), default=0)
+
+        def relevance(pattern):
+            if best_rrf > 0 and 'rrf_score' in pattern:
+                return pattern['rrf_score'] / best_rrf
+            return pattern.get('similarity_score', 0)
+
+        # The threshold is a cosine similarity; lexical hits (bm25_score) have no such score
+        candidates = [
+            (pattern, self._identifier_set(pattern['code']))
+            for pattern in similar_patterns
+            if 'bm25_score' in pattern or pattern.get('similarity_score', 0) >= threshold
+        ]
+
+        selected = []
+        context_parts = []
+        tokens_used = 0
+
+        while candidates and token_budget - tokens_used >= min_pattern_tokens:
+            def mmr_score(candidate):
+                pattern, identifiers = candidate
+                redundancy = 0.0
+                for _, chosen in selected:
+                    union = identifiers | chosen
+                    if union:
+                        redundancy = max(redundancy, len(identifiers & chosen) / len(union))
+                return mmr_lambda * relevance(pattern) - (1 - mmr_lambda) * redundancy
+
+            best = max(candidates, key=mmr_score)
+            candidates.remove(best)
+            pattern, identifiers = best
+
+            header = self._pattern_header(len(selected) + 1, pattern, include_metadata)
+            overhead = self.count_tokens(header) + 4
+            body_budget = min(per_pattern_cap, token_budget - tokens_used - overhead)
+            if body_budget < min_pattern_tokens:
+                continue
+
+            body = self._trim_to_tokens(pattern['code'], body_budget)
+            if body is None:
+                continue
+
+            part = header + f"\n```{body}```\n"
+            selected.append((pattern, identifiers))
+            context_parts.append(part)
+            tokens_used += self.count_tokens(part)
+
+        return {
+            'formatted_context': "\n".join(context_parts),
+            'tokens_used': tokens_used,
+            'patterns_used': [pattern for pattern, _ in selected],
+            'patterns_dropped': len(similar_patterns) - len(selected)
+        }
+
     def build_rag_context(self, query_code: str, analysis_type: str = "bug_detection",
-                         top_k: Optional[int] = None, filter_by_type: Optional[str] = None) -> Dict:
+                         top_k: Optional[int] = None, filter_by_type: Optional[str] = None,
+                         token_budget: Optional[int] = None, exclude_file_path: Optional[str] = None) -> Dict:
         similar_patterns = self.retrieve_similar_patterns(
             query_code=query_code,
             top_k=top_k,
-            filter_by_type=filter_by_type
+            filter_by_type=filter_by_type,
+            exclude_file_path=exclude_file_path
         )
 
+        budget = token_budget or self.context_token_budget
+        if budget:
+            packed = self.pack_context(similar_patterns, token_budget=budget)
+            return {
+                'query_code': query_code,
+                'retrieved_patterns': packed['patterns_used'],
+                'formatted_context': packed['formatted_context'],
+                'analysis_type': analysis_type,
+                'num_patterns': len(packed['patterns_used']),
+                'patterns_dropped': packed['patterns_dropped'],
+                'context_tokens': packed['tokens_used']
+            }
+
         formatted_context = self.format_context_for_prompt(similar_patterns)
 
         return {
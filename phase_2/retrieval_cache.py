@@ -0,0 +1,45 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from phase_2.disk_cache import DiskCache
+
+
+class RetrievalCache:
+    """
+    In-memory LRU in front of an on-disk cache of retrieval results.
+    Keys include the vector store generation, so re-indexing invalidates them.
+    """
+
+    def __init__(self, directory: str, max_memory_entries: int = 512,
+                 ttl_seconds: Optional[float] = 30 * 24 * 3600, max_disk_entries: int = 50000):
+        self.max_memory_entries = max_memory_entries
+        self._memory: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.disk = DiskCache(directory, ttl_seconds=ttl_seconds, max_entries=max_disk_entries)
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+
+        value = self.disk.get(key)
+        if value is not None:
+            self._remember(key, value)
+        return value
+
+    def set(self, key: str, value: Any):
+        self._remember(key, value)
+        self.disk.set(key, value)
+
+    def _remember(self, key: str, value: Any):
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
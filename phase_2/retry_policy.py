@@ -0,0 +1,181 @@
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Optional
+
+try:
+    import httpx
+    import openai
+    # Timeouts and dropped connections: the only failures without a status code worth retrying
+    TRANSIENT_ERRORS = (openai.APITimeoutError, openai.APIConnectionError, httpx.TransportError)
+except ImportError:
+    TRANSIENT_ERRORS = ()
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class RetryPolicy:
+    """
+    The one retry layer for LLM calls: per-attempt timeouts scaled to the
+    expected output length, exponential backoff with full jitter that honours
+    Retry-After, an overall deadline, and optional hedged duplicate requests
+    when an attempt is slower than hedge_after seconds.
+    """
+
+    def __init__(self, max_attempts: int = 4, base_timeout: float = 20.0,
+                 seconds_per_token: float = 0.03, max_timeout: float = 180.0,
+                 backoff_base: float = 1.0, backoff_max: float = 30.0,
+                 deadline: Optional[float] = 300.0, hedge_after: Optional[float] = None):
+        self.max_attempts = max_attempts
+        self.base_timeout = base_timeout
+        self.seconds_per_token = seconds_per_token
+        self.max_timeout = max_timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.deadline = deadline
+        self.hedge_after = hedge_after
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def attempt_timeout(self, max_tokens: int) -> float:
+        """Time to first byte plus generation time for max_tokens, capped"""
+        return min(self.max_timeout, self.base_timeout + max_tokens * self.seconds_per_token)
+
+    @staticmethod
+    def retry_after(error: Exception) -> Optional[float]:
+        response = getattr(error, 'response', None)
+        headers = getattr(response, 'headers', None)
+        if not headers:
+            return None
+
+        value = headers.get('retry-after-ms')
+        if value:
+            try:
+                return float(value) / 1000
+            except ValueError:
+                pass
+
+        value = headers.get('retry-after')
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            pass
+        try:
+            return max((parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds(), 0.0)
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def is_retryable(error: Exception) -> bool:
+        status = getattr(error, 'status_code', None)
+        if status is not None:
+            return status in RETRYABLE_STATUS
+        # Anything else (TypeError, a JSON or programming error) fails the same way every time
+        return isinstance(error, TRANSIENT_ERRORS)
+
+    def backoff(self, attempt: int, error: Optional[Exception] = None) -> float:
+        hinted = self.retry_after(error) if error is not None else None
+        if hinted is not None:
+            return min(hinted, self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _hedge_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix='llm-hedge')
+        return self._executor
+
+    def _attempt(self, call: Callable[[float], Any], timeout: float, hedge: bool,
+                 stats: Optional[Dict[str, int]] = None) -> Any:
+        if not hedge or not self.hedge_after or self.hedge_after >= timeout:
+            return call(timeout)
+
+        executor = self._hedge_executor()
+        futures = [executor.submit(call, timeout)]
+        done, _ = wait(futures, timeout=self.hedge_after)
+        if not done:
+            # Slow tail: race a duplicate request and keep whichever answers first
+            logger.debug(f"Hedging LLM request after {self.hedge_after}s")
+            futures.append(executor.submit(call, timeout))
+            if stats is not None:
+                stats['hedges'] += 1
+
+        error = None
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def run(self, call: Callable[[float], Any], max_tokens: int,
+            cancelled: Optional[threading.Event] = None, max_attempts: Optional[int] = None,
+            hedge: bool = True, stats: Optional[Dict[str, int]] = None,
+            deadline_at: Optional[float] = None) -> Any:
+        """
+        call(timeout) performs one request; retries until success, a fatal error or the deadline.
+        stats, if given, is filled with 'retries' (re-attempts after a failure) and 'hedges'
+        (duplicate requests raced against a slow one), which are not retries.
+        deadline_at is a time.monotonic() instant the whole run must finish by: no attempt
+        starts after it and none is given a timeout reaching past it.
+        """
+        if stats is not None:
+            stats.update(retries=0, hedges=0)
+        attempts = max_attempts or self.max_attempts
+        started = time.monotonic()
+        error = None
+
+        for attempt in range(attempts):
+            if cancelled is not None and cancelled.is_set():
+                raise RuntimeError("Cancelled")
+
+            timeout = self.attempt_timeout(max_tokens)
+            if self.deadline is not None:
+                remaining = self.deadline - (time.monotonic() - started)
+                if remaining <= 0:
+                    break
+                timeout = min(timeout, remaining)
+            if deadline_at is not None:
+                remaining = deadline_at - time.monotonic()
+                if remaining <= 0:
+                    raise DeadlineExceeded("Run deadline reached") from error
+                timeout = min(timeout, remaining)
+
+            if stats is not None:
+                stats['retries'] = attempt
+            try:
+                return self._attempt(call, timeout, hedge, stats)
+            except Exception as e:
+                error = e
+                if not self.is_retryable(e) or attempt == attempts - 1:
+                    raise
+                delay = self.backoff(attempt, e)
+                if self.deadline is not None and time.monotonic() - started + delay >= self.deadline:
+                    break
+                if deadline_at is not None and time.monotonic() + delay >= deadline_at:
+                    raise DeadlineExceeded("Run deadline reached") from e
+                logger.warning(f"LLM attempt {attempt + 1}/{attempts} failed ({e}); retrying in {delay:.1f}s")
+                if cancelled is not None:
+                    if cancelled.wait(delay):
+                        raise RuntimeError("Cancelled")
+                else:
+                    time.sleep(delay)
+
+        raise DeadlineExceeded(f"LLM call exceeded its {self.deadline}s deadline") from error
@@ -0,0 +1,293 @@
+"""
+AST-based static rule engine.
+Runs every registered rule in a single traversal of the tree, collecting
+findings plus the sink / I/O / dynamic-execution / request-input signals used to decide
+whether a file or chunk needs LLM review at all.
+"""
+
+import ast
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+SECRET_NAME = re.compile(r'(password|passwd|secret|api_?key|access_?key|private_?key|auth_?token)$', re.IGNORECASE)
+# Often a secret, but just as often pad_token = "<pad>" or a pwd path: reported, never commit-blocking
+POSSIBLE_SECRET_NAME = re.compile(r'(token|pwd)$', re.IGNORECASE)
+SQL_KEYWORDS = re.compile(r'\b(select|insert|update|delete|where|drop|union)\b', re.IGNORECASE)
+
+DYNAMIC_CALLS = {'eval', 'exec', 'compile', '__import__', 'importlib.import_module'}
+SINK_CALLS = {
+    'os.system', 'os.popen', 'os.execv', 'os.execve', 'os.execvp', 'os.spawnl', 'os.spawnv',
+    'pickle.load', 'pickle.loads', 'marshal.load', 'marshal.loads', 'shelve.open',
+    'yaml.load', 'yaml.unsafe_load', 'render_template_string', 'Markup', 'mark_safe',
+}
+SINK_METHODS = {'execute', 'executemany', 'executescript', 'raw'}
+SINK_MODULES = {'subprocess'}
+IO_CALLS = {'open', 'io.open', 'os.remove', 'os.unlink', 'os.rmdir', 'os.makedirs', 'os.rename'}
+# Methods that do I/O whatever object they are called on, e.g. Path(p).read_text()
+IO_METHODS = {'read_text', 'write_text', 'read_bytes', 'write_bytes', 'urlopen', 'unlink', 'rmdir', 'rmtree',
+              'recv', 'send', 'sendall', 'connect'}
+IO_MODULES = {'requests', 'urllib', 'httpx', 'socket', 'http', 'shutil', 'ftplib', 'smtplib', 'paramiko'}
+RISKY_IMPORTS = SINK_MODULES | IO_MODULES | {'pickle', 'marshal', 'shelve', 'yaml', 'sqlite3', 'psycopg2',
+                                             'pymysql', 'sqlalchemy', 'ctypes', 'tempfile'}
+
+# Request attributes carrying user-controlled data: request.args, request.form, ...
+REQUEST_NAMES = {'request', 'req'}
+INPUT_ATTRS = {'args', 'form', 'values', 'json', 'files', 'data', 'cookies', 'headers', 'GET', 'POST', 'body',
+               'query_params', 'get_json'}
+
+BRANCH_NODES = (ast.If, ast.For, ast.AsyncFor, ast.While, ast.Try, ast.ExceptHandler,
+                ast.BoolOp, ast.IfExp, ast.comprehension, ast.With, ast.AsyncWith)
+
+SIGNAL_WEIGHTS = {'dynamic': 0.5, 'sink': 0.4, 'input': 0.3, 'io': 0.2}
+
+# Each rule: (node types it inspects, check(node, ctx))
+DEFAULT_RULES: List[Tuple[tuple, Callable]] = []
+
+
+def rule(*node_types):
+    def register(func):
+        DEFAULT_RULES.append((node_types, func))
+        return func
+    return register
+
+
+class ScanContext:
+    def __init__(self):
+        self.aliases: Dict[str, str] = {}
+        self.imports: List[str] = []
+        self.findings: List[Dict] = []
+        self.signals: List[Tuple[str, int]] = []
+        self.branches = 0
+
+    def add_finding(self, node: ast.AST, rule_id: str, severity: str, title: str, message: str = ''):
+        self.findings.append({
+            'rule_id': rule_id,
+            'line': getattr(node, 'lineno', 0),
+            'severity': severity,
+            'title': title,
+            'message': message
+        })
+
+    def add_signal(self, kind: str, node: ast.AST):
+        self.signals.append((kind, getattr(node, 'lineno', 0)))
+
+    def dotted_name(self, node: ast.AST) -> Optional[str]:
+        parts = []
+        while isinstance(node, ast.Attribute):
+            parts.append(node.attr)
+            node = node.value
+        if not isinstance(node, ast.Name):
+            return None
+        parts.append(self.aliases.get(node.id, node.id))
+        return '.'.join(reversed(parts))
+
+
+def _string_parts(node: ast.AST) -> List[str]:
+    return [n.value for n in ast.walk(node) if isinstance(n, ast.Constant) and isinstance(n.value, str)]
+
+
+def _is_dynamic_string(node: ast.AST) -> bool:
+    if isinstance(node, ast.JoinedStr):
+        return any(isinstance(v, ast.FormattedValue) for v in node.values)
+    if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.Add, ast.Mod)):
+        return True
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr == 'format':
+        return True
+    return False
+
+
+def _target_names(node: ast.AST) -> List[str]:
+    if isinstance(node, ast.Name):
+        return [node.id]
+    if isinstance(node, ast.Attribute):
+        return [node.attr]
+    if isinstance(node, (ast.Tuple, ast.List)):
+        return [name for elt in node.elts for name in _target_names(elt)]
+    return []
+
+
+@rule(ast.Import, ast.ImportFrom)
+def track_imports(node, ctx: ScanContext):
+    if isinstance(node, ast.Import):
+        for alias in node.names:
+            ctx.imports.append(alias.name)
+            if alias.asname:
+                ctx.aliases[alias.asname] = alias.name
+    else:
+        module = node.module or ''
+        ctx.imports.append(module)
+        for alias in node.names:
+            ctx.aliases[alias.asname or alias.name] = f"{module}.{alias.name}" if module else alias.name
+
+
+@rule(*BRANCH_NODES)
+def count_branches(node, ctx: ScanContext):
+    ctx.branches += 1
+
+
+def _secret_finding(name: str) -> Optional[Tuple[str, str, str]]:
+    """(rule id, severity, title) when a string literal bound to name looks like a secret"""
+    if SECRET_NAME.search(name):
+        return 'NS001', 'CRITICAL', 'Hardcoded Secret'
+    if POSSIBLE_SECRET_NAME.search(name):
+        return 'NS006', 'LOW', 'Possible Hardcoded Secret'
+    return None
+
+
+@rule(ast.Assign, ast.AnnAssign)
+def hardcoded_secret(node, ctx: ScanContext):
+    value = node.value
+    if not (isinstance(value, ast.Constant) and isinstance(value.value, str) and value.value.strip()):
+        return
+    targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+    for target in targets:
+        for name in _target_names(target):
+            finding = _secret_finding(name)
+            if finding:
+                ctx.add_finding(node, *finding, f"String literal assigned to '{name}'")
+                return
+
+
+@rule(ast.keyword)
+def hardcoded_secret_kwarg(node, ctx: ScanContext):
+    if not (node.arg and isinstance(node.value, ast.Constant)
+            and isinstance(node.value.value, str) and node.value.value.strip()):
+        return
+    finding = _secret_finding(node.arg)
+    if finding:
+        ctx.add_finding(node.value, *finding, f"String literal passed as '{node.arg}'")
+
+
+@rule(ast.Attribute)
+def request_input(node, ctx: ScanContext):
+    if node.attr in INPUT_ATTRS and isinstance(node.value, ast.Name):
+        # flask's request is imported under that name, so resolve aliases first
+        if ctx.aliases.get(node.value.id, node.value.id).split('.')[-1] in REQUEST_NAMES:
+            ctx.add_signal('input', node)
+
+
+@rule(ast.Call)
+def classify_call(node, ctx: ScanContext):
+    name = ctx.dotted_name(node.func)
+    if name is None:
+        if not isinstance(node.func, ast.Attribute):
+            # getattr(obj, name)(), handlers[key](): the callee is only known at runtime,
+            # so the call can't be proven harmless
+            ctx.add_signal('dynamic', node)
+            return
+        # conn.cursor().execute(...), Path(p).read_text(): the receiver is an
+        # expression, but the method name alone still classifies the call
+        name = f"<expr>.{node.func.attr}"
+    root = name.split('.')[0]
+    method = name.rsplit('.', 1)[-1]
+
+    if name in DYNAMIC_CALLS:
+        ctx.add_signal('dynamic', node)
+        if name in ('eval', 'exec'):
+            ctx.add_finding(node, 'NS003', 'HIGH', 'Code Injection', f"Call to {name}()")
+        return
+
+    if name in SINK_CALLS or root in SINK_MODULES or (method in SINK_METHODS and '.' in name):
+        ctx.add_signal('sink', node)
+    elif name in IO_CALLS or root in IO_MODULES or (method in IO_METHODS and '.' in name):
+        ctx.add_signal('io', node)
+
+    if method in SINK_METHODS and node.args:
+        query = node.args[0]
+        if _is_dynamic_string(query) and any(SQL_KEYWORDS.search(s) for s in _string_parts(query)):
+            ctx.add_finding(node, 'NS002', 'HIGH', 'SQL Injection',
+                            f"Query built dynamically and passed to {method}()")
+
+    if root == 'subprocess' or name in ('os.system', 'os.popen'):
+        shell = any(kw.arg == 'shell' and isinstance(kw.value, ast.Constant) and kw.value.value is True
+                    for kw in node.keywords)
+        if name in ('os.system', 'os.popen') or shell:
+            if node.args and not isinstance(node.args[0], ast.Constant):
+                ctx.add_finding(node, 'NS004', 'HIGH', 'Command Injection',
+                                f"Shell command built at runtime passed to {name}()")
+
+    if name in ('pickle.load', 'pickle.loads', 'marshal.loads', 'marshal.load'):
+        ctx.add_finding(node, 'NS005', 'MEDIUM', 'Insecure Deserialization', f"Call to {name}()")
+
+    if name == 'yaml.load' and not any(kw.arg == 'Loader' for kw in node.keywords) and len(node.args) < 2:
+        ctx.add_finding(node, 'NS005', 'MEDIUM', 'Insecure Deserialization', "yaml.load() without a Loader")
+
+
+class StaticRuleEngine:
+    def __init__(self, rules: Optional[List[Tuple[tuple, Callable]]] = None):
+        self.rules = rules if rules is not None else DEFAULT_RULES
+        self._dispatch: Dict[type, List[Callable]] = {}
+        for node_types, check in self.rules:
+            for node_type in node_types:
+                self._dispatch.setdefault(node_type, []).append(check)
+
+    def _traverse(self, tree: ast.AST) -> ScanContext:
+        ctx = ScanContext()
+        dispatch = self._dispatch
+        for node in ast.walk(tree):
+            checks = dispatch.get(type(node))
+            if checks:
+                for check in checks:
+                    check(node, ctx)
+        return ctx
+
+    @staticmethod
+    def needs_llm_score(signal_kinds, findings: List[Dict], branches: int) -> float:
+        """0.0 means provably uninteresting: no sinks, no I/O, no dynamic execution, no request input"""
+        kinds = set(signal_kinds)
+        if not kinds and not findings:
+            return 0.0
+        score = sum(SIGNAL_WEIGHTS[kind] for kind in kinds)
+        if any(f['severity'] in ('CRITICAL', 'HIGH') for f in findings):
+            score += 0.3
+        score += min(branches / 50, 0.2)
+        return round(min(score, 1.0), 3)
+
+    def scan_source(self, source: str, filename: str = '<unknown>') -> Dict:
+        try:
+            tree = ast.parse(source, filename=filename)
+        except (SyntaxError, ValueError):
+            # Can't prove anything about code we can't parse
+            return {
+                'parsed': False,
+                'findings': [],
+                'signals': {},
+                'imports': [],
+                'risky_imports': [],
+                'complexity': 0,
+                'needs_llm': True,
+                'needs_llm_score': 1.0
+            }
+
+        ctx = self._traverse(tree)
+        signal_counts: Dict[str, int] = {}
+        for kind, _ in ctx.signals:
+            signal_counts[kind] = signal_counts.get(kind, 0) + 1
+
+        score = self.needs_llm_score(signal_counts, ctx.findings, ctx.branches)
+        return {
+            'parsed': True,
+            'findings': sorted(ctx.findings, key=lambda f: f['line']),
+            'signals': signal_counts,
+            'signal_lines': ctx.signals,
+            'imports': ctx.imports,
+            'risky_imports': sorted({imp for imp in ctx.imports if imp.split('.')[0] in RISKY_IMPORTS}),
+            'complexity': ctx.branches + 1,
+            'needs_llm': score > 0,
+            'needs_llm_score': score
+        }
+
+    def score_chunks(self, source: str, chunks: List[Dict], filename: str = '<unknown>') -> List[Dict]:
+        """Attach a needs_llm_score to each chunk from a single scan of the whole file"""
+        report = self.scan_source(source, filename=filename)
+        for chunk in chunks:
+            if not report['parsed']:
+                chunk['needs_llm_score'] = 1.0
+                continue
+            start = chunk.get('line_start', 1)
+            end = chunk.get('line_end') or start + chunk.get('code', '').count('\n')
+            kinds = [kind for kind, line in report['signal_lines'] if start <= line <= end]
+            findings = [f for f in report['findings'] if start <= f['line'] <= end]
+            chunk['needs_llm_score'] = self.needs_llm_score(kinds, findings, 0)
+            chunk['static_findings'] = findings
+        return chunks
@@ -0,0 +1,119 @@
+import os
+import re
+import sys
+import threading
+from typing import Dict, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from phase_2.llm_analyzer import LLMAnalyzer
+from phase_2.static_rules import StaticRuleEngine
+from phase_1.metrics import MetricsCollector
+from phase_1.cassette import Cassette
+
+
+class TriageClassifier:
+    """
+    Cheap first pass of the model cascade: decides whether a file is worth
+    sending to the expensive model with the full analysis templates.
+    """
+
+    # Fallback signals for code that doesn't parse (e.g. split chunks), with their weight
+    RISK_PATTERNS = [
+        (re.compile(r'\b(eval|exec|compile)\s*\('), 0.6),
+        (re.compile(r'\b(pickle|marshal|shelve|yaml)\.(loads?|unsafe_load)\b'), 0.6),
+        (re.compile(r'\bsubprocess\b|\bos\.(system|popen|exec\w*)\s*\('), 0.5),
+        (re.compile(r'\.execute(many)?\s*\('), 0.4),
+        (re.compile(r'\b(password|passwd|secret|api_key|token)\s*=\s*[\'"]', re.IGNORECASE), 0.5),
+        (re.compile(r'\b(requests|urllib|httpx|socket)\b'), 0.3),
+        (re.compile(r'\bopen\s*\('), 0.2),
+        (re.compile(r'\b(render_template_string|Markup|mark_safe)\b'), 0.4),
+        (re.compile(r'\b(md5|sha1)\s*\('), 0.3),
+    ]
+
+    def __init__(self, triage_model: Optional[str] = None, escalation_threshold: float = 0.35,
+                 certain_threshold: float = 0.7, metrics: Optional[MetricsCollector] = None,
+                 cassette: Optional[Cassette] = None):
+        self.escalation_threshold = escalation_threshold
+        # Heuristic scores at or above this escalate without asking the triage model
+        self.certain_threshold = certain_threshold
+        self.triage_llm = None
+        if triage_model:
+            self.triage_llm = LLMAnalyzer(model=triage_model, temperature=0.0, max_tokens=200, metrics=metrics,
+                                          cassette=cassette)
+
+        self.rule_engine = StaticRuleEngine()
+        self._lock = threading.Lock()
+        self.stats = {'escalated': 0, 'skipped': 0}
+
+    def regex_score(self, code: str) -> float:
+        score = 0.0
+        for pattern, weight in self.RISK_PATTERNS:
+            if pattern.search(code):
+                score += weight
+
+        # Branch-heavy code is more likely to hide logic bugs
+        branches = len(re.findall(r'^\s*(if|elif|for|while|try|except)\b', code, re.MULTILINE))
+        score += min(branches / 40, 0.3)
+
+        return min(score, 1.0)
+
+    def _model_score(self, code: str) -> Optional[Dict]:
+        prompt = self.triage_llm.prompt_templates.render_triage_prompt(query_code=code)
+        result = self.triage_llm._call_llm(
+            system_prompt=prompt['system'],
+            user_prompt=prompt['user'],
+            response_format="json_object",
+            section="triage"
+        )
+        if result.get("error"):
+            return None
+
+        try:
+            score = float(result.get('suspicion_score'))
+        except (TypeError, ValueError):
+            return None
+        return {'score': max(0.0, min(score, 1.0)), 'reason': result.get('reason', '')}
+
+    def _record(self, escalate: bool):
+        with self._lock:
+            self.stats['escalated' if escalate else 'skipped'] += 1
+
+    def classify(self, code: str) -> Dict:
+        report = self.rule_engine.scan_source(code)
+
+        if report['parsed'] and not report['needs_llm']:
+            # No sinks, no I/O, no dynamic execution: nothing for the LLM to find
+            self._record(False)
+            return {
+                'suspicion_score': 0.0,
+                'escalated': False,
+                'threshold': self.escalation_threshold,
+                'source': 'static_rules',
+                'reason': 'No sinks, I/O or dynamic execution',
+                'static_findings': []
+            }
+
+        score = report['needs_llm_score'] if report['parsed'] else self.regex_score(code)
+        source = 'static_rules' if report['parsed'] else 'heuristic'
+        reason = 'Static risk signals'
+
+        if self.triage_llm is not None and score < self.certain_threshold:
+            model_result = self._model_score(code)
+            if model_result is not None:
+                # Never let the cheap model talk us out of what the heuristic already saw
+                score = max(score, model_result['score'])
+                source = f'model:{self.triage_llm.model}'
+                reason = model_result['reason'] or reason
+
+        escalate = score >= self.escalation_threshold
+        self._record(escalate)
+
+        return {
+            'suspicion_score': round(score, 3),
+            'escalated': escalate,
+            'threshold': self.escalation_threshold,
+            'source': source,
+            'reason': reason,
+            'static_findings': report['findings']
+        }
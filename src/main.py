@@ -1,8 +1,11 @@
 #!/usr/bin/env python3
 import argparse
+import hashlib
 import json
 import os
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from datetime import datetime
 from pathlib import Path
 
@@ -20,7 +23,12 @@ sys.path.insert(0, phase2_dir)
 try:
     from phase_1.vector_store import ChromaVectorStore
     from phase_1.embedding_generator import EmbeddingGenerator
+    from phase_1.metrics import MetricsCollector
+    from phase_1.tracing import span, tracer
+    from phase_1.cassette import Cassette
     from phase_2.rag_analyzer import RAGAnalyzer
+    from phase_2.file_prioritizer import FilePrioritizer
+    from phase_2.checkpoint import ScanCheckpoint
 except ImportError as e:
     print(f"ERROR: Failed to import required modules: {e}")
     print(f"Current directory: {current_dir}")
@@ -29,7 +37,133 @@ except ImportError as e:
     sys.exit(1)
 
 
-def analyze_repository(source_path, max_files=None):
+EXCLUDED_DIRS = ['.git', '__pycache__', '.venv', 'venv', 'node_modules', '.github']
+
+
+def index_file(full_path, source_path):
+    """Read a file once and keep everything later stages need: content, size, lines, hash, mtime"""
+    try:
+        with open(full_path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            data = f.read()
+    except OSError as e:
+        print(f"Warning: Could not read {full_path}: {e}")
+        return None
+
+    content = data.decode('utf-8', errors='ignore')
+    return {
+        'path': os.path.relpath(full_path, source_path),
+        'full_path': full_path,
+        'size': stat.st_size,
+        'mtime': stat.st_mtime,
+        'sha256': hashlib.sha256(data).hexdigest(),
+        # Same count readlines() gives: a final line without a newline still counts
+        'lines': content.count('\n') + (1 if content and not content.endswith('\n') else 0),
+        'content': content
+    }
+
+
+def build_file_index(source_path, max_workers=16):
+    """Walk source_path once and read every Python file on a thread pool"""
+    paths = []
+    for root, dirs, files in os.walk(source_path):
+        # Exclude common non-code directories
+        dirs[:] = [d for d in dirs if d not in EXCLUDED_DIRS]
+        paths.extend(os.path.join(root, file) for file in files if file.endswith('.py'))
+
+    # Reads are I/O bound, so threads overlap the latency of slow or network filesystems
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(paths)))) as executor:
+        entries = executor.map(lambda path: index_file(path, source_path), paths)
+        return [entry for entry in entries if entry is not None]
+
+
+def analyze_file(analyzer, file_info, chunked=False):
+    """Run full analysis (bugs, optimization, security) on one indexed file"""
+    if chunked:
+        return analyzer.analyze_code_chunked(
+            code=file_info['content'],
+            file_path=file_info['path'],
+            analysis_type="all"
+        )
+    return analyzer.analyze_code(
+        code=file_info['content'],
+        analysis_type="all",
+        file_path=file_info['path']
+    )
+
+
+def run_analysis_jobs(analyzer, files_to_analyze, chunked=False, jobs=1, deadline=None, on_result=None):
+    """
+    Analyze files on `jobs` worker threads, handing each finished analysis to
+    on_result(file_info, analysis). When `deadline` seconds have passed, queued
+    files are cancelled, in-flight ones are told to stop at their next LLM call,
+    and the paths that finished are returned with the rest listed as skipped.
+    Every LLM request is given at most the time left, so in-flight calls end
+    by the deadline too.
+    """
+    deadline_at = time.monotonic() + deadline if deadline else None
+    if deadline_at is not None:
+        analyzer.set_deadline(deadline_at)
+    completed = set()
+    
+    executor = ThreadPoolExecutor(max_workers=max(1, jobs))
+    futures = {executor.submit(analyze_file, analyzer, file_info, chunked): file_info
+               for file_info in files_to_analyze}
+    pending = set(futures)
+    
+    while pending:
+        remaining = None if deadline_at is None else deadline_at - time.monotonic()
+        if remaining is not None and remaining <= 0:
+            break
+        
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        for future in done:
+            file_info = futures[future]
+            try:
+                analysis = future.result()
+            except Exception as e:
+                print(f"  Error analyzing {file_info['path']}: {e}")
+                continue
+            completed.add(file_info['path'])
+            if on_result is not None:
+                on_result(file_info, analysis)
+            print(f"[{len(completed)}/{len(files_to_analyze)}] Analyzed {file_info['path']}")
+    
+    skipped_files = []
+    if pending:
+        analyzer.cancel()
+        for future in pending:
+            future.cancel()
+        pending_paths = {futures[future]['path'] for future in pending}
+        skipped_files = [file_info['path'] for file_info in files_to_analyze if file_info['path'] in pending_paths]
+        print(f"Deadline reached: {len(skipped_files)} files not analyzed")
+    
+    # Don't block on in-flight calls; they time out at the deadline
+    executor.shutdown(wait=False, cancel_futures=True)
+    return completed, skipped_files
+
+
+def checkpointed_results(checkpoint, files_to_analyze):
+    """Stream (file_info, analysis) pairs for the selected files from the checkpoint"""
+    by_hash = {}
+    for file_info in files_to_analyze:
+        by_hash.setdefault(file_info['sha256'], []).append(file_info)
+    
+    seen = set()
+    for record in checkpoint:
+        # Files with identical content share one recorded analysis
+        for file_info in by_hash.get(record.get('sha256'), []):
+            if file_info['path'] not in seen:
+                seen.add(file_info['path'])
+                yield file_info, record['analysis']
+
+
+def analyze_repository(source_path, max_files=None, combined=False, use_cache=True,
+                       cascade=False, triage_model=None, escalation_threshold=0.35,
+                       static_prefilter=False, chunked=False, context_budget=None,
+                       retrieval_mode="hybrid", prioritize=True, jobs=1, deadline=None,
+                       checkpoint_path=None, resume=False, llm_model="gpt-3.5-turbo",
+                       structured_output=False, metrics_path=None, db_path=None, cassette=None):
     """Analyze repository using actual NeuraShield pipeline"""
     
     print("\n" + "="*70)
@@ -38,11 +172,14 @@ def analyze_repository(source_path, max_files=None):
     
     # Use parent directory for db_path (neurashield-ai root)
     project_root = os.path.dirname(current_dir)
-    db_path = os.path.join(project_root, 'phase_1', 'chroma_db')
+    db_path = db_path or os.path.join(project_root, 'phase_1', 'chroma_db')
     
     # Ensure directory exists
     os.makedirs(db_path, exist_ok=True)
     
+    # One ledger of tokens, cost, latency and cache hits for every request in the run
+    metrics = MetricsCollector()
+    
     try:
         # Initialize vector store
         vector_store = ChromaVectorStore(
@@ -50,10 +187,12 @@ def analyze_repository(source_path, max_files=None):
             persist_directory=db_path
         )
         
-        embedding_gen = EmbeddingGenerator()
+        # Lexical retrieval needs no embeddings at all
+        embedding_gen = EmbeddingGenerator(metrics=metrics, cassette=cassette) if retrieval_mode != 'lexical' else None
         
         print("✓ Vector store initialized")
-        print("✓ Embedding generator ready")
+        if embedding_gen is not None:
+            print("✓ Embedding generator ready")
     except Exception as e:
         print(f"ERROR: Failed to initialize vector store: {e}")
         sys.exit(1)
@@ -63,51 +202,94 @@ def analyze_repository(source_path, max_files=None):
     print("PHASE 2: ANALYZING CODE")
     print("="*70)
     
+    # False forces the caches off; None leaves NEURASHIELD_LLM_CACHE / NEURASHIELD_RETRIEVAL_CACHE in charge.
+    # A cassette stands in for the caches: hits on them would never be recorded.
+    cache_switch = False if not use_cache or cassette is not None else None
+
     try:
         analyzer = RAGAnalyzer(
             vector_store=vector_store,
             embedding_generator=embedding_gen,
-            llm_model="gpt-3.5-turbo",
-            top_k=5
+            llm_model=llm_model,
+            top_k=5,
+            combined_analysis=combined,
+            use_llm_cache=cache_switch,
+            use_retrieval_cache=cache_switch,
+            cascade=cascade,
+            triage_model=triage_model,
+            escalation_threshold=escalation_threshold,
+            static_prefilter=static_prefilter,
+            context_token_budget=context_budget,
+            retrieval_mode=retrieval_mode,
+            # A hung request must not outlive the deadline by much
+            llm_request_timeout=min(120, deadline) if deadline else None,
+            structured_output=structured_output,
+            metrics=metrics,
+            cassette=cassette
         )
     except Exception as e:
         print(f"ERROR: Failed to initialize RAG analyzer: {e}")
         sys.exit(1)
     
     # Scan and analyze files
-    python_files = []
-    total_lines = 0
-    
-    # Walk through source directory
-    for root, dirs, files in os.walk(source_path):
-        # Exclude common non-code directories
-        dirs[:] = [d for d in dirs if d not in ['.git', '__pycache__', '.venv', 'venv', 'node_modules', '.github']]
-        
-        for file in files:
-            if file.endswith('.py'):
-                filepath = os.path.join(root, file)
-                try:
-                    with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-                        lines = len(f.readlines())
-                        total_lines += lines
-                        python_files.append({
-                            'path': os.path.relpath(filepath, source_path),
-                            'full_path': filepath,
-                            'lines': lines
-                        })
-                except Exception as e:
-                    print(f"Warning: Could not read {filepath}: {e}")
-                    pass
+    with span('index') as index_span:
+        python_files = build_file_index(source_path)
+        index_span.set(files=len(python_files))
+    total_lines = sum(entry['lines'] for entry in python_files)
     
     print(f"Found {len(python_files)} Python files with {total_lines} lines")
     
+    # Empty files never reach the analyzer, so they shouldn't use up --max-files slots
+    candidates = [entry for entry in python_files if entry['content'].strip()]
+    
+    if prioritize:
+        # Riskiest files first, so a --max-files budget goes where issues are likely
+        with span('prioritize', files=len(candidates)):
+            candidates = FilePrioritizer(source_path).rank(candidates)
+        top = ', '.join(f"{e['path']} ({e['priority']['priority']:.2f})" for e in candidates[:3])
+        print(f"Prioritized by static risk, imports, complexity and churn; top: {top}")
+    
     # Determine how many files to analyze
     if max_files is None:
-        files_to_analyze = python_files
+        files_to_analyze = candidates
     else:
-        files_to_analyze = python_files[:max_files]
-    
-    print(f"Analyzing {len(files_to_analyze)} files...")
+        files_to_analyze = candidates[:max_files]
+        # Only the selected files' contents are needed from here on
+        for entry in candidates[max_files:]:
+            entry['content'] = None
+    
+    # Every finished file is appended here at once, so a crash loses nothing already paid for
+    checkpoint = ScanCheckpoint(
+        checkpoint_path or os.path.join(project_root, '.neurashield_cache', 'scan_checkpoint.jsonl'),
+        resume=resume
+    )
+    
+    files_to_run = files_to_analyze
+    resumed = 0
+    if resume:
+        done_hashes = checkpoint.completed_hashes()
+        files_to_run = [entry for entry in files_to_analyze if entry['sha256'] not in done_hashes]
+        resumed = len(files_to_analyze) - len(files_to_run)
+        print(f"Resuming from {checkpoint.path}: {resumed} files already analyzed")
+    
+    failed = {}
+    
+    def record_result(file_info, analysis):
+        # Failed or cancelled files stay out of the checkpoint so a resume retries them,
+        # but this run's report still lists them
+        if analysis.get('error'):
+            failed[file_info['path']] = analysis
+        else:
+            checkpoint.append(file_info['path'], file_info['sha256'], analysis,
+                              extra={'lines': file_info['lines'], 'priority': file_info.get('priority')})
+    
+    print(f"Analyzing {len(files_to_run)} files with {jobs} job{'s' if jobs != 1 else ''}...")
+    if deadline:
+        print(f"Deadline: {deadline:.0f}s")
+    
+    with span('analyze', files=len(files_to_run), jobs=jobs):
+        _, skipped_files = run_analysis_jobs(analyzer, files_to_run, chunked=chunked, jobs=jobs,
+                                             deadline=deadline, on_result=record_result)
     
     files_analysis = []
     all_findings = []
@@ -116,21 +298,11 @@ def analyze_repository(source_path, max_files=None):
     medium_count = 0
     total_score = 0
     
-    for idx, file_info in enumerate(files_to_analyze, 1):
-        print(f"[{idx}/{len(files_to_analyze)}] Analyzing {file_info['path']}...")
-        
+    file_metrics = metrics.summary()['by_file']
+    
+    # Reports are built from the checkpoint, including files finished by an earlier run
+    for file_info, analysis in checkpointed_results(checkpoint, files_to_analyze):
         try:
-            with open(file_info['full_path'], 'r', encoding='utf-8', errors='ignore') as f:
-                code_content = f.read()
-            
-            # Skip empty files
-            if not code_content.strip():
-                print(f"  Skipping empty file")
-                continue
-            
-            # Run full analysis
-            analysis = analyzer.analyze_code(code=code_content, analysis_type="all")
-            
             # Extract findings
             bugs = analysis.get('bug_analysis', {}).get('bugs_found', [])
             vulnerabilities = analysis.get('security_analysis', {}).get('vulnerabilities', [])
@@ -186,21 +358,51 @@ def analyze_repository(source_path, max_files=None):
             files_analysis.append({
                 'file': file_info['path'],
                 'lines': file_info['lines'],
+                'priority': file_info.get('priority'),
+                'metrics': file_metrics.get(file_info['path']),
                 'analysis': analysis
             })
         
         except Exception as e:
-            print(f"  Error analyzing {file_info['path']}: {e}")
+            print(f"  Error processing results for {file_info['path']}: {e}")
             continue
     
     avg_score = int(total_score / len(files_analysis)) if files_analysis else 0
+    analyzed_count = len(files_analysis)
+    
+    # Files cancelled at the deadline are already listed as skipped
+    skipped = set(skipped_files)
+    failed_files = [file_info for file_info in files_to_run
+                    if file_info['path'] in failed and file_info['path'] not in skipped]
+    for file_info in failed_files:
+        files_analysis.append({
+            'file': file_info['path'],
+            'lines': file_info['lines'],
+            'priority': file_info.get('priority'),
+            'metrics': file_metrics.get(file_info['path']),
+            'failed': True,
+            'analysis': failed[file_info['path']]
+        })
+    if failed_files:
+        print(f"{len(failed_files)} files failed and will be retried on --resume")
+
+    cascade_stats = analyzer.cascade_summary()
+    if cascade_stats:
+        print(f"Cascade: {cascade_stats['escalated']} files escalated, {cascade_stats['skipped']} skipped as clean")
+    
+    run_metrics = metrics.summary(include_files=False)
+    print(f"LLM/embedding requests: {run_metrics['run']['requests']} "
+          f"({run_metrics['run']['cache_hits']} cache hits), cost ${run_metrics['run']['cost_usd']:.4f}")
+    if metrics_path:
+        metrics.write(metrics_path)
+        print(f"✓ Metrics: {metrics_path}")
     
     return {
-        'summary': f"NeuraShield AI analyzed {len(files_analysis)} Python files and generated comprehensive security report",
+        'summary': f"NeuraShield AI analyzed {analyzed_count} Python files and generated comprehensive security report",
         'timestamp': datetime.now().isoformat(),
         'statistics': {
             'total_python_files': len(python_files),
-            'files_analyzed': len(files_analysis),
+            'files_analyzed': analyzed_count,
             'total_lines': total_lines,
             'security_score': avg_score,
             'issues': {
@@ -208,8 +410,14 @@ def analyze_repository(source_path, max_files=None):
                 'high': high_count,
                 'medium': medium_count,
                 'total': len(all_findings)
-            }
+            },
+            'cascade': cascade_stats,
+            'partial': bool(skipped_files),
+            'skipped_files': skipped_files,
+            'failed_files': [file_info['path'] for file_info in failed_files],
+            'resumed_files': resumed
         },
+        'metrics': run_metrics,
         'files_analysis': files_analysis,
         'all_findings': all_findings,
         'recommendations': [
@@ -237,6 +445,19 @@ def generate_text_report(report_data):
     text += f"Timestamp: {report_data['timestamp']}\n"
     text += f"Files Analyzed: {stats['files_analyzed']}/{stats['total_python_files']}\n"
     text += f"Total Lines: {stats['total_lines']}\n"
+    if stats.get('cascade'):
+        text += f"Deep Analysis: {stats['cascade']['escalated']} escalated, {stats['cascade']['skipped']} skipped by triage\n"
+    run_metrics = (report_data.get('metrics') or {}).get('run')
+    if run_metrics and run_metrics['requests']:
+        text += (f"API Requests: {run_metrics['requests']} ({run_metrics['cache_hits']} cache hits, "
+                 f"{run_metrics['retries']} retries, {run_metrics['hedges']} hedged), cost ${run_metrics['cost_usd']:.4f}, "
+                 f"latency p50 {run_metrics['latency_p50']}s / p95 {run_metrics['latency_p95']}s\n")
+        text += (f"Tokens: {run_metrics['prompt_tokens']} prompt ({run_metrics['cached_tokens']} served from "
+                 f"prompt cache), {run_metrics['completion_tokens']} completion\n")
+    if stats.get('partial'):
+        text += f"PARTIAL REPORT: deadline reached before {len(stats['skipped_files'])} files were analyzed\n"
+    if stats.get('failed_files'):
+        text += f"FAILED: {len(stats['failed_files'])} files could not be analyzed: {', '.join(stats['failed_files'])}\n"
     text += "\n" + "-"*70 + "\n\n"
     
     # BUG DETECTION
@@ -290,6 +511,12 @@ def generate_text_report(report_data):
     text += "  • Conduct code review\n"
     text += "  • Update dependencies\n"
     
+    if stats.get('skipped_files'):
+        text += "\n## SKIPPED FILES (deadline)\n"
+        text += "-"*70 + "\n"
+        for path in stats['skipped_files']:
+            text += f"• {path}\n"
+    
     text += "\n" + "="*70 + "\n"
     text += "END OF REPORT\n"
     text += "="*70 + "\n"
@@ -302,9 +529,47 @@ def main():
     parser.add_argument('--source-path', required=True, help='Path to source code')
     parser.add_argument('--output', required=True, help='Path to output report')
     parser.add_argument('--max-files', type=int, default=None, help='Maximum number of files to analyze (default: all)')
+    parser.add_argument('--combined', action='store_true', help='Request bugs, optimization and security in one LLM call per file')
+    parser.add_argument('--no-cache', action='store_true', help='Bypass the on-disk LLM response and retrieval caches')
+    parser.add_argument('--cascade', action='store_true', help='Triage files first and only deep-analyze suspicious ones')
+    parser.add_argument('--triage-model', default=None, help='Cheap model for the triage pass (default: local heuristic only)')
+    parser.add_argument('--escalation-threshold', type=float, default=0.35, help='Triage score at or above which a file gets deep analysis')
+    parser.add_argument('--context-budget', type=int, default=2000, help='Token budget for retrieved patterns per prompt (0 = unbounded)')
+    parser.add_argument('--chunked', action='store_true', help='Analyze each function/class separately and merge findings per file')
+    parser.add_argument('--static-prefilter', action='store_true', help='Skip the LLM for files the static rules show have no sinks, I/O or dynamic execution')
+    parser.add_argument('--no-prioritize', action='store_true', help='Analyze files in directory walk order instead of by estimated risk')
+    parser.add_argument('--jobs', type=int, default=1, help='Number of files to analyze concurrently')
+    parser.add_argument('--deadline', type=float, default=None, help='Wall-clock seconds after which remaining files are skipped and a partial report is written')
+    parser.add_argument('--checkpoint', default=None, help='JSONL file finished files are appended to (default: <output>.checkpoint.jsonl)')
+    parser.add_argument('--resume', action='store_true', help='Skip files whose content hash is already in the checkpoint')
+    parser.add_argument('--db-path', default=None, help='Chroma directory holding the knowledge base (default: phase_1/chroma_db)')
+    parser.add_argument('--trace', default=None, help='Write a Chrome trace-event JSON of every pipeline stage and LLM call to this path')
+    parser.add_argument('--metrics', default=None, help='Per-request metrics JSON file (default: <output>.metrics.json)')
+    parser.add_argument('--cassette', default=None, help='Zip archive of OpenAI responses to record to or replay from')
+    parser.add_argument('--cassette-mode', choices=['record', 'replay'], default='replay',
+                        help='record: call the API for requests not yet in the cassette; replay: serve only recorded responses')
+    parser.add_argument('--replay-latency', type=float, default=0.0,
+                        help='Multiple of the recorded latency to wait on replay (0 = full speed)')
+    parser.add_argument('--model', default='gpt-3.5-turbo', help='Chat model for the deep analysis')
+    parser.add_argument('--structured-output', action='store_true',
+                        help='Constrain responses to each section\'s JSON schema (needs a model with json_schema support, e.g. gpt-4o-mini)')
+    parser.add_argument('--retrieval-mode', choices=['vector', 'hybrid', 'lexical'], default='hybrid',
+                        help='Similar-pattern retrieval: embeddings, BM25, or both fused by reciprocal rank')
     args = parser.parse_args()
     
-    if not os.getenv('OPENAI_API_KEY'):
+    if args.trace:
+        tracer.enable(args.trace)
+    
+    cassette = None
+    if args.cassette:
+        try:
+            cassette = Cassette(args.cassette, mode=args.cassette_mode, latency_scale=args.replay_latency)
+        except Exception as e:
+            print(f"ERROR: Cannot open cassette: {e}")
+            sys.exit(1)
+    
+    # Replaying needs no API access at all
+    if not os.getenv('OPENAI_API_KEY') and not (cassette and cassette.mode == 'replay'):
         print("ERROR: OPENAI_API_KEY environment variable not set")
         sys.exit(1)
     
@@ -319,7 +584,24 @@ def main():
     
     # Run analysis
     try:
-        report = analyze_repository(args.source_path, max_files=args.max_files)
+        report = analyze_repository(args.source_path, max_files=args.max_files, combined=args.combined,
+                                    use_cache=not args.no_cache, cascade=args.cascade,
+                                    triage_model=args.triage_model,
+                                    escalation_threshold=args.escalation_threshold,
+                                    static_prefilter=args.static_prefilter,
+                                    chunked=args.chunked,
+                                    context_budget=args.context_budget or None,
+                                    retrieval_mode=args.retrieval_mode,
+                                    prioritize=not args.no_prioritize,
+                                    jobs=args.jobs,
+                                    deadline=args.deadline,
+                                    checkpoint_path=args.checkpoint or os.path.splitext(args.output)[0] + '.checkpoint.jsonl',
+                                    resume=args.resume,
+                                    llm_model=args.model,
+                                    structured_output=args.structured_output,
+                                    metrics_path=args.metrics or os.path.splitext(args.output)[0] + '.metrics.json',
+                                    db_path=args.db_path,
+                                    cassette=cassette)
     except Exception as e:
         print(f"\nERROR: Analysis failed: {e}")
         import traceback
@@ -337,7 +619,7 @@ def main():
     
     # Save JSON report
     try:
-        with open(args.output, 'w') as f:
+        with span('write_json_report'), open(args.output, 'w') as f:
             json.dump(report, f, indent=2)
         print(f"✓ JSON Report: {args.output}")
     except Exception as e:
@@ -347,7 +629,7 @@ def main():
     # Save text report
     try:
         text_path = args.output.replace('.json', '.txt')
-        with open(text_path, 'w') as f:
+        with span('write_text_report'), open(text_path, 'w') as f:
             f.write(generate_text_report(report))
         print(f"✓ Text Report: {text_path}")
     except Exception as e:
@@ -361,6 +643,14 @@ def main():
     print(f"High Issues: {report['statistics']['issues']['high']}")
     print(f"Total Findings: {report['statistics']['issues']['total']}")
     print("="*70 + "\n")
+    
+    if tracer.enabled:
+        print(f"Trace (open in ui.perfetto.dev): {tracer.export()}")
+    
+    if cassette is not None:
+        cassette.close()
+        stats = cassette.stats()
+        print(f"Cassette ({stats['mode']}): {stats['hits']} replayed, {stats['recorded']} recorded -> {stats['path']}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,76 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+
+for module in ('jinja2', 'openai', 'chromadb', 'tiktoken'):
+    pytest.importorskip(module)
+
+from fake_openai_server import FakeOpenAIServer
+from phase_2.batch_runner import BatchAnalysisRunner
+from phase_2.disk_cache import DiskCache
+from phase_2.rag_analyzer import RAGAnalyzer
+
+SAMPLES = [
+    {'name': 'cached.py', 'code': 'def total(items):\n    return sum(items)\n'},
+    {'name': 'risky.py', 'code': 'def run(expr):\n    return eval(expr)\n'},
+    {'name': 'broken.py', 'code': 'def fail(path):\n    return open(path).read()\n'},
+]
+CACHED_RESULT = {'has_bugs': False, 'overall_risk': 'low', 'bugs_found': []}
+
+
+class FailingServer(FakeOpenAIServer):
+    def batch_request_fails(self, request):
+        return 'open(path)' in request['body']['messages'][-1]['content']
+
+
+@pytest.fixture
+def server():
+    server = FailingServer(latency=0.0, jitter=0.0)
+    server.start()
+    yield server
+    server.stop()
+
+
+def _runner(server, tmp_path, monkeypatch):
+    monkeypatch.setenv('OPENAI_BASE_URL', server.base_url)
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    analyzer = RAGAnalyzer(vector_store=None, embedding_generator=None, llm_model="gpt-4o-mini",
+                           use_llm_cache=False, use_retrieval_cache=False)
+    analyzer.rag_core.build_rag_context = lambda **_: {'num_patterns': 0, 'retrieved_patterns': [],
+                                                       'formatted_context': ''}
+    analyzer.llm_analyzer.cache = DiskCache(directory=str(tmp_path / 'llm_cache'))
+    return BatchAnalysisRunner(analyzer, work_dir=str(tmp_path / 'batch_jobs'), poll_interval=0.05)
+
+
+def _cache_key(runner, code):
+    prompt = runner.llm_analyzer.prompt_templates.render_bug_detection_prompt(query_code=code, context='')
+    return runner.llm_analyzer._cache_key(prompt['system'], prompt['user'], "json_object")
+
+
+def test_prepare_submit_wait_ingest(server, tmp_path, monkeypatch):
+    runner = _runner(server, tmp_path, monkeypatch)
+    cache = runner.llm_analyzer.cache
+    cache.set(_cache_key(runner, SAMPLES[0]['code']), CACHED_RESULT)
+
+    manifest = runner.prepare(SAMPLES, analysis_type='bugs')
+    assert manifest['pending_requests'] == 2
+    assert manifest['samples'][0]['cached'] == {'bug_analysis': CACHED_RESULT}
+
+    batch = runner.wait(runner.submit(manifest), timeout=30)
+    assert batch.status == 'completed'
+    assert (batch.request_counts.completed, batch.request_counts.failed) == (1, 1)
+
+    results = {r['sample_name']: r for r in runner.ingest(manifest, batch)}
+
+    assert results['cached.py']['bug_analysis'] == CACHED_RESULT
+    assert results['risky.py']['bug_analysis']['has_bugs'] is True
+    assert results['broken.py']['bug_analysis']['error'] is True
+    assert 'Injected batch request failure' in results['broken.py']['bug_analysis']['message']
+
+    # Only the successful batch response is written back to the cache
+    assert cache.get(_cache_key(runner, SAMPLES[1]['code'])) == results['risky.py']['bug_analysis']
+    assert cache.get(_cache_key(runner, SAMPLES[2]['code'])) is None
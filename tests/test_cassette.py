@@ -0,0 +1,132 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from phase_1.cassette import Cassette, CassetteMiss
+from phase_2.retry_policy import RetryPolicy
+
+MESSAGES = [{'role': 'user', 'content': 'Find bugs in: def f(): pass'}]
+
+
+class LiveStream:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.closed = False
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+    def close(self):
+        self.closed = True
+
+
+class FakeClient:
+    """Live API stand-in: plain dicts are what the cassette stores when there is no model_dump"""
+
+    def __init__(self):
+        self.calls = []
+        self.embeddings = SimpleNamespace(create=self._embed)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._complete))
+        self.batches = 'live batches'
+
+    def _embed(self, **kwargs):
+        self.calls.append(('embeddings', kwargs))
+        return {'data': [{'index': 0, 'embedding': [0.25, -0.5, 1.0]}], 'model': kwargs['model']}
+
+    def _complete(self, **kwargs):
+        self.calls.append(('chat', kwargs))
+        if kwargs.get('stream'):
+            return LiveStream([{'choices': [{'delta': {'content': part}}]} for part in ('{"a"', ': 1}')])
+        return {'choices': [{'message': {'content': '{"has_bugs": false}'}}], 'usage': {'total_tokens': 12}}
+
+
+def _record(path, *requests):
+    live = FakeClient()
+    cassette = Cassette(str(path), mode='record')
+    client = cassette.wrap(live)
+    for endpoint, kwargs in requests:
+        if endpoint == 'chat':
+            client.chat.completions.create(**kwargs)
+        else:
+            client.embeddings.create(**kwargs)
+    return cassette, live
+
+
+def test_replay_serves_the_recorded_response(tmp_path):
+    path = tmp_path / 'run.zip'
+    recorder, live = _record(path, ('chat', {'model': 'gpt-4o-mini', 'messages': MESSAGES}),
+                             ('embeddings', {'model': 'text-embedding-3-small', 'input': 'def f(): pass'}))
+    recorder.close()
+
+    client = Cassette(str(path)).wrap(None)
+    reply = client.chat.completions.create(model='gpt-4o-mini', messages=MESSAGES)
+    embedding = client.embeddings.create(model='text-embedding-3-small', input='def f(): pass')
+
+    assert reply.choices[0].message.content == '{"has_bugs": false}'
+    assert reply.usage.total_tokens == 12
+    # float32 packing round-trips values the format represents exactly
+    assert embedding.data[0].embedding == [0.25, -0.5, 1.0]
+    assert len(live.calls) == 2
+
+
+def test_per_attempt_arguments_do_not_change_the_key():
+    base = {'model': 'gpt-4o-mini', 'messages': MESSAGES}
+    key = Cassette.request_key('chat', base)
+
+    assert Cassette.request_key('chat', dict(base, timeout=3.5, extra_headers={'x-attempt': '2'})) == key
+    assert Cassette.request_key('chat', dict(reversed(list(base.items())))) == key
+    assert Cassette.request_key('chat', dict(base, temperature=0.2)) != key
+    assert Cassette.request_key('embeddings', base) != key
+
+
+def test_unrecorded_request_is_a_fatal_miss(tmp_path):
+    path = tmp_path / 'run.zip'
+    _record(path, ('chat', {'model': 'gpt-4o-mini', 'messages': MESSAGES}))[0].close()
+    cassette = Cassette(str(path))
+    client = cassette.wrap(None)
+
+    with pytest.raises(CassetteMiss) as miss:
+        client.chat.completions.create(model='gpt-4o', messages=MESSAGES)
+    assert miss.value.status_code == 404
+    assert RetryPolicy.is_retryable(miss.value) is False
+    assert cassette.stats()['misses'] == 1
+
+    # Endpoints the cassette does not cover need a live client
+    with pytest.raises(CassetteMiss):
+        client.batches
+
+
+def test_record_mode_reuses_entries_and_passes_other_endpoints_through(tmp_path):
+    request = {'model': 'gpt-4o-mini', 'messages': MESSAGES}
+    cassette, live = _record(tmp_path / 'run.zip', ('chat', request))
+    client = cassette.wrap(live)
+
+    client.chat.completions.create(timeout=1.0, **request)
+
+    assert len(live.calls) == 1
+    assert cassette.stats()['hits'] == 1 and cassette.stats()['recorded'] == 1
+    assert client.batches == 'live batches'
+
+
+def test_streams_replay_the_consumed_chunks(tmp_path):
+    path = tmp_path / 'run.zip'
+    request = {'model': 'gpt-4o-mini', 'messages': MESSAGES, 'stream': True}
+    cassette = Cassette(str(path), mode='record')
+    stream = cassette.wrap(FakeClient()).chat.completions.create(**request)
+    assert ''.join(chunk['choices'][0]['delta']['content'] for chunk in stream) == '{"a": 1}'
+    stream.close()
+    cassette.close()
+
+    replayed = Cassette(str(path)).wrap(None).chat.completions.create(**request)
+    assert ''.join(chunk.choices[0].delta.content for chunk in replayed) == '{"a": 1}'
+
+
+def test_replay_needs_an_existing_archive(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        Cassette(str(tmp_path / 'missing.zip'))
+    with pytest.raises(ValueError):
+        Cassette(str(tmp_path / 'run.zip'), mode='live')
@@ -0,0 +1,48 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from phase_2.checkpoint import ScanCheckpoint, code_sha256, current_results
+
+
+def _record(checkpoint, name, code):
+    checkpoint.append(name, code_sha256(code), {'sample_name': name, 'code_hash': code_sha256(code)})
+
+
+def test_resume_reports_only_current_files(tmp_path):
+    path = str(tmp_path / 'scan.checkpoint.jsonl')
+    first = ScanCheckpoint(path)
+    _record(first, 'a.py', 'a = 1\n')
+    _record(first, 'b.py', 'b = 1\n')
+    _record(first, 'deleted.py', 'gone = 1\n')
+
+    # b.py edited and deleted.py removed before the resumed run
+    samples = [{'name': 'a.py', 'code': 'a = 1\n'}, {'name': 'b.py', 'code': 'b = 2\n'}]
+    resumed = ScanCheckpoint(path, resume=True)
+    _record(resumed, 'b.py', 'b = 2\n')
+
+    results = list(current_results(resumed, samples))
+    assert sorted(r['sample_name'] for r in results) == ['a.py', 'b.py']
+    assert [r['code_hash'] for r in results if r['sample_name'] == 'b.py'] == [code_sha256('b = 2\n')]
+
+
+def test_identical_files_share_one_record(tmp_path):
+    checkpoint = ScanCheckpoint(str(tmp_path / 'scan.checkpoint.jsonl'))
+    _record(checkpoint, 'one.py', 'x = 1\n')
+
+    samples = [{'name': 'one.py', 'code': 'x = 1\n'}, {'name': 'two.py', 'code': 'x = 1\n'}]
+    assert [r['sample_name'] for r in current_results(checkpoint, samples)] == ['one.py', 'two.py']
+
+
+def test_failed_files_are_reported_after_checkpointed_ones(tmp_path):
+    checkpoint = ScanCheckpoint(str(tmp_path / 'scan.checkpoint.jsonl'))
+    _record(checkpoint, 'ok.py', 'ok = 1\n')
+
+    samples = [{'name': 'broken.py', 'code': 'broken = 1\n'}, {'name': 'ok.py', 'code': 'ok = 1\n'},
+               {'name': 'deleted_since.py', 'code': 'x = 2\n'}]
+    failed = {'broken.py': {'error': 'Analysis failed: timeout'}, 'gone.py': {'error': 'Analysis failed: gone'}}
+
+    results = list(current_results(checkpoint, samples, failed))
+    assert [r['sample_name'] for r in results] == ['ok.py', 'broken.py']
+    assert results[1]['error'] == 'Analysis failed: timeout'
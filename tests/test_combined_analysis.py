@@ -0,0 +1,84 @@
+import os
+import sys
+import json
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+for module in ('jinja2', 'openai', 'chromadb', 'tiktoken'):
+    pytest.importorskip(module)
+
+from phase_2.llm_analyzer import LLMAnalyzer
+from phase_2.rag_analyzer import RAGAnalyzer
+
+BUGS = {'has_bugs': True, 'overall_risk': 'high',
+        'bugs_found': [{'type': 'Injection', 'line': '2', 'description': 'eval of input', 'severity': 'high'}]}
+SECURITY = {'overall_security_score': 3.0, 'overall_severity': 'HIGH', 'vulnerabilities': [],
+            'risk_summary': 'eval', 'immediate_actions': []}
+OPTIMIZATION = {'current_complexity': {'time': 'O(1)'}, 'optimizations': [], 'estimated_speedup': '1x'}
+USAGE = SimpleNamespace(prompt_tokens=900, completion_tokens=300, total_tokens=1200,
+                        prompt_tokens_details=SimpleNamespace(cached_tokens=0))
+
+
+def _analyzer(monkeypatch, content):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    analyzer = LLMAnalyzer(model="gpt-4o-mini", use_cache=False)
+    calls = []
+
+    def create(**request):
+        calls.append(request)
+        message = SimpleNamespace(content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=USAGE)
+
+    analyzer.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    return analyzer, calls
+
+
+def test_one_call_yields_all_three_sections(monkeypatch):
+    content = json.dumps({'bug_analysis': BUGS, 'security_analysis': SECURITY, 'optimization_analysis': OPTIMIZATION})
+    analyzer, calls = _analyzer(monkeypatch, content)
+
+    sections = analyzer.analyze_all('def run(x):\n    return eval(x)\n', '')
+
+    assert len(calls) == 1
+    assert sections == {'bug_analysis': BUGS, 'optimization_analysis': OPTIMIZATION, 'security_analysis': SECURITY}
+
+
+def test_missing_or_unscored_sections_fall_back(monkeypatch):
+    analyzer, _ = _analyzer(monkeypatch, '{}')
+
+    sections = analyzer.split_combined_result({'bug_analysis': BUGS, 'security_analysis': {'risk_summary': 'none'}})
+
+    assert sections['bug_analysis'] == BUGS
+    assert sections['optimization_analysis'] == {'error': True, 'message': 'Missing optimization_analysis section'}
+    assert sections['security_analysis']['overall_security_score'] == 5.0
+
+
+def test_failed_call_marks_every_section(monkeypatch):
+    analyzer, _ = _analyzer(monkeypatch, '{}')
+    failure = {'error': True, 'message': 'HTTP 500', 'error_type': 'LLM_ERROR'}
+
+    sections = analyzer.split_combined_result(failure)
+
+    assert sections['bug_analysis'] == failure and sections['optimization_analysis'] == failure
+    assert sections['security_analysis']['overall_severity'] == 'UNKNOWN'
+
+
+def test_rag_analyzer_uses_one_call_only_for_all(monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    analyzer = RAGAnalyzer(vector_store=None, embedding_generator=None, llm_model="gpt-4o-mini",
+                           use_llm_cache=False, use_retrieval_cache=False, combined_analysis=True)
+    combined = []
+    analyzer.llm_analyzer.analyze_all = lambda **kwargs: combined.append(kwargs) or {
+        'bug_analysis': BUGS, 'optimization_analysis': OPTIMIZATION, 'security_analysis': SECURITY}
+    analyzer.llm_analyzer.analyze_for_bugs = lambda **kwargs: BUGS
+
+    assert set(analyzer._run_llm_sections('x = 1', '', 'all')) == {
+        'bug_analysis', 'optimization_analysis', 'security_analysis'}
+    assert len(combined) == 1
+
+    # A single requested section keeps its own template
+    assert analyzer._run_llm_sections('x = 1', '', 'bugs') == {'bug_analysis': BUGS}
+    assert len(combined) == 1
@@ -0,0 +1,67 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+for module in ('openai', 'chromadb', 'tiktoken'):
+    pytest.importorskip(module)
+
+from phase_2.rag_core import RAGCore
+
+LOAD = "def load_user(cursor, uid):\n    return cursor.execute('SELECT * FROM users WHERE id=' + uid)\n"
+LOAD_AGAIN = "def load_user(cursor, uid):\n    row = cursor.execute('SELECT * FROM users WHERE id=' + uid)\n    return row\n"
+RENDER = "def render_page(template, title):\n    return template.format(title=title)\n"
+
+
+@pytest.fixture(autouse=True)
+def offline_token_count(monkeypatch):
+    monkeypatch.setattr(RAGCore, 'count_tokens', lambda self, text: max(1, len(text) // 4))
+
+
+def _hit(hit_id, code, similarity):
+    return {'id': hit_id, 'code': code, 'similarity_score': similarity,
+            'metadata': {'file_path': f"{hit_id}.py", 'name': hit_id, 'type': 'function'}}
+
+
+def _core(**kwargs):
+    return RAGCore(vector_store=None, embedding_generator=None, **kwargs)
+
+
+def _ids(packed):
+    return [pattern['id'] for pattern in packed['patterns_used']]
+
+
+def test_mmr_prefers_a_diverse_pattern_over_a_near_duplicate():
+    hits = [_hit('load', LOAD, 0.9), _hit('load_again', LOAD_AGAIN, 0.88), _hit('render', RENDER, 0.6)]
+
+    assert _ids(_core().pack_context(hits, token_budget=2000, mmr_lambda=1.0)) == ['load', 'load_again', 'render']
+    assert _ids(_core().pack_context(hits, token_budget=2000, mmr_lambda=0.5)) == ['load', 'render', 'load_again']
+
+
+def test_packing_stays_within_the_budget_and_trims_long_bodies():
+    long_body = "def big(values):\n" + "".join(f"    total_{i} = sum(values) * {i}\n" for i in range(200))
+    hits = [_hit('big', long_body, 0.9), _hit('render', RENDER, 0.8), _hit('load', LOAD, 0.7)]
+
+    packed = _core().pack_context(hits, token_budget=300)
+
+    assert packed['tokens_used'] <= 300
+    assert 'more lines truncated' in packed['formatted_context']
+    assert packed['patterns_dropped'] == len(hits) - len(packed['patterns_used'])
+
+
+def test_weak_vector_hits_are_dropped():
+    hits = [_hit('strong', LOAD, 0.8), _hit('weak', RENDER, 0.2)]
+    assert _ids(_core(min_similarity=0.5).pack_context(hits, token_budget=2000)) == ['strong']
+
+
+def test_budgeted_context_reports_its_size():
+    core = _core(context_token_budget=500)
+    core.retrieve_similar_patterns = lambda **_: [_hit('load', LOAD, 0.9), _hit('render', RENDER, 0.8)]
+
+    context = core.build_rag_context('def q(): pass')
+
+    assert context['num_patterns'] == 2
+    assert 0 < context['context_tokens'] <= 500
+    assert context['formatted_context'].startswith('### Similar Pattern 1')
@@ -0,0 +1,52 @@
+import os
+import sys
+import time
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+
+for module in ('jinja2', 'openai', 'chromadb', 'tiktoken'):
+    pytest.importorskip(module)
+
+from fake_openai_server import FakeOpenAIServer
+from main import run_analysis_jobs
+from phase_2.rag_analyzer import RAGAnalyzer
+
+DEADLINE = 1.0
+
+
+@pytest.fixture
+def slow_server():
+    # Every request takes far longer than the whole run is allowed
+    server = FakeOpenAIServer(latency=10.0, jitter=0.0)
+    server.start()
+    yield server
+    server.stop()
+
+
+def test_deadline_returns_partial_results_on_time(slow_server, monkeypatch):
+    monkeypatch.setenv('OPENAI_BASE_URL', slow_server.base_url)
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    analyzer = RAGAnalyzer(vector_store=None, embedding_generator=None, llm_model="gpt-4o-mini",
+                           use_llm_cache=False, use_retrieval_cache=False)
+    analyzer.rag_core.build_rag_context = lambda **_: {'num_patterns': 0, 'retrieved_patterns': [],
+                                                       'formatted_context': ''}
+    files = [{'path': f"mod_{i}.py", 'content': f"def f{i}(x):\n    return x + {i}\n"} for i in range(6)]
+    before = set(threading.enumerate())
+
+    started = time.monotonic()
+    completed, skipped = run_analysis_jobs(analyzer, files, jobs=2, deadline=DEADLINE)
+    elapsed = time.monotonic() - started
+
+    assert elapsed < DEADLINE + 0.5
+    assert skipped and set(skipped) | completed == {f['path'] for f in files}
+
+    # In-flight requests were given only the time left, so no worker outlives the deadline by much
+    workers = [t for t in threading.enumerate() if t not in before and not t.daemon]
+    for worker in workers:
+        worker.join(timeout=DEADLINE + 1.0)
+    assert not any(worker.is_alive() for worker in workers)
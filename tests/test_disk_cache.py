@@ -0,0 +1,76 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from phase_2.disk_cache import DiskCache
+
+
+def _age(cache, key, seconds):
+    """Pretend the entry was last used `seconds` ago"""
+    stamp = time.time() - seconds
+    os.utime(cache._path(key), (stamp, stamp))
+
+
+def test_round_trip_counts_hits_and_misses(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    cache.set('k', {'has_bugs': False})
+
+    assert cache.get('k') == {'has_bugs': False}
+    assert cache.get('missing') is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_expired_entry_is_a_miss_and_removed(tmp_path, monkeypatch):
+    cache = DiskCache(str(tmp_path), ttl_seconds=60)
+    cache.set('k', 'v')
+    later = time.time() + 120
+    monkeypatch.setattr(time, 'time', lambda: later)
+
+    assert cache.get('k') is None
+    assert not os.path.exists(cache._path('k'))
+
+
+def test_evict_drops_entries_idle_past_ttl(tmp_path):
+    cache = DiskCache(str(tmp_path), ttl_seconds=60)
+    cache.set('old', 1)
+    cache.set('fresh', 2)
+    _age(cache, 'old', 300)
+
+    assert cache.evict() == 1
+    assert cache.get('old') is None and cache.get('fresh') == 2
+
+
+def test_max_entries_evicts_least_recently_used(tmp_path):
+    cache = DiskCache(str(tmp_path), max_entries=2, evict_every=1000)
+    for age, key in ((30, 'a'), (20, 'b'), (10, 'c')):
+        cache.set(key, key)
+        _age(cache, key, age)
+    # Reading 'a' makes it the most recently used
+    assert cache.get('a') == 'a'
+
+    assert cache.evict() == 1
+    assert [key for key in 'abc' if cache.get(key) is not None] == ['a', 'c']
+
+
+def test_writes_trigger_eviction_every_n(tmp_path):
+    cache = DiskCache(str(tmp_path), max_entries=2, evict_every=3)
+    for i, key in enumerate('abc'):
+        cache.set(key, key)
+        _age(cache, key, 30 - i)
+
+    assert [key for key in 'abc' if os.path.exists(cache._path(key))] == ['b', 'c']
+
+
+def test_corrupt_entry_is_a_miss_and_can_be_rewritten(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    cache.set('k', 'v')
+    with open(cache._path('k'), 'w', encoding='utf-8') as f:
+        f.write('{"created_at": 1, "val')
+
+    assert cache.get('k') is None
+    assert cache.misses == 1
+
+    cache.set('k', 'fixed')
+    assert cache.get('k') == 'fixed'
@@ -0,0 +1,80 @@
+import builtins
+import hashlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+for module in ('jinja2', 'openai', 'chromadb', 'tiktoken'):
+    pytest.importorskip(module)
+
+import main
+from main import build_file_index, index_file
+
+
+@pytest.fixture
+def tree(tmp_path):
+    (tmp_path / 'pkg').mkdir()
+    (tmp_path / 'pkg' / 'app.py').write_text("import os\n\ndef run():\n    return os.getcwd()")
+    (tmp_path / 'pkg' / 'empty.py').write_text("")
+    (tmp_path / 'pkg' / 'notes.txt').write_text("not python\n")
+    for excluded in ('.git', '__pycache__', 'venv'):
+        (tmp_path / excluded).mkdir()
+        (tmp_path / excluded / 'skip.py').write_text("x = 1\n")
+    return tmp_path
+
+
+def test_entry_matches_the_file_on_disk(tree):
+    path = tree / 'pkg' / 'app.py'
+    entry = index_file(str(path), str(tree))
+
+    data = path.read_bytes()
+    assert entry['path'] == os.path.join('pkg', 'app.py')
+    assert entry['content'] == data.decode()
+    assert entry['size'] == len(data)
+    assert entry['mtime'] == path.stat().st_mtime
+    assert entry['sha256'] == hashlib.sha256(data).hexdigest()
+
+
+@pytest.mark.parametrize('text', ["", "a\n", "a\nb", "a\nb\n", "\n\n", "a\r\nb\r\n"])
+def test_line_count_matches_readlines(tmp_path, text):
+    path = tmp_path / 'lines.py'
+    path.write_bytes(text.encode())
+    with open(path) as f:
+        expected = len(f.readlines())
+    assert index_file(str(path), str(tmp_path))['lines'] == expected
+
+
+def test_undecodable_bytes_do_not_fail_the_file(tmp_path):
+    path = tmp_path / 'latin.py'
+    path.write_bytes(b"name = 'caf\xe9'\n")
+    entry = index_file(str(path), str(tmp_path))
+    assert entry['content'] == "name = 'caf'\n"
+    assert entry['sha256'] == hashlib.sha256(b"name = 'caf\xe9'\n").hexdigest()
+
+
+def test_unreadable_file_is_left_out(tmp_path):
+    assert index_file(str(tmp_path / 'missing.py'), str(tmp_path)) is None
+
+
+def test_index_reads_each_python_file_once(tree, monkeypatch):
+    opened = []
+    real_open = builtins.open
+
+    def counting_open(file, *args, **kwargs):
+        opened.append(os.path.relpath(file, tree))
+        return real_open(file, *args, **kwargs)
+
+    monkeypatch.setattr(main, 'open', counting_open, raising=False)
+    entries = build_file_index(str(tree), max_workers=4)
+
+    paths = sorted(entry['path'] for entry in entries)
+    assert paths == [os.path.join('pkg', 'app.py'), os.path.join('pkg', 'empty.py')]
+    assert sorted(opened) == paths
+
+
+def test_empty_tree_builds_an_empty_index(tmp_path):
+    assert build_file_index(str(tmp_path)) == []
@@ -0,0 +1,42 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from phase_2.file_prioritizer import FilePrioritizer
+
+PLAIN = "def add(a, b):\n    return a + b\n"
+RISKY = "import subprocess\n\ndef run(cmd):\n    return subprocess.call(cmd, shell=True)\n"
+
+
+def _entries(*pairs):
+    return [{'path': path, 'content': content} for path, content in pairs]
+
+
+def _ranked_paths(tmp_path, entries, churn=None):
+    prioritizer = FilePrioritizer(str(tmp_path))
+    if churn is not None:
+        prioritizer.git_churn = lambda: churn
+    return [entry['path'] for entry in prioritizer.rank(entries)]
+
+
+def test_ties_rank_by_path_whatever_the_walk_order(tmp_path):
+    walked = _entries(('pkg/zeta.py', PLAIN), ('alpha.py', PLAIN), ('pkg/beta.py', PLAIN))
+
+    assert _ranked_paths(tmp_path, walked) == ['alpha.py', 'pkg/beta.py', 'pkg/zeta.py']
+    assert _ranked_paths(tmp_path, list(reversed(walked))) == ['alpha.py', 'pkg/beta.py', 'pkg/zeta.py']
+
+
+def test_risky_code_outranks_plain_code(tmp_path):
+    ranked = _ranked_paths(tmp_path, _entries(('a_plain.py', PLAIN), ('z_risky.py', RISKY)))
+    assert ranked == ['z_risky.py', 'a_plain.py']
+
+
+def test_tests_rank_below_the_same_code_elsewhere(tmp_path):
+    ranked = _ranked_paths(tmp_path, _entries(('tests/test_run.py', RISKY), ('tools/run.py', RISKY)))
+    assert ranked == ['tools/run.py', 'tests/test_run.py']
+
+
+def test_churn_breaks_otherwise_equal_scores(tmp_path):
+    entries = _entries(('a.py', PLAIN), ('b.py', PLAIN))
+    assert _ranked_paths(tmp_path, entries, churn={'b.py': 4, 'a.py': 1}) == ['b.py', 'a.py']
@@ -0,0 +1,80 @@
+import os
+import sys
+import json
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from phase_2.json_recovery import RecoveringJSONParser, recover_json
+
+
+def _feed_split(text, split):
+    parser = RecoveringJSONParser()
+    parser.feed(text[:split])
+    parser.feed(text[split:])
+    return parser.finish()
+
+
+def _every_split(value):
+    text = json.dumps(value)
+    for split in range(len(text) + 1):
+        assert _feed_split(text, split) == value, f"split at {split}: {text[:split]!r} | {text[split:]!r}"
+
+
+def test_negative_number_split_after_sign():
+    parser = RecoveringJSONParser()
+    parser.feed('{"score": -')
+    parser.feed('3}')
+    assert parser.finish() == {'score': -3}
+
+
+@pytest.mark.parametrize('value', [
+    {'score': -3},
+    {'score': -12.75, 'ratio': 0.5},
+    {'big': 1.5e-07, 'huge': -2e+21},
+    [-1, -22, 333],
+])
+def test_numbers_survive_any_split(value):
+    _every_split(value)
+
+
+@pytest.mark.parametrize('value', [
+    {'description': 'plain text with spaces'},
+    {'quote': 'say "hi" twice', 'path': 'C:\\temp\\new'},
+    {'lines': 'one\ntwo\tthree /slash'},
+    {'unicode': 'caf\u00e9 \u2603'},
+])
+def test_strings_and_escapes_survive_any_split(value):
+    _every_split(value)
+
+
+def test_unicode_escape_split_inside_hex_digits():
+    parser = RecoveringJSONParser()
+    parser.feed('{"s": "caf\\u00')
+    parser.feed('e9"}')
+    assert parser.finish() == {'s': 'caf\u00e9'}
+
+
+@pytest.mark.parametrize('value', [
+    {'has_bugs': True, 'fixed': False, 'owner': None},
+    [True, False, None],
+])
+def test_literals_survive_any_split(value):
+    _every_split(value)
+
+
+def test_one_character_at_a_time_reports_values_in_order():
+    seen = []
+    parser = RecoveringJSONParser(on_value=lambda path, value: seen.append(path))
+    for char in json.dumps({'has_bugs': True, 'overall_risk': 'low', 'bugs_found': [{'line': -4}]}):
+        parser.feed(char)
+
+    assert parser.done
+    assert seen == [('has_bugs',), ('overall_risk',), ('bugs_found', 0, 'line'), ('bugs_found', 0),
+                    ('bugs_found',), ()]
+
+
+def test_truncated_response_keeps_largest_prefix():
+    assert recover_json('Sure:\n```json\n{"has_bugs": true, "bugs_found": [{"line": -') == \
+        {'has_bugs': True, 'bugs_found': [{}]}
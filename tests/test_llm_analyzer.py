@@ -0,0 +1,65 @@
+import os
+import sys
+import json
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+for module in ('jinja2', 'openai', 'chromadb', 'tiktoken'):
+    pytest.importorskip(module)
+
+from phase_2.llm_analyzer import LLMAnalyzer
+
+USAGE = SimpleNamespace(prompt_tokens=120, completion_tokens=40, total_tokens=160,
+                        prompt_tokens_details=SimpleNamespace(cached_tokens=0))
+
+
+class FakeStream:
+    """Chunks in the order the API sends them with include_usage: content, then usage"""
+
+    def __init__(self, text):
+        self.chunks = [SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=SimpleNamespace(content=text[i:i + 8]))])
+                       for i in range(0, len(text), 8)]
+        self.chunks.append(SimpleNamespace(usage=USAGE, choices=[]))
+        self.consumed = 0
+        self.closed = False
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            self.consumed += 1
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+
+def _analyzer(fake_stream, **kwargs):
+    analyzer = LLMAnalyzer(model="gpt-4o-mini", api_key="test", use_cache=False, **kwargs)
+    analyzer.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=lambda **_: fake_stream)))
+    return analyzer
+
+
+def test_stream_reads_usage_after_closing_brace():
+    stream = FakeStream(json.dumps({"has_bugs": False, "overall_risk": "low", "bugs_found": []}))
+    analyzer = _analyzer(stream, stream=True)
+
+    result, stopped_early, counts = analyzer._stream_json({"model": "gpt-4o-mini"}, 'bug_analysis')
+
+    assert result['overall_risk'] == 'low'
+    assert stopped_early is False
+    assert counts == {'prompt_tokens': 120, 'cached_tokens': 0, 'completion_tokens': 40}
+    assert stream.consumed == len(stream.chunks) and stream.closed
+
+
+def test_early_stop_abandons_stream():
+    bugs = [{"type": "x", "line": "1", "description": "long " * 50, "severity": "low", "cwe_id": "CWE-1"}] * 5
+    stream = FakeStream(json.dumps({"has_bugs": True, "overall_risk": "high", "bugs_found": bugs}))
+    analyzer = _analyzer(stream, early_stop_fields={'bug_analysis': ('has_bugs', 'overall_risk')})
+
+    result, stopped_early, counts = analyzer._stream_json({"model": "gpt-4o-mini"}, 'bug_analysis')
+
+    assert stopped_early is True
+    assert result['overall_risk'] == 'high'
+    assert stream.consumed < len(stream.chunks) // 2 and stream.closed
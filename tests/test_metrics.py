@@ -0,0 +1,43 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from phase_1.metrics import MetricsCollector, metrics_scope, request_cost
+
+
+def test_batch_requests_cost_half_the_interactive_price():
+    metrics = MetricsCollector()
+    metrics.record('llm', 'gpt-4o', 1.2, prompt_tokens=10_000, completion_tokens=2_000)
+    metrics.record('batch', 'gpt-4o', 0.0, prompt_tokens=10_000, completion_tokens=2_000)
+
+    interactive, batch = (record['cost_usd'] for record in metrics.records)
+    assert interactive == pytest.approx(request_cost('gpt-4o', 10_000, 2_000))
+    assert batch == pytest.approx(interactive / 2)
+
+
+def test_batch_records_stay_out_of_latency_percentiles():
+    metrics = MetricsCollector()
+    metrics.record('llm', 'gpt-4o-mini', 2.0, prompt_tokens=100)
+    metrics.record('batch', 'gpt-4o-mini', 0.0, prompt_tokens=100)
+
+    run = metrics.summary()['run']
+    assert run['requests'] == 2
+    assert run['latency_p50'] == 2.0
+
+
+def test_records_roll_up_by_file_and_stage():
+    metrics = MetricsCollector()
+    with metrics_scope(file='a.py', stage='bug_analysis'):
+        metrics.record('llm', 'gpt-4o-mini', 0.5, prompt_tokens=200, cached_tokens=100, retries=1, hedges=1)
+    with metrics_scope(file='b.py'):
+        metrics.record('llm', 'gpt-4o-mini', 0.1, cache_hit=True, stage='security_analysis')
+
+    summary = metrics.summary()
+    assert set(summary['by_file']) == {'a.py', 'b.py'}
+    assert set(summary['by_stage']) == {'bug_analysis', 'security_analysis'}
+    assert (summary['run']['retries'], summary['run']['hedges']) == (1, 1)
+    assert summary['run']['cached_ratio'] == 0.5
+    assert summary['by_file']['b.py']['cost_usd'] == 0.0
@@ -0,0 +1,87 @@
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+for module in ('jinja2', 'openai', 'chromadb', 'tiktoken'):
+    pytest.importorskip(module)
+
+from phase_1.metrics import current_file, metrics_scope
+from phase_2.rag_analyzer import RAGAnalyzer
+
+BUGS = {'has_bugs': False, 'overall_risk': 'low', 'bugs_found': []}
+OPTIMIZATION = {'optimizations': [], 'estimated_speedup': '1x'}
+SECURITY = {'overall_security_score': 9.0, 'overall_severity': 'LOW', 'vulnerabilities': []}
+
+
+@pytest.fixture
+def analyzer(monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    return RAGAnalyzer(vector_store=None, embedding_generator=None, llm_model="gpt-4o-mini",
+                       use_llm_cache=False, use_retrieval_cache=False, llm_timeout=0.5)
+
+
+def _section(result, delay=0.0):
+    def run(query_code, retrieved_context):
+        time.sleep(delay)
+        if isinstance(result, Exception):
+            raise result
+        return result
+    return run
+
+
+def test_sections_run_concurrently(analyzer):
+    for method, result in (('analyze_for_bugs', BUGS), ('analyze_for_optimization', OPTIMIZATION),
+                           ('calculate_security_score', SECURITY)):
+        setattr(analyzer.llm_analyzer, method, _section(result, delay=0.3))
+
+    started = time.monotonic()
+    results = analyzer._run_llm_sections('x = 1', '', 'all')
+
+    # Three 0.3s sections finish in about 0.3s, not 0.9s
+    assert time.monotonic() - started < 0.6
+    assert results == {'bug_analysis': BUGS, 'optimization_analysis': OPTIMIZATION, 'security_analysis': SECURITY}
+
+
+def test_slow_section_times_out_without_losing_the_others(analyzer):
+    analyzer.llm_analyzer.analyze_for_bugs = _section(BUGS)
+    analyzer.llm_analyzer.analyze_for_optimization = _section(OPTIMIZATION, delay=2.0)
+    analyzer.llm_analyzer.calculate_security_score = _section(SECURITY, delay=2.0)
+
+    started = time.monotonic()
+    results = analyzer._run_llm_sections('x = 1', '', 'all')
+
+    # One shared deadline for the file, not llm_timeout per section
+    assert time.monotonic() - started < 1.0
+    assert results['bug_analysis'] == BUGS
+    assert results['optimization_analysis'] == {'error': True, 'message': 'Timed out after 0.5s'}
+    # Security always yields a usable result, scored 0 when the analysis failed
+    assert results['security_analysis']['overall_security_score'] == 0
+    assert 'Timed out' in results['security_analysis']['risk_summary']
+
+
+def test_failing_section_is_isolated(analyzer):
+    analyzer.llm_analyzer.analyze_for_bugs = _section(RuntimeError('boom'))
+    analyzer.llm_analyzer.analyze_for_optimization = _section(OPTIMIZATION)
+
+    results = analyzer._run_llm_sections('x = 1', '', 'optimization')
+    assert results == {'optimization_analysis': OPTIMIZATION}
+
+    results = analyzer._run_llm_sections('x = 1', '', 'bugs')
+    assert results == {'bug_analysis': {'error': True, 'message': 'boom'}}
+
+
+def test_sections_keep_the_file_label(analyzer):
+    seen = []
+
+    def record(query_code, retrieved_context):
+        seen.append(current_file.get())
+        return BUGS
+
+    analyzer.llm_analyzer.analyze_for_bugs = record
+    with metrics_scope(file='pkg/mod.py'):
+        analyzer._run_llm_sections('x = 1', '', 'bugs')
+    assert seen == ['pkg/mod.py']
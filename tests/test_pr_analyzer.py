@@ -0,0 +1,91 @@
+import os
+import sys
+import subprocess
+import textwrap
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '.github', 'scripts')))
+
+for module in ('jinja2', 'openai', 'chromadb', 'tiktoken'):
+    pytest.importorskip(module)
+
+from pr_analyzer import build_hunk_chunks, get_changed_lines
+
+SOURCE = textwrap.dedent('''\
+    import os
+
+    TIMEOUT = 30
+
+
+    class Store:
+        retries = 3
+
+        def load(self, key):
+            return os.environ.get(key)
+
+        @staticmethod
+        def save(key, value):
+            os.environ[key] = value
+
+
+    def helper(x):
+        return x + 1
+''')
+
+
+def _spans(chunks):
+    return [(chunk['type'], chunk['name'], chunk['line_start'], chunk['line_end']) for chunk in chunks]
+
+
+def _git(repo, *args):
+    subprocess.run(['git', '-C', str(repo), '-c', 'user.name=t', '-c', 'user.email=t@t', *args],
+                   check=True, capture_output=True)
+
+
+def test_method_change_maps_to_the_method_only():
+    assert _spans(build_hunk_chunks(SOURCE, 'store.py', {10})) == [('function', 'store.py:load', 9, 10)]
+
+
+def test_decorated_function_span_starts_at_its_decorator():
+    chunks = build_hunk_chunks(SOURCE, 'store.py', {14})
+    assert _spans(chunks) == [('function', 'store.py:save', 12, 14)]
+    assert chunks[0]['code'].startswith('@staticmethod')
+
+
+def test_class_level_change_maps_to_the_class():
+    assert _spans(build_hunk_chunks(SOURCE, 'store.py', {7})) == [('class', 'store.py:Store', 6, 14)]
+    # The method is inside the class chunk already, so it is not sent twice
+    assert _spans(build_hunk_chunks(SOURCE, 'store.py', {7, 10})) == [('class', 'store.py:Store', 6, 14)]
+
+
+def test_module_level_change_gets_a_context_window():
+    chunks = build_hunk_chunks(SOURCE, 'store.py', {3, 18})
+    assert _spans(chunks) == [('diff_hunk', 'store.py:L1-6', 1, 6), ('function', 'store.py:helper', 17, 18)]
+
+
+def test_unparsable_file_falls_back_to_windows():
+    chunks = build_hunk_chunks("def broken(:\n    pass\n", 'broken.py', {1})
+    assert _spans(chunks) == [('diff_hunk', 'broken.py:L1-2', 1, 2)]
+
+
+def test_changed_lines_come_from_the_merge_base_diff(tmp_path, monkeypatch):
+    repo = tmp_path / 'repo'
+    repo.mkdir()
+    _git(repo, 'init', '-q', '-b', 'main')
+    (repo / 'store.py').write_text(SOURCE)
+    _git(repo, 'add', 'store.py')
+    _git(repo, 'commit', '-q', '-m', 'base')
+    _git(repo, 'checkout', '-q', '-b', 'feature')
+
+    lines = SOURCE.splitlines()
+    lines[9] = "        return os.environ[key]"    # modified line 10
+    lines.insert(17, "    x = abs(x)")              # added line 18
+    del lines[2]                                     # TIMEOUT removed: anchored after line 2
+    (repo / 'store.py').write_text('\n'.join(lines) + '\n')
+    _git(repo, 'commit', '-q', '-am', 'change')
+
+    monkeypatch.chdir(repo)
+    assert get_changed_lines('store.py', 'main') == {2, 9, 17}
+    assert get_changed_lines('store.py', 'no-such-branch') is None
@@ -0,0 +1,113 @@
+import os
+import sys
+import subprocess
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '.github', 'scripts')))
+
+for module in ('jinja2', 'openai', 'chromadb', 'tiktoken'):
+    pytest.importorskip(module)
+
+import pr_analyzer
+from pr_analyzer import anchor_findings, get_blob_sha
+
+CODE = "def load(cursor, uid):\n    return cursor.execute('SELECT ' + uid)\n"
+
+
+@pytest.fixture
+def model(tmp_path, monkeypatch):
+    """Run analyze_changed_files offline in tmp_path and record the files that reach the model"""
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(pr_analyzer, 'CACHE_ROOT', str(tmp_path / 'cache'))
+    monkeypatch.setattr(pr_analyzer, 'ChromaVectorStore', lambda **_: None)
+    monkeypatch.setattr(pr_analyzer, 'EmbeddingGenerator', lambda: None)
+    (tmp_path / 'users.py').write_text(CODE)
+
+    model = SimpleNamespace(calls=[], fail=False)
+    real_analyzer = pr_analyzer.RAGAnalyzer
+
+    def analyze(code, analysis_type, file_path, **_):
+        model.calls.append(file_path)
+        if model.fail:
+            return {'file_path': file_path, 'error': True, 'message': 'HTTP 500'}
+        return {'file_path': file_path, 'bug_analysis': {'has_bugs': True, 'bugs_found': [{'line': '2'}]}}
+
+    def build(**kwargs):
+        analyzer = real_analyzer(use_llm_cache=False, use_retrieval_cache=False, **kwargs)
+        analyzer.analyze_code = analyze
+        return analyzer
+
+    monkeypatch.setattr(pr_analyzer, 'RAGAnalyzer', build)
+    return model
+
+
+def test_unchanged_blob_reuses_the_previous_result(model):
+    first = pr_analyzer.analyze_changed_files(['users.py'], full=True)
+    second = pr_analyzer.analyze_changed_files(['users.py'], full=True)
+
+    assert model.calls == ['users.py']
+    assert second == first
+
+
+def test_edited_file_is_analyzed_again(model, tmp_path):
+    pr_analyzer.analyze_changed_files(['users.py'], full=True)
+    (tmp_path / 'users.py').write_text(CODE + "\n\ndef save():\n    pass\n")
+    pr_analyzer.analyze_changed_files(['users.py'], full=True)
+    assert len(model.calls) == 2
+
+
+def test_diff_scope_and_config_are_part_of_the_key(model, monkeypatch):
+    pr_analyzer.analyze_changed_files(['users.py'], full=True)
+
+    # Same blob against a base where both lines changed: a different request
+    monkeypatch.setattr(pr_analyzer, 'get_changed_lines', lambda file_path, base: {1, 2})
+    pr_analyzer.analyze_changed_files(['users.py'], base='main')
+    assert len(model.calls) == 2
+    pr_analyzer.analyze_changed_files(['users.py'], base='main')
+    assert len(model.calls) == 2
+
+    monkeypatch.setattr(pr_analyzer, 'CONTEXT_LINES', 5)
+    pr_analyzer.analyze_changed_files(['users.py'], base='main')
+    assert len(model.calls) == 3
+
+
+def test_failed_analysis_is_not_cached(model):
+    model.fail = True
+    pr_analyzer.analyze_changed_files(['users.py'], full=True)
+    model.fail = False
+    pr_analyzer.analyze_changed_files(['users.py'], full=True)
+    pr_analyzer.analyze_changed_files(['users.py'], full=True)
+    assert len(model.calls) == 2
+
+
+def test_cache_can_be_disabled(model):
+    pr_analyzer.analyze_changed_files(['users.py'], full=True, use_cache=False)
+    pr_analyzer.analyze_changed_files(['users.py'], full=True, use_cache=False)
+    assert len(model.calls) == 2
+
+
+def test_blob_sha_matches_git(tmp_path):
+    path = tmp_path / 'users.py'
+    path.write_text(CODE)
+    expected = subprocess.run(['git', 'hash-object', str(path)], capture_output=True, text=True).stdout.strip()
+
+    assert get_blob_sha(str(path)) == expected
+    assert get_blob_sha(str(tmp_path / 'missing.py')) is None
+
+
+def test_findings_are_anchored_to_changed_lines():
+    analysis = {
+        'bug_analysis': {'bugs_found': [{'line': 'Line 4'}, {'line': '9-11'}, {'line': ''}]},
+        'security_analysis': {'vulnerabilities': [{'line': 10}]},
+        'optimization_analysis': None,
+    }
+
+    anchor_findings(analysis, {4, 10})
+
+    assert [bug['in_diff'] for bug in analysis['bug_analysis']['bugs_found']] == [True, False, False]
+    assert analysis['security_analysis']['vulnerabilities'][0]['in_diff'] is True
+    assert analysis['findings_in_diff'] == 2
@@ -0,0 +1,54 @@
+import os
+import sys
+import json
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+for module in ('jinja2', 'openai', 'chromadb', 'tiktoken'):
+    pytest.importorskip(module)
+
+from phase_2.prompt_templates import PromptTemplates, COMBINED_SCHEMA
+from phase_2.llm_analyzer import GATING_FIELDS
+from phase_2.json_recovery import RecoveringJSONParser
+
+
+def _example(schema):
+    """A response in the schema's key order, with long strings standing in for narrative"""
+    kind = schema['type']
+    if kind == 'object':
+        return {key: _example(value) for key, value in schema['properties'].items()}
+    if kind == 'array':
+        return [_example(schema['items']) for _ in range(3)]
+    if kind == 'boolean':
+        return True
+    if kind == 'number':
+        return 7.5
+    return schema.get('enum', ['narrative ' * 40])[0]
+
+
+def _chars_until_complete(text, paths):
+    complete = set()
+    parser = RecoveringJSONParser(on_value=lambda path, value: complete.add(path))
+    for position, char in enumerate(text, 1):
+        parser.feed(char)
+        if paths <= complete:
+            return position
+    return len(text)
+
+
+@pytest.mark.parametrize('section', sorted(GATING_FIELDS))
+def test_gating_fields_stream_before_narrative(section):
+    text = json.dumps(_example(PromptTemplates.RESPONSE_SCHEMAS[section]))
+    paths = {(field,) for field in GATING_FIELDS[section]}
+    assert _chars_until_complete(text, paths) < len(text) // 10
+
+
+def test_combined_gating_fields_stream_first():
+    gated = list(COMBINED_SCHEMA['properties'])[:len(GATING_FIELDS)]
+    assert set(gated) == set(GATING_FIELDS)
+
+    text = json.dumps(_example(COMBINED_SCHEMA))
+    paths = {(section, field) for section, fields in GATING_FIELDS.items() for field in fields}
+    assert _chars_until_complete(text, paths) < len(text) // 2
@@ -0,0 +1,42 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+for module in ('jinja2', 'openai', 'chromadb', 'tiktoken'):
+    pytest.importorskip(module)
+
+from phase_2.rag_analyzer import RAGAnalyzer
+
+
+def test_report_shows_section_failure_message(monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    analyzer = RAGAnalyzer(vector_store=None, embedding_generator=None, use_llm_cache=False,
+                           use_retrieval_cache=False, llm_model="gpt-4o-mini")
+    results = {
+        'sample_name': 'slow.py',
+        'timestamp': '2026-01-01T00:00:00',
+        'code': 'def slow():\n    pass\n',
+        'analysis_type': 'bugs',
+        'retrieved_patterns_count': 0,
+        'bug_analysis': analyzer._section_failure('bug_analysis', 'timed out after 300s'),
+    }
+
+    report = analyzer.generate_report(results)
+
+    assert "✗ Error: timed out after 300s" in report
+    assert "Error: True" not in report
+
+
+def test_report_lists_failed_file(monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    analyzer = RAGAnalyzer(vector_store=None, embedding_generator=None, use_llm_cache=False,
+                           use_retrieval_cache=False, llm_model="gpt-4o-mini")
+
+    report = analyzer.generate_report({'sample_name': 'broken.py', 'timestamp': '2026-01-01T00:00:00',
+                                       'error': 'Analysis failed: connection reset'})
+
+    assert "File: broken.py" in report
+    assert "✗ Error: Analysis failed: connection reset" in report
@@ -0,0 +1,51 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+for module in ('openai', 'chromadb', 'tiktoken'):
+    pytest.importorskip(module)
+
+from phase_2.rag_core import RAGCore
+
+
+@pytest.fixture(autouse=True)
+def offline_token_count(monkeypatch):
+    # tiktoken downloads its BPE file on first use; roughly four characters per token is enough here
+    monkeypatch.setattr(RAGCore, 'count_tokens', lambda self, text: max(1, len(text) // 4))
+
+
+def _hit(hit_id, code, similarity, bm25=None):
+    hit = {'id': hit_id, 'code': code, 'similarity_score': similarity, 'metadata': {'file_path': f"{hit_id}.py"}}
+    if bm25 is not None:
+        hit['bm25_score'] = bm25
+    return hit
+
+
+def _core():
+    return RAGCore(vector_store=None, embedding_generator=None, min_similarity=0.5)
+
+
+def test_packing_keeps_fused_order():
+    vector = [_hit('shared', 'def load(cursor, uid): cursor.execute(uid)', 0.62),
+              _hit('vector_only', 'def parse(text): return text.split()', 0.55)]
+    # The best lexical hit always normalises to similarity 1.0
+    lexical = [_hit('lexical_only', 'def render(page): return page.title', 1.0, bm25=9.0),
+               _hit('shared', 'def load(cursor, uid): cursor.execute(uid)', 0.8, bm25=7.2)]
+    fused = RAGCore.fuse_rankings([vector, lexical], top_k=3)
+
+    packed = _core().pack_context(fused, token_budget=2000, mmr_lambda=1.0)
+
+    assert [p['id'] for p in packed['patterns_used']] == [p['id'] for p in fused]
+    assert packed['patterns_used'][0]['id'] == 'shared'
+
+
+def test_similarity_threshold_applies_to_vector_hits_only():
+    hits = [_hit('weak_vector', 'def a(x): return x + 1', 0.3),
+            _hit('weak_lexical', 'def b(y): return y * 2', 0.2, bm25=1.1)]
+
+    packed = _core().pack_context(hits, token_budget=2000)
+
+    assert [p['id'] for p in packed['patterns_used']] == ['weak_lexical']
@@ -0,0 +1,82 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from phase_2.retrieval_cache import RetrievalCache
+
+HITS = [{'id': 'a', 'code': 'def a(): pass', 'similarity_score': 0.9, 'metadata': {'file_path': 'a.py'}}]
+
+
+class FakeStore:
+    collection_name = 'cache_test'
+
+    def __init__(self):
+        self.generation = 'index-1:1'
+        self.searches = 0
+
+    def search_similar_code(self, query_embedding, top_k, **kwargs):
+        self.searches += 1
+        return list(HITS)
+
+
+class FixedEmbeddings:
+    model = 'fixed'
+
+    def generate_embedding(self, text):
+        return [1.0, 0.0]
+
+
+def _core(tmp_path):
+    for module in ('openai', 'chromadb', 'tiktoken'):
+        pytest.importorskip(module)
+    from phase_2.rag_core import RAGCore
+
+    store = FakeStore()
+    core = RAGCore(vector_store=store, embedding_generator=FixedEmbeddings(), retrieval_mode='vector',
+                   retrieval_cache=RetrievalCache(str(tmp_path)))
+    return core, store
+
+
+def test_memory_lru_evicts_oldest_but_disk_keeps_it(tmp_path):
+    cache = RetrievalCache(str(tmp_path), max_memory_entries=2)
+    for key in ('a', 'b', 'c'):
+        cache.set(key, [key])
+
+    assert list(cache._memory) == ['b', 'c']
+    # Evicted from memory, still served from disk and promoted back
+    assert cache.get('a') == ['a']
+    assert list(cache._memory) == ['c', 'a']
+
+
+def test_new_instance_reads_previous_run_from_disk(tmp_path):
+    RetrievalCache(str(tmp_path)).set('key', HITS)
+    assert RetrievalCache(str(tmp_path)).get('key') == HITS
+    assert RetrievalCache(str(tmp_path)).get('other') is None
+
+
+def test_repeat_query_is_served_from_cache(tmp_path):
+    core, store = _core(tmp_path)
+
+    first = core.retrieve_similar_patterns('def q(): pass')
+    second = core.retrieve_similar_patterns('def q(): pass')
+
+    assert first == second == HITS
+    assert store.searches == 1
+
+
+def test_key_covers_query_options_and_index_generation(tmp_path):
+    core, store = _core(tmp_path)
+    core.retrieve_similar_patterns('def q(): pass')
+
+    core.retrieve_similar_patterns('def q(): pass', top_k=3)
+    core.retrieve_similar_patterns('def q(): pass', exclude_file_path='q.py')
+    core.retrieve_similar_patterns('def other(): pass')
+    assert store.searches == 4
+
+    # Re-indexing bumps the generation, so nothing cached before it is reused
+    store.generation = 'index-1:2'
+    core.retrieve_similar_patterns('def q(): pass')
+    assert store.searches == 5
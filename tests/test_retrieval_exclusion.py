@@ -0,0 +1,77 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+for module in ('openai', 'chromadb', 'tiktoken'):
+    pytest.importorskip(module)
+
+from phase_1.vector_store import ChromaVectorStore, content_hash
+from phase_2.rag_core import RAGCore
+
+QUERY = "def load(cursor, uid):\n    return cursor.execute(uid)\n"
+# The same function re-indented and commented in another file: still a self-match
+QUERY_COPY = "def load(cursor, uid):\n\n        # copied\n        return cursor.execute(uid)\n"
+
+
+class FixedEmbeddings:
+    model = 'fixed'
+
+    def generate_embedding(self, text):
+        return [1.0, 0.0, 0.0]
+
+
+def _chunk(file_path, name, code, embedding):
+    return {'file_path': file_path, 'name': name, 'type': 'function', 'code': code, 'embedding': embedding}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ChromaVectorStore(collection_name='exclusion_test', persist_directory=str(tmp_path))
+    store.upsert_chunks([
+        _chunk('app/users.py', 'load', QUERY, [1.0, 0.0, 0.0]),
+        _chunk('app/users.py', 'save', "def save(cursor, user):\n    cursor.execute(user)\n", [0.99, 0.1, 0.0]),
+        _chunk('legacy/copy.py', 'load', QUERY_COPY, [1.0, 0.01, 0.0]),
+        _chunk('app/orders.py', 'fetch', "def fetch(cursor, oid):\n    return cursor.execute(oid)\n", [0.9, 0.3, 0.0]),
+        _chunk('app/render.py', 'render', "def render(page):\n    return page.title\n", [0.5, 0.8, 0.0]),
+    ])
+    return store
+
+
+def test_content_hash_ignores_layout_and_comments():
+    assert content_hash(QUERY) == content_hash(QUERY_COPY)
+    assert content_hash(QUERY) != content_hash(QUERY.replace('uid', 'oid'))
+
+
+def test_where_clause_combines_filters_with_ne():
+    assert ChromaVectorStore.build_where() is None
+    assert ChromaVectorStore.build_where(exclude_file_path='a.py') == {'file_path': {'$ne': 'a.py'}}
+    assert ChromaVectorStore.build_where({'type': 'function'}, 'a.py', 'abc') == {'$and': [
+        {'type': 'function'}, {'file_path': {'$ne': 'a.py'}}, {'content_hash': {'$ne': 'abc'}}]}
+
+
+def test_vector_search_fills_top_k_from_other_files(store):
+    hits = store.search_similar_code([1.0, 0.0, 0.0], top_k=2, exclude_file_path='app/users.py',
+                                     exclude_content_hash=content_hash(QUERY))
+    assert [hit['metadata']['file_path'] for hit in hits] == ['app/orders.py', 'app/render.py']
+
+
+def test_lexical_search_applies_the_same_exclusions(store):
+    hits = store.search_lexical(QUERY, top_k=5, exclude_file_path='app/users.py',
+                                exclude_content_hash=content_hash(QUERY))
+    assert {hit['metadata']['file_path'] for hit in hits} == {'app/orders.py'}
+
+
+@pytest.mark.parametrize('mode', ['vector', 'lexical', 'hybrid'])
+def test_retrieval_skips_the_query_and_its_file(store, mode):
+    core = RAGCore(vector_store=store, embedding_generator=FixedEmbeddings(), top_k=3, retrieval_mode=mode)
+
+    hits = core.retrieve_similar_patterns(QUERY, exclude_file_path='app/users.py')
+    paths = {hit['metadata']['file_path'] for hit in hits}
+    assert paths and not paths & {'app/users.py', 'legacy/copy.py'}
+
+    # Opting out keeps the self-match in the results
+    hits = core.retrieve_similar_patterns(QUERY, exclude_self=False)
+    assert content_hash(QUERY) in {hit['metadata']['content_hash'] for hit in hits}
@@ -0,0 +1,95 @@
+import os
+import sys
+import time
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from phase_2.retry_policy import RetryPolicy
+
+
+class Flaky(Exception):
+    status_code = 503
+
+
+def test_hedged_duplicate_is_not_a_retry():
+    calls = []
+    lock = threading.Lock()
+
+    def call(timeout):
+        with lock:
+            calls.append(timeout)
+            first = len(calls) == 1
+        # The first request is slow, so the policy races a duplicate against it
+        time.sleep(0.3 if first else 0.01)
+        return 'ok'
+
+    stats = {}
+    policy = RetryPolicy(hedge_after=0.05, backoff_base=0.01)
+    assert policy.run(call, max_tokens=10, stats=stats) == 'ok'
+    assert len(calls) == 2
+    assert stats == {'retries': 0, 'hedges': 1}
+
+
+def test_failed_attempts_count_as_retries():
+    attempts = []
+
+    def call(timeout):
+        attempts.append(timeout)
+        if len(attempts) < 3:
+            raise Flaky("unavailable")
+        return 'ok'
+
+    stats = {}
+    policy = RetryPolicy(backoff_base=0.001, backoff_max=0.01)
+    assert policy.run(call, max_tokens=10, stats=stats, hedge=False) == 'ok'
+    assert stats == {'retries': 2, 'hedges': 0}
+
+
+def test_programming_errors_are_not_retried():
+    attempts = []
+
+    def call(timeout):
+        attempts.append(timeout)
+        raise TypeError("unexpected keyword argument")
+
+    stats = {}
+    with pytest.raises(TypeError):
+        RetryPolicy(backoff_base=0.001).run(call, max_tokens=10, stats=stats, hedge=False)
+    assert len(attempts) == 1 and stats['retries'] == 0
+
+
+def test_timeouts_and_dropped_connections_are_retried():
+    openai = pytest.importorskip('openai')
+    httpx = pytest.importorskip('httpx')
+    request = httpx.Request('POST', 'http://127.0.0.1/v1/chat/completions')
+    failures = [openai.APITimeoutError(request=request), openai.APIConnectionError(request=request),
+                httpx.ReadError("connection reset")]
+
+    def call(timeout):
+        if failures:
+            raise failures.pop(0)
+        return 'ok'
+
+    stats = {}
+    policy = RetryPolicy(backoff_base=0.001, backoff_max=0.01)
+    assert policy.run(call, max_tokens=10, stats=stats, hedge=False) == 'ok'
+    assert stats['retries'] == 3
+    assert not RetryPolicy.is_retryable(ValueError("bad JSON"))
+
+
+def test_attempts_never_run_past_the_run_deadline():
+    timeouts = []
+
+    def call(timeout):
+        timeouts.append(timeout)
+        time.sleep(timeout)
+        raise Flaky("slow upstream")
+
+    deadline_at = time.monotonic() + 0.2
+    with pytest.raises(TimeoutError):
+        RetryPolicy(backoff_base=0.001).run(call, max_tokens=1000, hedge=False, deadline_at=deadline_at)
+    assert time.monotonic() - deadline_at < 0.1
+    assert all(timeout <= 0.2 for timeout in timeouts)
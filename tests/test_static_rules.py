@@ -0,0 +1,124 @@
+import os
+import sys
+import textwrap
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from phase_2.static_rules import StaticRuleEngine
+
+ENGINE = StaticRuleEngine()
+
+
+def scan(source):
+    return ENGINE.scan_source(textwrap.dedent(source))
+
+
+def test_pure_code_is_provably_uninteresting():
+    report = scan('''
+        def total(values):
+            return sum(v * 2 for v in values)
+    ''')
+    assert report['needs_llm'] is False
+    assert report['needs_llm_score'] == 0.0
+
+
+def test_sql_through_chained_cursor_is_flagged():
+    report = scan('''
+        def load(conn, uid):
+            return conn.cursor().execute(f"SELECT * FROM u WHERE id={uid}")
+    ''')
+    assert report['needs_llm'] is True
+    assert report['signals'].get('sink') == 1
+    assert [f['rule_id'] for f in report['findings']] == ['NS002']
+
+
+def test_call_on_getattr_result_is_dynamic():
+    report = scan('''
+        def dispatch(obj, name):
+            return getattr(obj, name)()
+    ''')
+    assert report['needs_llm'] is True
+    assert report['signals'].get('dynamic') == 1
+
+
+def test_subscripted_callee_is_dynamic():
+    report = scan('''
+        def dispatch(handlers, key):
+            return handlers[key]()
+    ''')
+    assert report['signals'].get('dynamic') == 1
+
+
+def test_io_method_on_expression_is_io():
+    report = scan('''
+        from pathlib import Path
+
+        def read(p):
+            return Path(p).read_text()
+    ''')
+    assert report['needs_llm'] is True
+    assert report['signals'].get('io') == 1
+
+
+def test_request_args_is_input():
+    report = scan('''
+        from flask import request
+
+        def handler():
+            return request.args.get("q", "")
+    ''')
+    assert report['needs_llm'] is True
+    assert report['signals'].get('input') == 1
+
+
+def test_chunk_scores_follow_signal_lines():
+    source = textwrap.dedent('''
+        def safe(values):
+            return sorted(values)
+
+
+        def risky(conn, uid):
+            return conn.cursor().execute("SELECT * FROM u WHERE id=" + uid)
+    ''')
+    chunks = ENGINE.score_chunks(source, [{'line_start': 2, 'line_end': 3}, {'line_start': 6, 'line_end': 7}])
+    assert chunks[0]['needs_llm_score'] == 0.0
+    assert chunks[1]['needs_llm_score'] > 0
+
+
+def _secret_severities(source):
+    return [f['severity'] for f in scan(source)['findings'] if 'Secret' in f['title']]
+
+
+@pytest.mark.parametrize('source', [
+    'DB_PASSWORD = "hunter2"',
+    'api_key = "sk-123"',
+    'self.secret = "s3cr3t"',
+    'AUTH_TOKEN = "abc"',
+    'connect(password="hunter2")',
+])
+def test_explicit_secret_names_block_the_commit(source):
+    assert _secret_severities(source) == ['CRITICAL']
+
+
+@pytest.mark.parametrize('source', [
+    'pad_token = "<pad>"',
+    'eos_token = "</s>"',
+    'csrf_token = "test-token"',
+    'db_pwd = "/var/lib/db"',
+    'tokenizer(pad_token="<pad>")',
+])
+def test_broad_token_names_are_reported_below_critical(source):
+    assert _secret_severities(source) == ['LOW']
+
+
+@pytest.mark.parametrize('source', [
+    'tokens = "a b c"',
+    'password_hint = "your pet"',
+    'secret_count = ""',
+    'pwd = os.getcwd()',
+    'password = os.environ["PASSWORD"]',
+])
+def test_other_names_and_values_are_not_secrets(source):
+    assert _secret_severities(source) == []
@@ -0,0 +1,95 @@
+import json
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from phase_1.tracing import Tracer
+
+
+@pytest.fixture
+def tracer(tmp_path):
+    tracer = Tracer()
+    tracer.enable(str(tmp_path / 'trace.json'))
+    return tracer
+
+
+def _load(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _spans(trace):
+    return [event for event in trace['traceEvents'] if event['ph'] == 'X']
+
+
+def test_disabled_tracer_records_nothing(tmp_path):
+    tracer = Tracer()
+    with tracer.span('index', files=3) as s:
+        s.set(lines=10)
+    assert tracer.span('a') is tracer.span('b')
+
+    assert tracer.export() is None
+    tracer.enable()
+    assert tracer.export() is None
+
+
+def test_nested_spans_export_as_complete_events(tracer):
+    with tracer.span('analyze', files=2):
+        with tracer.span('llm_call', category='llm', model='gpt-4o-mini') as call:
+            time.sleep(0.01)
+            call.set(tokens=120, cached=False, extra=['a'])
+
+    trace = _load(tracer.export())
+    inner, outer = _spans(trace)
+
+    assert (outer['name'], outer['cat'], outer['args']) == ('analyze', 'pipeline', {'files': 2})
+    assert (inner['name'], inner['cat']) == ('llm_call', 'llm')
+    assert inner['args'] == {'model': 'gpt-4o-mini', 'tokens': 120, 'cached': False, 'extra': "['a']"}
+    assert inner['dur'] >= 10_000
+    # Microsecond timestamps: the inner span sits within the outer one
+    assert outer['ts'] <= inner['ts'] and inner['ts'] + inner['dur'] <= outer['ts'] + outer['dur']
+    assert trace['displayTimeUnit'] == 'ms'
+
+
+def test_failed_span_records_the_error_and_reraises(tracer):
+    with pytest.raises(ValueError):
+        with tracer.span('parse'):
+            raise ValueError("bad input")
+
+    [event] = _spans(_load(tracer.export()))
+    assert event['args'] == {'error': 'ValueError'}
+
+
+def test_each_thread_is_named_in_the_metadata(tracer):
+    def work():
+        with tracer.span('worker_span'):
+            pass
+
+    worker = threading.Thread(target=work, name='analysis-worker')
+    worker.start()
+    worker.join()
+    with tracer.span('main_span'):
+        pass
+
+    trace = _load(tracer.export())
+    names = {event['tid']: event['args']['name'] for event in trace['traceEvents']
+             if event['name'] == 'thread_name'}
+    by_span = {event['name']: names[event['tid']] for event in _spans(trace)}
+    assert by_span == {'worker_span': 'analysis-worker', 'main_span': threading.current_thread().name}
+
+
+def test_enable_starts_a_fresh_trace(tracer, tmp_path):
+    with tracer.span('first_run'):
+        pass
+    tracer.enable()
+    with tracer.span('second_run'):
+        pass
+
+    path = tracer.export(str(tmp_path / 'nested' / 'out.json'))
+    assert path.endswith(os.path.join('nested', 'out.json'))
+    assert [event['name'] for event in _spans(_load(path))] == ['second_run']
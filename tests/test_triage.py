@@ -0,0 +1,87 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+for module in ('jinja2', 'openai', 'chromadb', 'tiktoken'):
+    pytest.importorskip(module)
+
+from phase_2.triage import TriageClassifier
+from phase_2.rag_analyzer import RAGAnalyzer
+
+PURE = "def add(a, b):\n    return a + b\n"
+READS_FILE = "def load(path):\n    return open(path).read()\n"
+EVAL = "def run(expr):\n    return eval(expr)\n"
+UNPARSABLE = "def broken(:\n    os.system(cmd)\n"
+
+
+def _with_model(monkeypatch, answer):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    triage = TriageClassifier(triage_model="gpt-4o-mini", escalation_threshold=0.35)
+    calls = []
+
+    def call_llm(**kwargs):
+        calls.append(kwargs)
+        return answer
+
+    triage.triage_llm._call_llm = call_llm
+    return triage, calls
+
+
+def test_pure_code_is_skipped_by_the_rules_alone():
+    triage = TriageClassifier()
+    decision = triage.classify(PURE)
+    assert (decision['escalated'], decision['source'], decision['suspicion_score']) == (False, 'static_rules', 0.0)
+
+
+def test_risk_signals_decide_without_a_model():
+    triage = TriageClassifier(escalation_threshold=0.35)
+    assert triage.classify(EVAL)['escalated'] is True
+    assert triage.classify(READS_FILE)['escalated'] is False
+    assert triage.stats == {'escalated': 1, 'skipped': 1}
+
+
+def test_unparsable_code_falls_back_to_the_regex_heuristic():
+    decision = TriageClassifier().classify(UNPARSABLE)
+    assert decision['source'] == 'heuristic'
+    assert decision['escalated'] is True
+
+
+def test_model_can_escalate_an_uncertain_file(monkeypatch):
+    triage, calls = _with_model(monkeypatch, {'suspicion_score': 0.9, 'reason': 'path traversal'})
+    decision = triage.classify(READS_FILE)
+    assert len(calls) == 1
+    assert decision['escalated'] is True
+    assert decision['source'] == 'model:gpt-4o-mini' and decision['reason'] == 'path traversal'
+
+
+def test_model_cannot_talk_down_what_the_rules_saw(monkeypatch):
+    triage, calls = _with_model(monkeypatch, {'suspicion_score': 0.0, 'reason': 'looks fine'})
+    # 0.8 is above certain_threshold: the model is not even asked
+    assert triage.classify(EVAL)['escalated'] is True
+    assert calls == []
+
+    triage.escalation_threshold = 0.1
+    assert triage.classify(READS_FILE)['suspicion_score'] == 0.2
+
+
+def test_model_failure_keeps_the_heuristic_score(monkeypatch):
+    triage, _ = _with_model(monkeypatch, {'error': True, 'message': 'HTTP 500'})
+    decision = triage.classify(READS_FILE)
+    assert decision['source'] == 'static_rules' and decision['escalated'] is False
+
+
+def test_cascade_skips_deep_analysis_for_clean_files(monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    analyzer = RAGAnalyzer(vector_store=None, embedding_generator=None, llm_model="gpt-4o-mini",
+                           use_llm_cache=False, use_retrieval_cache=False, cascade=True)
+    analyzer.rag_core.build_rag_context = lambda **_: pytest.fail("clean file reached retrieval")
+
+    result = analyzer.analyze_code(PURE, analysis_type='all', file_path='add.py')
+
+    assert result['triage']['escalated'] is False
+    assert result['bug_analysis']['has_bugs'] is False
+    assert 'deep analysis skipped' in result['security_analysis']['risk_summary']
+    assert analyzer.cascade_summary() == {'escalated': 0, 'skipped': 1}
@@ -0,0 +1,39 @@
+import os
+import sys
+import time
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+pytest.importorskip('chromadb')
+
+from phase_1.vector_store import ChromaVectorStore
+
+
+def test_concurrent_searches_rebuild_lexical_index_once(tmp_path):
+    store = ChromaVectorStore(collection_name='test_code', persist_directory=str(tmp_path))
+    rebuilds = []
+
+    def get(include):
+        rebuilds.append(threading.current_thread().name)
+        time.sleep(0.05)
+        return {'ids': ['a', 'b'],
+                'documents': ['def load_user(cursor, uid): cursor.execute(uid)', 'def parse(text): return text'],
+                'metadatas': [{'file_path': 'a.py'}, {'file_path': 'b.py'}]}
+
+    # A collection stored before the lexical index existed
+    store.collection = SimpleNamespace(count=lambda: 2, get=get)
+
+    results = []
+    workers = [threading.Thread(target=lambda: results.append(store.search_lexical('cursor execute uid')))
+               for _ in range(8)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert len(rebuilds) == 1
+    assert all(hits and hits[0]['id'] == 'a' for hits in results) and len(results) == 8